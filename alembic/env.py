@@ -8,6 +8,8 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 from app.core.config import settings
 from app.db.base import Base
+from app.db.base_class import UTCDateTime
+from app.db.search import create_extension_statements
 from app.utils.logger import setup_logs
 
 setup_logs("alembic", level=logging.INFO)
@@ -50,6 +52,20 @@ def process_revision_directives(context, revision, directives):
             logger.info("No changes in schema detected.")
 
 
+def render_item(type_, obj, autogen_context):
+    # `UTCDateTime` only converts values on the Python side, migrations use the plain column type
+    if type_ == "type" and isinstance(obj, UTCDateTime):
+        return "sa.DateTime(timezone=True)"
+    return False
+
+
+def create_extensions() -> None:
+    # The indexes of the migrations may depend on extensions (e.g. the `gin_trgm_ops` of the search indexes)
+    if context.get_context().dialect.name == "postgresql":
+        for statement in create_extension_statements():
+            context.execute(statement)
+
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode.
 
@@ -69,9 +85,11 @@ def run_migrations_offline() -> None:
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
         process_revision_directives=process_revision_directives,
+        render_item=render_item,
     )
 
     with context.begin_transaction():
+        create_extensions()
         context.run_migrations()
 
 
@@ -80,9 +98,11 @@ def do_run_migrations(connection: Connection) -> None:
         connection=connection,
         target_metadata=target_metadata,
         process_revision_directives=process_revision_directives,
+        render_item=render_item,
     )
 
     with context.begin_transaction():
+        create_extensions()
         context.run_migrations()
 
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 
 from app.api import endpoints
+from app.core.auth import compile_route_scopes
 from app.utils.load_submodules import load_submodules
 
 endpoints_modules = load_submodules(endpoints)
@@ -10,3 +11,6 @@ api_router = APIRouter()
 
 for module in endpoints_modules:
     api_router.include_router(module.router)
+
+# The scopes required by the routes are compiled once, not on their first request
+compile_route_scopes(api_router.routes)
@@ -1,39 +1,150 @@
 import logging
+from collections.abc import Callable
 
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, Security, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.core.types import SecurityScopes
-from app.core.utils.misc import process_query_parameters, to_query_parameters
+from app.core.config import settings
+from app.core.types import CountStrategy, SecurityScopes, StreamFormat
+from app.core.utils.etag import etag_matches, format_etag
+from app.core.utils.misc import parse_fields, process_query_parameters, project, to_query_parameters
+from app.core.utils.streaming import STREAM_MEDIA_TYPES, streaming_response
 from app.crud.crud_account import account as accounts
-from app.dependencies import DBDependency, get_current_active_account, TranslationDependency
+from app.dependencies import DBDependency, TranslationDependency, authorize, get_db, request_deadline
 from app.schemas import account as account_schema
 
-router = APIRouter(tags=["account"], prefix="/account")
+router = APIRouter(tags=["account"], prefix="/account", dependencies=[Depends(request_deadline())])
 
 logger = logging.getLogger("app.api.account")
 
+FieldsQuery = Query(
+    default=None,
+    description="Comma separated list of the fields to return, e.g. `id,username`. All fields by default.",
+)
+
+
+def parse_account_fields(fields: str | None, _: Callable[[str], str]) -> list[str] | None:
+    """
+    Parse the sparse fieldset of an account endpoint.
+
+    :param fields: The comma separated list of fields, None for all fields
+    :param _: The translation function
+    :return: The names of the fields, None for all fields
+    """
+    if fields is None:
+        return None
+    try:
+        return parse_fields(account_schema.Account, fields)
+    except ValueError as e:
+        logger.debug(f"Invalid fields: {e}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_("INVALID_FIELDS")) from e
+
 
 @router.get(
     "/",
     response_model=list[account_schema.Account],
-    dependencies=[Security(get_current_active_account, scopes=[SecurityScopes.ADMINISTRATOR.value])],
+    responses={200: {"content": {media_type: {} for media_type in STREAM_MEDIA_TYPES.values()}}},
+    dependencies=[Security(authorize, scopes=[SecurityScopes.ADMINISTRATOR.value])],
 )
 async def read_accounts(
+    request: Request,
+    response: Response,
     db: DBDependency,
+    _: TranslationDependency,
     query=Depends(to_query_parameters(account_schema.Account)),
+    cursor: str | None = None,
+    limit: int = Query(default=settings.MAX_PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+    sort: str = "id",
+    q: str | None = Query(
+        default=None,
+        min_length=1,
+        max_length=256,
+        description="Search the usernames and names, every word has to match the beginning of a word.",
+    ),
+    stream: StreamFormat | None = None,
+    fields: str | None = FieldsQuery,
+    count: CountStrategy = CountStrategy.NONE,
 ):
     """
-    Retrieve a list of accounts.
+    Retrieve a page of accounts.
+
+    The accounts are sorted by `sort` then by id. When there are more accounts, the cursor
+    of the next page is sent in the `X-Next-Cursor` header and the `Link` header (rel="next").
+
+    With `stream`, all the matching accounts are sent in a single chunked response instead,
+    either as NDJSON or as a JSON array, and pagination parameters are ignored.
+
+    With `fields`, only the given fields are read from the database and returned.
+
+    With `count`, the number of accounts matching the filters is sent in the `X-Total-Count` header,
+    either exact or estimated by the database planner (cheaper on large tables).
+
+    With `q`, the accounts matching the search are sent most relevant first, in a single page of at most
+    `limit` accounts: `sort`, `cursor`, `stream` and `count` are ignored.
 
     This endpoint requires authentication with the admin scope.
     """
     query_parameters = process_query_parameters(query)
     logger.debug(f"Query parameters: {query_parameters}")
-    return await accounts.query(
-        db,
-        limit=None,
-        **query_parameters,
-    )
+    columns = parse_account_fields(fields, _)
+    # Only the fields of the response can be used to sort, the other columns must not leak through the cursors
+    if sort not in account_schema.Account.model_fields:
+        logger.debug(f"Invalid sort key: {sort}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_("INVALID_PAGINATION"))
+
+    if stream is not None and q is None:
+
+        async def stream_accounts():
+            # The session of the dependency is closed before the response is sent,
+            # so the stream needs its own session, closed once the last row is sent
+            async with get_db.get_session() as session:
+                async for account in accounts.stream(session, columns=columns, **query_parameters):
+                    yield account
+
+        return streaming_response(stream_accounts(), account_schema.Account, stream, columns)
+
+    next_cursor: str | None = None
+    if q is not None:
+        # The search results are sorted by relevance, in a single page without a cursor
+        page = await accounts.search(db, q, limit=limit, columns=columns, **query_parameters)
+    else:
+        try:
+            page, next_cursor = await accounts.paginate(
+                db,
+                cursor=cursor,
+                limit=limit,
+                order_by=sort,
+                columns=columns,
+                **query_parameters,
+            )
+        except ValueError as e:
+            logger.debug(f"Invalid pagination parameters: {e}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_("INVALID_PAGINATION")) from e
+
+    headers: dict[str, str] = {}
+    total_count = None if q is not None else await accounts.count(db, strategy=count, **query_parameters)
+    if total_count is not None:
+        headers["X-Total-Count"] = str(total_count)
+    if next_cursor is not None:
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+
+    if columns is not None:
+        # Partial accounts do not match the response model, they are serialized here
+        return JSONResponse(
+            [
+                project(account_schema.Account, account, columns).model_dump(
+                    mode="json", by_alias=True, exclude_unset=True
+                )
+                for account in page
+            ],
+            headers=headers,
+        )
+    response.headers.update(headers)
+    return page
 
 
 @router.post("/", response_model=account_schema.Account)
@@ -41,62 +152,106 @@ async def create_account(account: account_schema.AccountCreate, db: DBDependency
     """
     Create a new account.
     """
-    if await accounts.query(db, username=account.username, limit=1):
+    # The unique username index detects a taken username in the same statement as the insert
+    created_account = await accounts.create_or_conflict(db, obj_in=account, index_elements=["username"])
+    if created_account is None:
         logger.debug(f"Username {account.username} already exists")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=_("UNAVAILABLE_USERNAME"),
         )
-    return await accounts.create(db, obj_in=account)
+    return created_account
 
 
 @router.get(
     "/{account_id}",
     response_model=account_schema.Account,
-    dependencies=[Security(get_current_active_account, scopes=[SecurityScopes.ADMINISTRATOR.value])],
+    dependencies=[Security(authorize, scopes=[SecurityScopes.ADMINISTRATOR.value])],
 )
-async def read_account(account_id: int, db: DBDependency, _: TranslationDependency):
+async def read_account(
+    account_id: int,
+    response: Response,
+    db: DBDependency,
+    _: TranslationDependency,
+    fields: str | None = FieldsQuery,
+):
     """
     Retrieve an account by ID.
 
+    With `fields`, only the given fields are read from the database and returned.
+
+    The version of the account is sent in the `ETag` header, to be used in the `If-Match` header of an update.
+
     This endpoint requires authentication with the admin scope.
     """
-    account = await accounts.read(db, account_id)
+    columns = parse_account_fields(fields, _)
+    # The version is always loaded to build the ETag. A cached version can be stale,
+    # the update is then rejected with a 412 and the account has to be read again
+    account = await accounts.read(db, account_id, columns=None if columns is None else [*columns, "version"])
     if account is None:
         logger.debug(f"Account {account_id} not found")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_("ELEMENT_NOT_FOUND"))
+    headers = {"ETag": format_etag(account.version)}
+    if columns is not None:
+        return JSONResponse(
+            project(account_schema.Account, account, columns).model_dump(
+                mode="json", by_alias=True, exclude_unset=True
+            ),
+            headers=headers,
+        )
+    response.headers.update(headers)
     return account
 
 
 @router.put(
     "/{account_id}",
     response_model=account_schema.Account,
-    dependencies=[Security(get_current_active_account, scopes=[SecurityScopes.ADMINISTRATOR.value])],
+    dependencies=[Security(authorize, scopes=[SecurityScopes.ADMINISTRATOR.value])],
 )
-async def update_account(account_id: int, account: account_schema.AccountUpdate, db: DBDependency, _: TranslationDependency):
+async def update_account(
+    account_id: int,
+    account: account_schema.AccountUpdate,
+    response: Response,
+    db: DBDependency,
+    _: TranslationDependency,
+    if_match: str | None = Header(default=None),
+):
     """
     Update an account by ID.
 
+    With the `If-Match` header, the account is only updated if its `ETag` still matches,
+    otherwise a 412 response is sent. Concurrent updates of the same version are also rejected with a 412.
+
     This endpoint requires authentication with the admin scope.
     """
-    old_account = await accounts.read(db, account_id)
+    # The version checked by the update must not come from the cache
+    old_account = await accounts.read(db, account_id, use_cache=False)
     if old_account is None:
         logger.debug(f"Account {account_id} not found")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_("ELEMENT_NOT_FOUND"))
-    results = await accounts.query(db, username=account.username)
-    if results and results[0].id != old_account.id:
+    if if_match is not None and not etag_matches(if_match, format_etag(old_account.version)):
+        logger.debug(f"Account {account_id} does not match {if_match}")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=_("PRECONDITION_FAILED"))
+    try:
+        updated_account = await accounts.update(db, db_obj=old_account, obj_in=account)
+    except StaleDataError as e:
+        logger.debug(f"Account {account_id} was updated concurrently")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=_("PRECONDITION_FAILED")) from e
+    except IntegrityError as e:
+        # The unique username index detects a taken username in the same statement as the update
         logger.debug(f"Username {account.username} already exists")
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=_("UNAVAILABLE_USERNAME"),
-        )
-    return await accounts.update(db, db_obj=old_account, obj_in=account)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_("UNAVAILABLE_USERNAME")) from e
+    if updated_account is None:
+        logger.debug(f"Account {account_id} not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_("ELEMENT_NOT_FOUND"))
+    response.headers["ETag"] = format_etag(updated_account.version)
+    return updated_account
 
 
 @router.delete(
     "/{account_id}",
     response_model=account_schema.Account,
-    dependencies=[Security(get_current_active_account, scopes=[SecurityScopes.ADMINISTRATOR.value])],
+    dependencies=[Security(authorize, scopes=[SecurityScopes.ADMINISTRATOR.value])],
 )
 async def delete_account(account_id: int, db: DBDependency, _: TranslationDependency):
     """
@@ -104,8 +259,8 @@ async def delete_account(account_id: int, db: DBDependency, _: TranslationDepend
 
     This endpoint requires authentication with the admin scope.
     """
-    account = await accounts.read(db, account_id)
+    account = await accounts.delete(db, id=account_id)
     if account is None:
         logger.debug(f"Account {account_id} not found")
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_("ELEMENT_NOT_FOUND"))
-    return await accounts.delete(db, id=account_id)
+    return account
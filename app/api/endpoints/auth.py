@@ -1,42 +1,108 @@
 import logging
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Security, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
-from app.core.security import create_access_token, verify_password
+from app.core.security import JWTPayloadMapping, create_access_token, password_service
+from app.core.types import SecurityScopes
+from app.core.utils.worker_pool import WorkerPoolBusyError
 from app.crud.crud_account import account as accounts
-from app.dependencies import CurrentAccountDependency, DBDependency, TranslationDependency
+from app.crud.crud_revoked_token import revoked_token as revoked_tokens
+from app.dependencies import (
+    CurrentAccountDependency,
+    DBDependency,
+    TranslationDependency,
+    get_db,
+    get_token_data,
+    request_deadline,
+)
 from app.schemas import account as account_schema
 from app.schemas import token as token_schema
 
-router = APIRouter(tags=["auth"], prefix="/auth")
+router = APIRouter(tags=["auth"], prefix="/auth", dependencies=[Depends(request_deadline())])
 
 logger = logging.getLogger("app.api.auth")
 
 AuthFormData = Annotated[OAuth2PasswordRequestForm, Depends()]
 
 
+async def rehash_password(account_id: int, password: str, hashed_password: str) -> None:
+    """
+    Hash a password again with the configured cost, after the response of the login is sent.
+
+    :param account_id: The id of the account
+    :param password: The verified plain password
+    :param hashed_password: The current hash of the password
+    """
+    # The session of the dependency is closed before the background tasks run
+    async with get_db.get_session() as session:
+        try:
+            rehashed = await accounts.rehash_password(
+                session, id=account_id, password=password, hashed_password=hashed_password
+            )
+        except WorkerPoolBusyError:
+            # The next login tries again
+            logger.warning(f"Password of account {account_id} not rehashed, the pool is busy")
+            return
+    logger.debug(f"Password of account {account_id} {'rehashed' if rehashed else 'changed before its rehash'}")
+
+
 @router.post("/login/", response_model=token_schema.Token)
-async def login(form_data: AuthFormData, db: DBDependency, _: TranslationDependency) -> Any:
+async def login(
+    form_data: AuthFormData, background_tasks: BackgroundTasks, db: DBDependency, _: TranslationDependency
+) -> Any:
     """
     Logs in a user and returns an access token.
+
+    The hashes of another cost than the configured one are replaced in the background, with the verified password.
     """
-    account = ((await accounts.query(db, username=form_data.username, limit=1))[0:1] or [None])[0]
+    # The password is deferred, it has to be explicitly loaded
+    results = await accounts.query(
+        db, username=form_data.username, limit=1, columns=["password", "scope", "is_active", "version"]
+    )
+    account = results[0] if results else None
+    # Exactly one verification per attempt, against a dummy hash if the account does not exist,
+    # so that the cost of an attempt does not tell whether the username exists
+    password_matches = await password_service.verify(form_data.password, account.password if account else None)
     # Check if account exists, if password is correct and if account is active
-    if account is None or not verify_password(form_data.password, account.password) or account.is_active is False:
+    if account is None or not password_matches or account.is_active is False:
         if account is None:
             logger.debug(f"Account {form_data.username} not found")
-        elif not verify_password(form_data.password, account.password):
+        elif not password_matches:
             logger.debug(f"Invalid password for {form_data.username}")
-        elif account.is_active is False:
+        else:
             logger.debug(f"Account {form_data.username} is not active")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=_("INVALID_CREDENTIALS"),
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return {"access_token": create_access_token(subject=account.id, scopes=[account.scope.value])}
+    if password_service.needs_update(account.password):
+        background_tasks.add_task(rehash_password, account.id, form_data.password, account.password)
+    # The claims of the scope check, so that the routes only checking permissions need not read the account
+    claims: JWTPayloadMapping = {"is_active": account.is_active, "ver": account.version}
+    return {"access_token": create_access_token(subject=account.id, scopes=[account.scope.value], claims=claims)}
+
+
+@router.post("/logout/", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    token_data: Annotated[token_schema.TokenData, Security(get_token_data, scopes=[SecurityScopes.USER.value])],
+    db: DBDependency,
+) -> None:
+    """
+    Revokes the access token of the request.
+
+    The other workers reject it within `REVOCATION_REFRESH_INTERVAL` seconds.
+    """
+    if token_data.jti is None or token_data.expires_at is None:
+        # Issued before the tokens had an id, it expires on its own
+        logger.debug(f"Token of account {token_data.id} cannot be revoked")
+        return
+    await revoked_tokens.revoke(db, jti=token_data.jti, expires_at=token_data.expires_at)
+    logger.debug(f"Token of account {token_data.id} revoked")
 
 
 @router.get("/me/", response_model=account_schema.Account)
@@ -59,12 +125,16 @@ async def update_account_me(
     """
     Updates the current user's account information.
     """
-    # Check if username is already taken
-    if account_in.username and account_in.username != current_account.username:
-        if await accounts.query(db, username=account_in.username):
-            logger.debug(f"Username {account_in.username} already exists")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=_("UNAVAILABLE_USERNAME"),
-            )
-    return await accounts.update(db, db_obj=current_account, obj_in=account_in)  # type: ignore
+    try:
+        updated_account = await accounts.update(db, db_obj=current_account, obj_in=account_in)  # type: ignore
+    except StaleDataError as e:
+        logger.debug(f"Account {current_account.id} was updated concurrently")
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail=_("PRECONDITION_FAILED")) from e
+    except IntegrityError as e:
+        # The unique username index detects a taken username in the same statement as the update
+        logger.debug(f"Username {account_in.username} already exists")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=_("UNAVAILABLE_USERNAME")) from e
+    if updated_account is None:
+        logger.debug(f"Account {current_account.id} not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=_("ELEMENT_NOT_FOUND"))
+    return updated_account
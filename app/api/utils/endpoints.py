@@ -1,10 +1,13 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
-from app.schemas.utils_endpoints import HealthResponse, RootResponse, VersionResponse
+from app.core.security import signing_keys
+from app.schemas.utils_endpoints import HealthResponse, JWKSResponse, RootResponse, VersionResponse
 from app.utils.get_version import get_version
 
 
 utils_router = APIRouter(tags=["utils"])
+# Well-known URIs are at the root of the host (RFC 8615), not under the prefix of the API
+well_known_router = APIRouter(tags=["utils"], prefix="/.well-known")
 
 
 @utils_router.get("/", status_code=200, response_model=RootResponse)
@@ -29,3 +32,14 @@ async def version():
     Version endpoint.
     """
     return {"version": get_version()}
+
+
+@well_known_router.get("/jwks.json", status_code=200, response_model=JWKSResponse)
+async def jwks(response: Response):
+    """
+    Public keys verifying the access tokens, by `kid`, for the services verifying the tokens themselves.
+    Empty if the tokens are signed with a shared secret (HS256).
+    """
+    # The keys only change when the API restarts, the verifiers fetch them again on an unknown `kid`
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return signing_keys.jwks()
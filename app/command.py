@@ -3,13 +3,16 @@ import asyncio
 import logging
 import sys
 
+from app.commands.calibrate_hashing import calibrate_hashing
 from app.commands.dump_db import dump_db
 from app.commands.execute_sql import execute_sql_command
+from app.commands.index_advisor import index_advisor
 from app.commands.init_db import init_db
 from app.commands.load_db import load_db
 from app.commands.migrate_db import migrate_db
 from app.commands.open_api import open_api
 from app.commands.reset_db import reset_db
+from app.core.config import settings
 from app.db.pre_start import pre_start
 from app.dependencies import get_db
 from app.utils.logger import setup_logs
@@ -114,6 +117,30 @@ execute_parser.add_argument(
     help="SQL command",
 )
 
+index_advisor_parser = subparsers.add_parser(
+    "index-advisor",
+    help="Report the queries that need an index",
+)
+
+calibrate_hashing_parser = subparsers.add_parser(
+    "calibrate-hashing",
+    help="Write the cost of bcrypt fitting the hashing budget on this machine",
+)
+calibrate_hashing_parser.add_argument(
+    "-b",
+    "--budget",
+    type=float,
+    help="Time a hash should take, in milliseconds",
+    default=settings.PASSWORD_HASHING_BUDGET_MS,
+)
+calibrate_hashing_parser.add_argument(
+    "-o",
+    "--output",
+    type=str,
+    help="Env file of the settings",
+    default=".env",
+)
+
 PROMPT_MESSAGE = "Are you sure you want to reset the database, this will delete all data? [y/N] "
 
 
@@ -127,6 +154,10 @@ async def main(command: str) -> None:
     if command == "openapi":
         open_api(args.output)
         return
+    # The calibration measures this machine, not the database
+    if command == "calibrate-hashing":
+        calibrate_hashing(args.budget, args.output)
+        return
 
     get_db.setup()
     await pre_start()
@@ -149,6 +180,8 @@ async def main(command: str) -> None:
             await load_db(args.input)
         case "execute":
             await execute_sql_command(args.command)
+        case "index-advisor":
+            await index_advisor()
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,71 @@
+import logging
+import os
+import statistics
+import time
+
+from app.core.config import settings
+from app.core.security import pwd_context
+
+logger = logging.getLogger("app.command")
+
+# Below 10, bcrypt is too cheap to slow down an offline attack, whatever the budget
+MIN_ROUNDS = 10
+MAX_ROUNDS = 20
+SAMPLES = 3
+
+
+def hash_duration(rounds: int) -> float:
+    """
+    Measure the time bcrypt takes to hash a password on this machine.
+
+    :param rounds: The cost (log2 of the number of rounds)
+    :return: The median duration of `SAMPLES` hashes, in milliseconds
+    """
+    handler = pwd_context.handler("bcrypt").using(rounds=rounds)
+    durations = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        handler.hash("calibration-password")
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def write_setting(path: str, name: str, value: str) -> None:
+    """
+    Set a variable of an env file, read by the settings, the other variables are kept.
+
+    :param path: The path of the env file, created if needed
+    :param name: The name of the variable
+    :param value: The value of the variable
+    """
+    lines: list[str] = []
+    if os.path.exists(path):
+        with open(path) as file:
+            lines = [line for line in file.read().splitlines() if not line.startswith(f"{name}=")]
+    lines.append(f"{name}={value}")
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def calibrate_hashing(budget_ms: float = settings.PASSWORD_HASHING_BUDGET_MS, output: str = ".env") -> int:
+    """
+    Find the highest cost of bcrypt whose hashes take at most `budget_ms` on this machine,
+    and write it as `PASSWORD_HASHING_ROUNDS` in the env file of the settings.
+    The hashes of the previous cost are replaced when their accounts log in.
+
+    :param budget_ms: The time a hash should take, in milliseconds
+    :param output: The path of the env file
+    :return: The cost
+    """
+    rounds = MIN_ROUNDS
+    duration = hash_duration(rounds)
+    if duration > budget_ms:
+        logger.warning(f"A hash of cost {rounds} takes {duration:.0f} ms, over the budget of {budget_ms:.0f} ms")
+    # Each round doubles the duration
+    while rounds < MAX_ROUNDS and (next_duration := hash_duration(rounds + 1)) <= budget_ms:
+        rounds, duration = rounds + 1, next_duration
+    logger.info(f"A hash of cost {rounds} takes {duration:.0f} ms, for a budget of {budget_ms:.0f} ms")
+
+    write_setting(output, "PASSWORD_HASHING_ROUNDS", str(rounds))
+    logger.info(f"PASSWORD_HASHING_ROUNDS={rounds} written to {output}")
+    return rounds
@@ -0,0 +1,84 @@
+import logging
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapper
+
+from app.crud.base import CRUDBase
+from app.db.base import Base
+from app.db.databases.postgres import PostgresDatabase
+from app.db.explain import Explain, unindexed_steps
+from app.db.select_db import select_db
+from app.dependencies import get_db
+
+logger = logging.getLogger("app.command")
+
+
+def sample_value(column: Any) -> Any:
+    """
+    Get a value of the type of a column, bound to the parameters of the explained statements.
+
+    :param column: The column
+    :return: The value
+    """
+    python_type = column.type.python_type
+    if issubclass(python_type, datetime):
+        return datetime.now(timezone.utc)
+    if issubclass(python_type, Enum):
+        return next(iter(python_type))
+    return python_type()
+
+
+async def advise_mapper(session: AsyncSession, mapper: Mapper[Any]) -> dict[str, list[str]]:
+    """
+    Explain the query shapes of a model, see `CRUDBase.query_shapes`.
+    The primary key and the deferred columns (which can not be filtered or sorted by through the API) are skipped.
+
+    :param session: The database session
+    :param mapper: The mapper of the model
+    :return: The steps an index would avoid, by query shape, only for the shapes that need an index
+    """
+    crud: CRUDBase[Any, Any, Any] = CRUDBase(mapper.class_)
+    sample_values = {
+        prop.key: sample_value(prop.columns[0])
+        for prop in mapper.column_attrs
+        if not prop.deferred and not prop.columns[0].primary_key
+    }
+    advice = {}
+    for shape, statement, params in crud.query_shapes(sample_values):
+        plan = (await session.execute(Explain(statement), params)).all()
+        # PostgreSQL returns the JSON plan in a single row
+        steps = unindexed_steps(plan[0][0] if isinstance(select_db(), PostgresDatabase) else plan)
+        if steps:
+            advice[shape] = steps
+    return advice
+
+
+async def index_advisor() -> dict[str, dict[str, list[str]]]:
+    """
+    Run `EXPLAIN` on the query shapes generated by `CRUDBase` for every model, and report
+    the ones that scan a whole table or sort the rows, i.e. the ones that need an index.
+    Mark the columns with `query_column` to index them.
+
+    :return: The steps an index would avoid, by query shape, by table
+    """
+    logger.info("Explaining the query shapes")
+    report = {}
+    async with get_db.get_session() as session:
+        if isinstance(select_db(), PostgresDatabase):  # pragma: no cover
+            # Small tables are scanned even when they are indexed, make the planner use any usable index
+            await session.execute(text("SET LOCAL enable_seqscan = off"))
+            await session.execute(text("SET LOCAL enable_sort = off"))
+        for mapper in sorted(Base.registry.mappers, key=lambda mapper: mapper.class_.__tablename__):
+            table = mapper.class_.__tablename__
+            advice = await advise_mapper(session, mapper)
+            for shape, steps in advice.items():
+                logger.warning(f"{table}: {shape} needs an index ({'; '.join(steps)})")
+            if advice:
+                report[table] = advice
+    if not report:
+        logger.info("Every query shape is served by an index")
+    return report
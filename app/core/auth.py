@@ -1,4 +1,10 @@
+from collections.abc import Iterable
+from functools import reduce
+from operator import or_
+
+from fastapi.routing import APIRoute
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
+from starlette.routing import BaseRoute
 
 from app.core.config import settings
 from app.core.types import SecurityScopesHierarchy
@@ -14,7 +20,83 @@ oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
+def compile_hierarchy(hierarchy: dict[str, list[str]]) -> tuple[dict[str, int], dict[str, int]]:
+    """
+    Compile a hierarchy of scopes into masks: each scope is a bit, and grants the mask of the scopes it includes
+    (itself included). Checking a requirement is then a single AND, whatever the number of scopes.
+
+    :param hierarchy: The scopes included by each scope, see `create_hierarchy_dict`
+    :return: The bit of each scope, and the mask granted by each scope
+    """
+    bits = {scope: 1 << index for index, scope in enumerate(hierarchy)}
+    granted = {scope: reduce(or_, (bits[included] for included in hierarchy[scope]), 0) for scope in hierarchy}
+    return bits, granted
+
+
 scopes_hierarchy: dict[str, list[str]] = create_hierarchy_dict(SecurityScopesHierarchy)
+scope_bits, granted_masks = compile_hierarchy(scopes_hierarchy)
+# The masks of the requirements of the routes, by `SecurityScopes.scope_str`, see `compile_route_scopes`
+required_masks: dict[str, int] = {}
+
+
+def compile_scopes(scopes: Iterable[str]) -> int:
+    """
+    Compile the scopes required by a route into a mask.
+
+    :param scopes: The required scopes
+    :return: The mask of the required scopes
+    :raises ValueError: If a scope is unknown
+    """
+    mask = 0
+    for scope in scopes:
+        if scope not in scope_bits:
+            raise ValueError(f"Unknown scope {scope}")
+        mask |= scope_bits[scope]
+    return mask
+
+
+def compile_route_scopes(routes: Iterable[BaseRoute]) -> None:
+    """
+    Compile the requirements of the `Security(..., scopes=[...])` dependencies of routes into `required_masks`,
+    when the routers are built, so that the requests only look them up.
+
+    :param routes: The routes
+    :raises ValueError: If a route requires an unknown scope
+    """
+    dependants = [route.dependant for route in routes if isinstance(route, APIRoute)]
+    while dependants:
+        dependant = dependants.pop()
+        if dependant.security_scopes_param_name and dependant.security_scopes is not None:
+            # Joined like `SecurityScopes.scope_str`
+            required_masks[" ".join(dependant.security_scopes)] = compile_scopes(dependant.security_scopes)
+        dependants.extend(dependant.dependencies)
+
+
+def required_mask(security_scopes: SecurityScopes) -> int:
+    """
+    Get the mask of the scopes required to access the endpoint, compiled on the first request
+    if the route was not compiled by `compile_route_scopes`.
+
+    :param security_scopes: The security scopes
+    :return: The mask of the required scopes
+    """
+    mask = required_masks.get(security_scopes.scope_str)
+    if mask is None:
+        mask = required_masks[security_scopes.scope_str] = compile_scopes(security_scopes.scopes)
+    return mask
+
+
+def granted_mask(token_scopes: Iterable[str]) -> int:
+    """
+    Get the mask of the scopes granted by a token, the unknown scopes grant nothing.
+
+    :param token_scopes: The token scopes
+    :return: The mask of the granted scopes
+    """
+    mask = 0
+    for scope in token_scopes:
+        mask |= granted_masks.get(scope, 0)
+    return mask
 
 
 def check_scopes(security_scopes: SecurityScopes, token_scopes: list[str]) -> bool:
@@ -26,9 +108,5 @@ def check_scopes(security_scopes: SecurityScopes, token_scopes: list[str]) -> bo
 
     :return: Whether the token scopes are sufficient to access the endpoint
     """
-    # Get the scopes required to access the endpoint
-    required_scopes = security_scopes.scopes
-    # Get the higher scope in `token_scopes`
-    token_scope = sorted(token_scopes, key=lambda scope: SecurityScopesHierarchy[scope].value)[-1]
-    # Check if the token scopes are sufficient to access the endpoint
-    return all(scope in scopes_hierarchy[token_scope] for scope in required_scopes)
+    required = required_mask(security_scopes)
+    return granted_mask(token_scopes) & required == required
@@ -1,7 +1,7 @@
 from abc import abstractmethod
 from typing import Literal
 
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, HttpUrl
 
 
@@ -27,13 +27,54 @@ class Settings(BaseSettings):
         The log level for the application.
     ENVIRONMENT : SupportedEnvironments
         The environment for the application.
+    MAX_PAGE_SIZE : int
+        The maximum number of records returned in a single page.
+    ENTITY_CACHE_SIZE : int
+        The maximum number of records kept in the read-through cache of each CRUD object (0 to disable it).
+        The cache is local to each worker, records updated by another worker can be read up to ENTITY_CACHE_TTL late,
+        so authentication and the reads made before a write bypass it.
+    ENTITY_CACHE_TTL : float
+        The time to live of the records in the read-through cache, in seconds.
+    REQUEST_TIMEOUT : float
+        The default deadline of the requests of the routers with a `request_deadline` dependency, in seconds.
+        The database statements still running at the deadline are cancelled and the request fails with a 503.
 
     ACCESS_TOKEN_EXPIRE_MINUTES : int
         The expiration time for access tokens in minutes.
     SECRET_KEY : str
         The secret key for JWT authentication.
     ALGORITHM : str
-        The algorithm to use for JWT authentication.
+        The algorithm to use for JWT authentication. HS256 signs the tokens with SECRET_KEY,
+        ES256 (or ES384, ES512) with JWT_PRIVATE_KEY, so that other services can verify them with the public keys
+        published on `/.well-known/jwks.json`.
+    JWT_PRIVATE_KEY : str | None
+        The PEM private key signing the tokens, required by the asymmetric algorithms.
+        The tokens carry the RFC 7638 thumbprint of its public key as `kid`.
+    JWT_PUBLIC_KEYS : list[str]
+        The PEM public keys of the previous private keys, whose tokens are still accepted until they expire.
+        To rotate the keys, add the public key of the current private key, then replace the private key.
+    STATELESS_AUTHENTICATION : bool
+        Whether the routes that only check the permissions of the caller trust the claims of the access tokens
+        (scopes, is_active) instead of reading the account. A deactivation or a scope change then only applies
+        to these routes when the tokens issued before expire.
+    TOKEN_CACHE_SIZE : int
+        The maximum number of verified tokens whose claims are cached until they expire (0 to disable the cache).
+    REVOCATION_FILTER_CAPACITY : int
+        The number of revoked tokens the Bloom filter of each worker is sized for, doubled when exceeded.
+    REVOCATION_FILTER_ERROR_RATE : float
+        The proportion of the tokens that are not revoked but still checked in the database.
+    REVOCATION_REFRESH_INTERVAL : float
+        The number of seconds between two reads of the revocations made by the other workers,
+        a token revoked by another worker can be used for that long.
+    PASSWORD_HASHING_WORKERS : int
+        The number of threads hashing and verifying the passwords, off the event loop.
+    PASSWORD_HASHING_QUEUE_SIZE : int
+        The maximum number of passwords waiting for a thread, the next requests fail with a 503.
+    PASSWORD_HASHING_ROUNDS : int
+        The cost of bcrypt (log2 of the number of rounds), see `python app/command.py calibrate-hashing`.
+        The hashes of another cost are replaced when their accounts log in.
+    PASSWORD_HASHING_BUDGET_MS : float
+        The time a hash should take on the target machine, used by `calibrate-hashing`, in milliseconds.
 
     BASE_ACCOUNT_USERNAME : str
         The username for the base account.
@@ -52,6 +93,10 @@ class Settings(BaseSettings):
         The password for the PostgreSQL database.
     DATABASE_URI : str
         The URI for the database.
+    DATABASE_REPLICA_URIS : list[str]
+        The URIs of the read replicas of the database, reads are sent to the primary only if empty.
+    DATABASE_REPLICA_RETRY_INTERVAL : float
+        The number of seconds a replica is skipped after a connection failure.
 
     GITHUB_USER : str
         The username for the GitHub account.
@@ -65,6 +110,9 @@ class Settings(BaseSettings):
         The owner of the GitHub repository.
     """
 
+    # The settings written by the commands (e.g. `calibrate-hashing`), the environment variables take precedence
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
     ALERT_BACKEND: str
     API_PREFIX: str = "/api"
     LOCALE_DIR: str
@@ -76,10 +124,32 @@ class Settings(BaseSettings):
     LOG_LEVEL: int
     ENVIRONMENT: SupportedEnvironments
 
+    # Pagination config
+    MAX_PAGE_SIZE: int = 100
+
+    # Cache config
+    ENTITY_CACHE_SIZE: int = 1024
+    ENTITY_CACHE_TTL: float = 30
+
+    # Deadline config
+    REQUEST_TIMEOUT: float = 10
+
     # Authentication config
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 1  # 1 day
     SECRET_KEY: str
-    ALGORITHM: str = "HS256"  # TODO: Change to ES256 in the future
+    ALGORITHM: str = "HS256"
+    # openssl ecparam -name prime256v1 -genkey -noout
+    JWT_PRIVATE_KEY: str | None = None
+    JWT_PUBLIC_KEYS: list[str] = []
+    STATELESS_AUTHENTICATION: bool = False
+    TOKEN_CACHE_SIZE: int = 4096
+    REVOCATION_FILTER_CAPACITY: int = 100_000
+    REVOCATION_FILTER_ERROR_RATE: float = 0.001
+    REVOCATION_REFRESH_INTERVAL: float = 5
+    PASSWORD_HASHING_WORKERS: int = 4
+    PASSWORD_HASHING_QUEUE_SIZE: int = 64
+    PASSWORD_HASHING_ROUNDS: int = 12
+    PASSWORD_HASHING_BUDGET_MS: float = 250
 
     # Base account config
     BASE_ACCOUNT_USERNAME: str
@@ -91,6 +161,8 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str
+    DATABASE_REPLICA_URIS: list[str] = []
+    DATABASE_REPLICA_RETRY_INTERVAL: float = 30
 
     @property
     @abstractmethod
@@ -1,9 +1,14 @@
 import logging
 
+from pydantic_settings import SettingsConfigDict
+
 from app.core.config.base import Settings, SupportedEnvironments
 
 
 class ConfigTest(Settings):
+    # The tests do not read the `.env` written for the development server (e.g. by `calibrate-hashing`)
+    model_config = SettingsConfigDict(env_file=None, extra="ignore")
+
     ALERT_BACKEND: str = "terminal"
     LOCALE_DIR: str = "app/locales"
     ALLOWED_HOSTS: list[str] = ["*"]
@@ -11,8 +16,14 @@ class ConfigTest(Settings):
     LOG_LEVEL: int = logging.DEBUG
     ENVIRONMENT: SupportedEnvironments = "test"
 
+    """Cache config"""
+    # Each test starts with a new database, records must not be cached between tests
+    ENTITY_CACHE_SIZE: int = 0
+
     """ Authentication config"""
     SECRET_KEY: str = "6a50e3ddeef70fd46da504d8d0a226db7f0b44dcdeb65b97751cf2393b33693e"
+    # The lowest cost of bcrypt, the tests do not measure hashing
+    PASSWORD_HASHING_ROUNDS: int = 4
 
     """Base account config """
     BASE_ACCOUNT_USERNAME: str = "test"
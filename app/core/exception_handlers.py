@@ -4,7 +4,11 @@ from typing import Callable
 
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError
+
+from app.core.password_policy import WeakPasswordError
+from app.core.utils.worker_pool import WorkerPoolBusyError
+from app.db.deadline import is_deadline_exceeded
 
 
 logger = logging.getLogger("app.core.exception_handlers")
@@ -21,4 +25,51 @@ async def integrity_error_handler(request: Request, exc: IntegrityError) -> JSON
     return JSONResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
         content={"detail": _("INTEGRITY_ERROR")},
-    )
\ No newline at end of file
+    )
+
+
+async def deadline_exceeded_handler(request: Request, exc: DBAPIError) -> JSONResponse:
+    """
+    Handle the statements cancelled by the database because they ran past the deadline of the request,
+    the other database errors are not handled.
+    """
+    if not is_deadline_exceeded(exc):
+        raise exc
+    logger.warning(f"Deadline exceeded: {exc}")
+
+    _: Callable[[str], str] = request.state.translation.gettext
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": _("DEADLINE_EXCEEDED")},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def worker_pool_busy_handler(request: Request, exc: WorkerPoolBusyError) -> JSONResponse:
+    """
+    Handle the calls rejected by a full worker pool (e.g. password hashing).
+    """
+    logger.warning(f"WorkerPoolBusyError: {exc}")
+
+    _: Callable[[str], str] = request.state.translation.gettext
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": _("SERVER_BUSY")},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def weak_password_handler(request: Request, exc: WeakPasswordError) -> JSONResponse:
+    """
+    Handle the passwords rejected by zxcvbn when an account is written.
+    """
+    logger.debug(f"WeakPasswordError: {exc}")
+
+    _: Callable[[str], str] = request.state.translation.gettext
+
+    return JSONResponse(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        content={"detail": _("WEAK_PASSWORD")},
+    )
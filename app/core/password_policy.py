@@ -0,0 +1,58 @@
+import re
+from collections.abc import Sequence
+
+from zxcvbn import zxcvbn
+from zxcvbn.frequency_lists import FREQUENCY_LISTS
+
+# bcrypt ignores the bytes after the 72th, and zxcvbn gets slow on long passwords
+MAX_PASSWORD_BYTES = 72
+MIN_PASSWORD_LENGTH = 8
+MIN_CHARACTER_CLASSES = 2
+CHARACTER_CLASSES = (re.compile(r"[a-z]"), re.compile(r"[A-Z]"), re.compile(r"[0-9]"), re.compile(r"[^a-zA-Z0-9]"))
+# The 30 000 most common passwords of the breaches, as ranked by zxcvbn
+COMMON_PASSWORDS = frozenset(FREQUENCY_LISTS["passwords"])
+MIN_STRENGTH_SCORE = 4
+
+
+class WeakPasswordError(ValueError):
+    """
+    Raised when zxcvbn estimates that a password is too easy to guess.
+    """
+
+
+def check_password_policy(password: str) -> None:
+    """
+    Check the cheap rules of the password policy, in order: the length, the character classes
+    and the list of common passwords. They run before `check_password_strength`,
+    so that the passwords they reject never reach zxcvbn.
+
+    :param password: The plain password
+    :raises ValueError: If the password breaks a rule
+    """
+    if len(password.encode()) > MAX_PASSWORD_BYTES:
+        raise ValueError(f"Password is too long: at most {MAX_PASSWORD_BYTES} bytes")
+    if len(password) < MIN_PASSWORD_LENGTH:
+        raise ValueError(f"Password is too weak: at least {MIN_PASSWORD_LENGTH} characters are required")
+    if sum(1 for character_class in CHARACTER_CLASSES if character_class.search(password)) < MIN_CHARACTER_CLASSES:
+        raise ValueError(
+            "Password is too weak: use lowercase and uppercase letters, digits or symbols, "
+            f"at least {MIN_CHARACTER_CLASSES} of them"
+        )
+    if password.lower() in COMMON_PASSWORDS:
+        raise ValueError("Password is too weak: this is a commonly used password")
+
+
+def check_password_strength(password: str, user_inputs: Sequence[str] = ()) -> None:
+    """
+    Estimate the strength of a password with zxcvbn, tens of milliseconds of CPU:
+    it should only run on the passwords accepted by `check_password_policy`, off the event loop.
+    zxcvbn keeps the user inputs in a global, it must not run in several threads at once.
+    The length of the password is not limited here, `check_password_policy` rejects the long passwords first.
+
+    :param password: The plain password
+    :param user_inputs: The other values of the account (username, names...), which the password should not contain
+    :raises WeakPasswordError: If the password is too weak
+    """
+    password_strength = zxcvbn(password, user_inputs=list(user_inputs))
+    if password_strength["score"] < MIN_STRENGTH_SCORE:
+        raise WeakPasswordError(f"Password is too weak: {password_strength['feedback']['warning']}")
@@ -1,21 +1,37 @@
+import hashlib
+import secrets
+import time
+from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
-from typing import MutableMapping
+from functools import cache
+from typing import Any, MutableMapping
+from uuid import uuid4
 
-from jose import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.password_policy import WeakPasswordError, check_password_strength
+from app.core.signing_keys import SigningKeys
+from app.core.utils.cache import TTLCache
+from app.core.utils.worker_pool import WorkerPool
 
 # `JWTPayloadMapping` is a mutable mapping type (i.e. a key-value store like a dict)
 # with string keys and values that can be any of the following types:
 # datetime, bool, str, list of strings, or list of integers.
-JWTPayloadMapping = MutableMapping[str, datetime | bool | str | list[str] | list[int]]
+JWTPayloadMapping = MutableMapping[str, datetime | bool | int | str | list[str] | list[int]]
 
 # `pwd_context` is a CryptContext instance that uses the bcrypt hashing algorithm
 # and automatically handles deprecated hashing algorithms. It means that it will
 # deprecate all supported schemes (except for the default one) and will automatically
 # upgrade the hashes of deprecated schemes to the default one when verifying passwords.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# The hashes of another cost than `PASSWORD_HASHING_ROUNDS` need an update (see `PasswordService.needs_update`).
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.PASSWORD_HASHING_ROUNDS,
+    bcrypt__min_rounds=settings.PASSWORD_HASHING_ROUNDS,
+    bcrypt__max_rounds=settings.PASSWORD_HASHING_ROUNDS,
+)
 
 
 def verify_password(plain_password, hashed_password):
@@ -29,6 +45,17 @@ def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 
+@cache
+def dummy_password_hash() -> str:
+    """
+    Get the hash of a random password, with the same cost as the hashes of the accounts.
+    It is computed once, on first use.
+
+    :return: The hashed password.
+    """
+    return get_password_hash(secrets.token_urlsafe(32))
+
+
 def is_hashed_password(password: str) -> bool:
     """
     Check if the given password is a hashed password in the bcrypt format.
@@ -49,11 +76,127 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(*, subject: int, scopes: list[str]) -> str:
+class PasswordService:
+    """
+    Hash and verify passwords in a bounded pool of threads, so that bcrypt (100-300 ms per call)
+    does not block the event loop. bcrypt releases the GIL, the threads run in parallel.
+
+    The strength of the new passwords is estimated by zxcvbn in a pool of its own, with a single thread
+    since zxcvbn is not thread safe. The weak passwords are remembered (by digest), so that a password
+    sent again is rejected without running zxcvbn again.
+    """
+
+    def __init__(self, pool: WorkerPool, strength_pool: WorkerPool, cache_size: int = 1024, cache_ttl: float = 3600):
+        """
+        :param pool: The pool running the hashes and verifications
+        :param strength_pool: The pool running zxcvbn, with a single thread
+        :param cache_size: The maximum number of weak passwords remembered
+        :param cache_ttl: The number of seconds a weak password is remembered
+        """
+        self.pool = pool
+        self.strength_pool = strength_pool
+        self._weak_passwords: TTLCache[bytes, str] = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    async def check_strength(self, password: str, user_inputs: Sequence[str] = ()) -> None:
+        """
+        Check the strength of a password, see `check_password_strength`.
+
+        :param password: The plain password, accepted by `check_password_policy`.
+        :param user_inputs: The other values of the account, which the password should not contain.
+        :raises WeakPasswordError: If the password is too weak.
+        :raises WorkerPoolBusyError: If too many passwords are waiting to be checked.
+        """
+        key = hashlib.sha256("\0".join([password, *user_inputs]).encode()).digest()
+        warning = self._weak_passwords.get(key)
+        if warning is not None:
+            raise WeakPasswordError(warning)
+        try:
+            await self.strength_pool.run(check_password_strength, password, list(user_inputs))
+        except WeakPasswordError as e:
+            self._weak_passwords.set(key, str(e))
+            raise
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password, see `get_password_hash`.
+
+        :param password: The password to be hashed.
+        :return: The hashed password.
+        :raises WorkerPoolBusyError: If too many passwords are waiting to be hashed or verified.
+        """
+        return await self.pool.run(get_password_hash, password)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """
+        Check whether a hash should be replaced, because its scheme is deprecated or its cost is not the configured one.
+        This is cheap, the password is not hashed.
+
+        :param hashed_password: The hashed password.
+        :return: True if the password should be hashed again.
+        """
+        return pwd_context.needs_update(hashed_password)
+
+    async def verify(self, plain_password: str, hashed_password: str | None) -> bool:
+        """
+        Verify a password, see `verify_password`.
+        Without a hashed password (e.g. unknown username), the password is verified against a dummy hash,
+        so that every verification has the same cost and does not tell whether the account exists.
+
+        :param plain_password: The plain password to be verified.
+        :param hashed_password: The hashed password to be compared against, None if there is none.
+        :return: True if the plain password matches the hashed password, False otherwise.
+        :raises WorkerPoolBusyError: If too many passwords are waiting to be hashed or verified.
+        """
+        if hashed_password is None:
+            await self.pool.run(verify_password, plain_password, dummy_password_hash())
+            return False
+        return await self.pool.run(verify_password, plain_password, hashed_password)
+
+
+password_service = PasswordService(
+    WorkerPool(settings.PASSWORD_HASHING_WORKERS, settings.PASSWORD_HASHING_QUEUE_SIZE, name="password"),
+    WorkerPool(1, settings.PASSWORD_HASHING_QUEUE_SIZE, name="password-strength"),
+)
+
+
+# Parsed once, the keys are not constructed again for each token
+signing_keys = SigningKeys.load(
+    settings.ALGORITHM, settings.SECRET_KEY, settings.JWT_PRIVATE_KEY, settings.JWT_PUBLIC_KEYS
+)
+
+
+# The claims of the verified tokens, by digest of the token, until their expiration
+token_cache: TTLCache[bytes, dict[str, Any]] = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+
+def decode_access_token(token: str) -> dict[str, Any]:
+    """
+    Verify a token and decode its claims.
+    The claims of a verified token are cached until it expires, so that a token sent again
+    is neither decoded nor verified again. The tokens without expiration are not cached.
+
+    :param token: The encoded token.
+    :return: The claims of the token, shared with the cache, they must not be modified.
+    :raises JWTError: If the token is invalid or expired.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = signing_keys.decode(token)
+        expiration = payload.get("exp")
+        if isinstance(expiration, int | float):
+            token_cache.set(key, payload, ttl=expiration - time.time())
+    return payload
+
+
+def create_access_token(*, subject: int, scopes: list[str], claims: JWTPayloadMapping | None = None) -> str:
     """
     Create an access token for the given subject (user ID).
 
     :param subject: The subject (username) for which the access token is being created.
+    :param claims: The additional claims of the token (e.g. `is_active`, `ver`), see `STATELESS_AUTHENTICATION`.
     :return: The created access token.
     """
     return _create_token(
@@ -61,23 +204,35 @@ def create_access_token(*, subject: int, scopes: list[str]) -> str:
         scopes=scopes,
         expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
         token_type="access_token",
+        claims=claims,
     )
 
 
-def _create_token(subject: int, scopes: list[str], expires_delta: timedelta, token_type: str) -> str:
+def _create_token(
+    subject: int,
+    scopes: list[str],
+    expires_delta: timedelta,
+    token_type: str,
+    claims: JWTPayloadMapping | None = None,
+) -> str:
     """
     Create a JWT token with the given subject, expiration delta, and token type.
 
     :param subject: The subject (user ID) for which the token is being created.
     :param expires_delta: The delta by which to calculate the expiration time of the token.
     :param token_type: The type of token being created (e.g. 'access_token', 'refresh_tocken').
+    :param claims: The additional claims of the token, they cannot override the registered ones.
     :return: The created JWT token.
     """
-    to_encode: JWTPayloadMapping = {  # Following RFC 7519 for registered claims names
+    to_encode: JWTPayloadMapping = {
+        **(claims or {}),
+        # Following RFC 7519 for registered claims names
         "sub": str(subject),
         "scopes": scopes,
         "iat": datetime.now(timezone.utc),
         "exp": datetime.now(timezone.utc) + expires_delta,
         "token_type": token_type,
+        # Identifies the token in the revocation list
+        "jti": uuid4().hex,
     }
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return signing_keys.encode(to_encode)
@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import json
+from collections.abc import MutableMapping, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+
+# The members of the public JWK hashed by the RFC 7638 thumbprint, by key type
+THUMBPRINT_MEMBERS = {"EC": ("crv", "kty", "x", "y"), "RSA": ("e", "kty", "n")}
+
+
+def thumbprint(public_jwk: dict[str, Any]) -> str:
+    """
+    Compute the RFC 7638 thumbprint of a public key, used as its `kid`:
+    the id only depends on the key, every instance of the API derives the same one.
+
+    :param public_jwk: The public key, as a JWK
+    :return: The base64url encoded SHA-256 of the required members of the JWK
+    """
+    members = {name: public_jwk[name] for name in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+@dataclass(frozen=True)
+class SigningKeys:
+    """
+    The keys signing and verifying the tokens, parsed once.
+
+    - HMAC (`HS256`...): the tokens are signed and verified with the shared secret, there is no `kid`.
+    - Asymmetric (`ES256`...): the tokens are signed with the private key and carry its `kid`,
+      they are verified with the public key of their `kid`, so that the tokens signed by the previous keys
+      are still accepted while the keys are rotated. The public keys are published by `jwks`.
+
+    Attributes:
+        algorithm (str): The algorithm of the signatures.
+        signing_key (Key | str): The private key, or the shared secret.
+        kid (str | None): The id of the signing key, None for HMAC.
+        verification_keys (dict[str, Key]): The public keys accepted, by id, the signing one included.
+    """
+
+    algorithm: str
+    signing_key: Key | str
+    kid: str | None = None
+    verification_keys: dict[str, Key] = field(default_factory=dict)
+
+    @classmethod
+    def load(
+        cls, algorithm: str, secret_key: str, private_key: str | None = None, public_keys: Sequence[str] = ()
+    ) -> "SigningKeys":
+        """
+        Parse the keys of the settings.
+
+        :param algorithm: The algorithm of the signatures
+        :param secret_key: The shared secret, used by the HMAC algorithms
+        :param private_key: The PEM private key, required by the asymmetric algorithms
+        :param public_keys: The PEM public keys of the previous private keys, still accepted
+        :return: The parsed keys
+        :raises ValueError: If an asymmetric algorithm has no private key
+        """
+        if algorithm.startswith("HS"):
+            return cls(algorithm=algorithm, signing_key=secret_key)
+        if private_key is None:
+            raise ValueError(f"{algorithm} requires a private key, see JWT_PRIVATE_KEY")
+
+        signing_key = jwk.construct(private_key, algorithm)
+        verification_keys = [signing_key.public_key(), *(jwk.construct(key, algorithm) for key in public_keys)]
+        by_kid = {thumbprint(key.to_dict()): key for key in verification_keys}
+        return cls(
+            algorithm=algorithm,
+            signing_key=signing_key,
+            kid=thumbprint(verification_keys[0].to_dict()),
+            verification_keys=by_kid,
+        )
+
+    def encode(self, claims: MutableMapping[str, Any]) -> str:
+        """
+        Sign claims with the signing key.
+
+        :param claims: The claims
+        :return: The token
+        """
+        headers = {"kid": self.kid} if self.kid is not None else None
+        return jwt.encode(claims, self.signing_key, algorithm=self.algorithm, headers=headers)
+
+    def decode(self, token: str) -> dict[str, Any]:
+        """
+        Verify a token with the key of its `kid` and decode its claims.
+
+        :param token: The token
+        :return: The claims
+        :raises JWTError: If the token is invalid or expired, or its key is unknown
+        """
+        if self.kid is None:
+            return jwt.decode(token, self.signing_key, algorithms=[self.algorithm])
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = self.verification_keys.get(kid) if isinstance(kid, str) else None
+        if key is None:
+            raise JWTError(f"Unknown signing key {kid}")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+    def jwks(self) -> dict[str, list[dict[str, Any]]]:
+        """
+        Get the public keys as a JWK Set (RFC 7517), for the services verifying the tokens themselves.
+        The set is empty for HMAC, the secret is not public.
+        """
+        return {
+            "keys": [
+                {**key.to_dict(), "kid": kid, "use": "sig", "alg": self.algorithm}
+                for kid, key in self.verification_keys.items()
+            ]
+        }
@@ -11,3 +11,14 @@ class SecurityScopes(str, Enum):
     USER = "user"
     MODERATOR = "moderator"
     ADMINISTRATOR = "administrator"
+
+
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
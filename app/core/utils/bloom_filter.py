@@ -0,0 +1,58 @@
+import hashlib
+import math
+from collections.abc import Iterator
+
+
+class BloomFilter:
+    """
+    Set of strings answering "maybe present" or "definitely absent" in constant memory,
+    with a proportion of false positives of about `error_rate` while it holds at most `capacity` items.
+
+    Items cannot be removed, the filter is rebuilt instead.
+    The filter is local to the process, it is not shared between workers.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """
+        :param capacity: The number of items the filter is sized for
+        :param error_rate: The proportion of false positives once `capacity` items are added
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Optimal number of bits and of hash functions, see https://en.wikipedia.org/wiki/Bloom_filter
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray(math.ceil(self.size / 8))
+        self._count = 0
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: the k positions are derived from the two halves of a single digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        """
+        Add an item to the filter.
+
+        :param item: The item
+        """
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def __contains__(self, item: object) -> bool:
+        if not isinstance(item, str):
+            return False
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        """The number of items added to the filter."""
+        return self._count
+
+    def is_full(self) -> bool:
+        """
+        Whether the filter holds `capacity` items, the proportion of false positives grows past `error_rate`.
+        """
+        return self._count >= self.capacity
@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, NamedTuple, TypeVar
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ValueT = TypeVar("ValueT")
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        """The proportion of lookups that were hits, 0 if there was no lookup."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TTLCache(Generic[KeyT, ValueT]):
+    """
+    In-memory cache evicting the least recently used entries when full
+    and the entries older than their time to live.
+
+    The cache is local to the process, it is not shared between workers.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        :param maxsize: The maximum number of entries, 0 disables the cache
+        :param ttl: The default time to live of the entries, in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[KeyT, tuple[float, ValueT]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: KeyT) -> ValueT | None:
+        """
+        Get the value of an entry, and mark it as recently used.
+
+        :param key: The key of the entry
+        :return: The value, None if the entry is missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry[1]
+
+    def set(self, key: KeyT, value: ValueT, ttl: float | None = None) -> None:
+        """
+        Add or replace an entry, evicting the least recently used one if the cache is full.
+
+        :param key: The key of the entry
+        :param value: The value of the entry
+        :param ttl: The time to live of the entry in seconds, defaults to the one of the cache
+        """
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: KeyT) -> None:
+        """
+        Remove an entry if it exists.
+
+        :param key: The key of the entry
+        """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove all the entries and reset the statistics.
+        """
+        self._entries.clear()
+        self._hits = 0
+        self._misses = 0
+
+    def info(self) -> CacheInfo:
+        """
+        Get the statistics of the cache, like `functools.lru_cache`.
+
+        :return: The hits, misses, maximum size and current size of the cache
+        """
+        return CacheInfo(self._hits, self._misses, self.maxsize, len(self._entries))
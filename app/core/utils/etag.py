@@ -0,0 +1,21 @@
+def format_etag(version: int) -> str:
+    """
+    Build the strong entity tag of a versioned record.
+
+    :param version: The version of the record
+    :return: The value of the ETag header
+    """
+    return f'"{version}"'
+
+
+def etag_matches(if_match: str, etag: str) -> bool:
+    """
+    Check an If-Match header against the current entity tag, with the strong comparison of RFC 9110.
+
+    :param if_match: The value of the If-Match header, `*` or a comma separated list of entity tags
+    :param etag: The current entity tag
+    :return: True if the precondition holds
+    """
+    tags = [tag.strip() for tag in if_match.split(",")]
+    # Weak entity tags never match with a strong comparison
+    return "*" in tags or etag in tags
@@ -0,0 +1,66 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Sequence
+from typing import Generic, TypeVar
+
+KeyT = TypeVar("KeyT", bound=Hashable)
+ValueT = TypeVar("ValueT")
+
+
+class BatchLoader(Generic[KeyT, ValueT]):
+    """
+    Loader batching the `load` calls made in the same iteration of the event loop, like a GraphQL DataLoader:
+    the keys requested by concurrent tasks (e.g. with `asyncio.gather`) are loaded by a single call of `batch_load`.
+
+    The batches are loaded one at a time, so that a loader can share a database session,
+    which does not support concurrent operations.
+    """
+
+    def __init__(self, batch_load: Callable[[list[KeyT]], Awaitable[dict[KeyT, ValueT]]]):
+        """
+        :param batch_load: Load the values of a list of keys, the missing keys have no value
+        """
+        self.batch_load = batch_load
+        self._pending: dict[KeyT, asyncio.Future[ValueT | None]] = {}
+        self._lock = asyncio.Lock()
+        # The event loop only keeps weak references to the tasks
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def load(self, key: KeyT) -> ValueT | None:
+        """
+        Load the value of a key, along with the keys requested in the same iteration of the event loop.
+
+        :param key: The key
+        :return: The value, None if the key has no value
+        """
+        future = self._pending.get(key)
+        if future is None:
+            if not self._pending:
+                # The task starts once the tasks that are already ready have requested their keys
+                task = asyncio.create_task(self._dispatch())
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            future = self._pending[key] = asyncio.get_running_loop().create_future()
+        return await future
+
+    async def load_many(self, keys: Sequence[KeyT]) -> list[ValueT | None]:
+        """
+        Load the values of several keys, in a single batch.
+
+        :param keys: The keys
+        :return: The values, in the order of the keys
+        """
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    async def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        async with self._lock:
+            try:
+                values = await self.batch_load(list(batch))
+            except Exception as e:
+                for future in batch.values():
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(values.get(key))
@@ -1,10 +1,20 @@
 import logging
 from enum import Enum
-from typing import Any, Dict, List, Type
-
-from pydantic import ConfigDict
-
-from app.schemas.base import ComparaisonDict, ComparaisonModel, DefaultModel, OptionalModel
+from types import NoneType
+from typing import Any, Dict, List, Type, get_args
+
+from pydantic import BaseModel, ConfigDict
+from pydantic.fields import FieldInfo
+
+from app.core.config import settings
+from app.schemas.base import (
+    ComparaisonDict,
+    ComparaisonModel,
+    DefaultModel,
+    OptionalModel,
+    comma_separated,
+    in_,
+)
 
 logger = logging.getLogger("app.core.utils.misc")
 
@@ -26,6 +36,18 @@ def to_query_parameters(
         {},
     )
 
+    # Each field can be filtered by a list of values, e.g. `username__in=john,jane`, the id included:
+    # it is only excluded from the equality filters, which are served by the endpoints reading a single record
+    for name, field in list(model.model_fields.items()):
+        if name == "id" or name not in exclude:
+            item_type = next((arg for arg in get_args(field.annotation) if arg is not NoneType), field.annotation)
+            NewModel.model_fields[f"{name}__in"] = FieldInfo(
+                # Each value is a bound parameter, as many as the records of a page at most
+                annotation=comma_separated(item_type, max_length=settings.MAX_PAGE_SIZE),
+                default=None,
+                alias=f"{name}__in",
+            )
+
     for key in exclude:
         if key in NewModel.model_fields:
             del NewModel.model_fields[key]
@@ -62,6 +84,8 @@ def process_query_parameters(query_model: DefaultModel) -> dict[str, Any]:
 
             if operator in ComparaisonDict:
                 processed_query_parameters[key][ComparaisonDict[operator]] = value
+            elif operator == "in":
+                processed_query_parameters[key][in_] = value
             else:
                 logger.warning(f"Unknown operator {operator} for key {key}")
         else:
@@ -69,6 +93,42 @@ def process_query_parameters(query_model: DefaultModel) -> dict[str, Any]:
     return processed_query_parameters
 
 
+def parse_fields(model: type[BaseModel], fields: str) -> list[str]:
+    """
+    Parse a sparse fieldset, i.e. a comma separated list of the fields to return.
+    The fields can be given either by name or by alias (e.g. `last_name` or `lastName`).
+
+    :param model: The response model
+    :param fields: The comma separated list of fields
+    :return: The names of the fields, in the order of the model
+    :raises ValueError: If a field is not part of the model
+    """
+    aliases = {field.alias or name: name for name, field in model.model_fields.items() if not field.exclude}
+    names = set(aliases.values())
+    requested: set[str] = set()
+    for field in filter(None, (field.strip() for field in fields.split(","))):
+        if field not in names and field not in aliases:
+            raise ValueError(f"Unknown field {field}")
+        requested.add(aliases.get(field, field))
+    if not requested:
+        raise ValueError("No field requested")
+    return [name for name in model.model_fields if name in requested]
+
+
+def project(model: type[BaseModel], obj: Any, fields: list[str]) -> BaseModel:
+    """
+    Build a partial response model holding only some fields of an object.
+    The values are read from the object as is (they already come from the database),
+    dump the result with `exclude_unset=True` to only serialize these fields.
+
+    :param model: The response model
+    :param obj: The object to read the values from
+    :param fields: The names of the fields to keep
+    :return: The partial model
+    """
+    return model.model_construct(_fields_set=set(fields), **{field: getattr(obj, field) for field in fields})
+
+
 def create_hierarchy_dict(enum: Type[Enum]) -> Dict[str, List[str]]:
     """
     Takes an Enum class and returns a dictionary mapping Enum values to lists of their ancestors in the Enum hierarchy.
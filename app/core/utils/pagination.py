@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any
+
+
+def encode_cursor(sort_key: str, value: Any, id: int) -> str:
+    """
+    Encode the position of the last record of a page into an opaque cursor.
+
+    :param sort_key: The name of the column used to sort the records
+    :param value: The value of the sort column for the last record
+    :param id: The id of the last record, used as a tie-breaker
+    :return: The URL-safe cursor
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_key, value, id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, Any, int]:
+    """
+    Decode a cursor created by `encode_cursor`.
+
+    :param cursor: The cursor to decode
+    :return: The sort key, the value of the sort column and the id of the last record
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, value, id = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor {cursor}") from e
+
+    if not isinstance(sort_key, str) or not isinstance(id, int) or isinstance(id, bool):
+        raise ValueError(f"Invalid cursor {cursor}")
+    # Only JSON scalars can be written by `encode_cursor`
+    if value is not None and not isinstance(value, (str, int, float)):
+        raise ValueError(f"Invalid cursor {cursor}")
+    return sort_key, value, id
@@ -0,0 +1,79 @@
+from collections.abc import AsyncIterable, AsyncIterator
+from typing import Any
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.core.types import StreamFormat
+from app.core.utils.misc import project
+
+STREAM_MEDIA_TYPES = {
+    StreamFormat.NDJSON: "application/x-ndjson",
+    StreamFormat.JSON: "application/json",
+}
+
+
+def serialize(obj: Any, schema: type[BaseModel], fields: list[str] | None = None) -> bytes:
+    """
+    Serialize an object to JSON with the given schema.
+
+    :param obj: The object to serialize
+    :param schema: The Pydantic schema used to validate and serialize the object
+    :param fields: The fields to serialize (sparse fieldset), None for all of them
+    :return: The JSON document
+    """
+    if fields is not None:
+        return project(schema, obj, fields).model_dump_json(by_alias=True, exclude_unset=True).encode()
+    return schema.model_validate(obj).model_dump_json(by_alias=True).encode()
+
+
+async def serialize_stream(
+    objs: AsyncIterable[Any],
+    schema: type[BaseModel],
+    stream_format: StreamFormat,
+    fields: list[str] | None = None,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize the objects one by one as they are produced.
+
+    :param objs: The objects to serialize, e.g. the rows streamed from the database
+    :param schema: The Pydantic schema used to validate and serialize each object
+    :param stream_format: Either one JSON document per line (NDJSON) or a single JSON array
+    :param fields: The fields to serialize (sparse fieldset), None for all of them
+    :return: The chunks of the response body
+    """
+    if stream_format == StreamFormat.NDJSON:
+        async for obj in objs:
+            yield serialize(obj, schema, fields) + b"\n"
+        return
+
+    separator = b"["
+    async for obj in objs:
+        yield separator + serialize(obj, schema, fields)
+        separator = b","
+    # An empty result still has to be a valid JSON array
+    yield b"[]" if separator == b"[" else b"]"
+
+
+def streaming_response(
+    objs: AsyncIterable[Any],
+    schema: type[BaseModel],
+    stream_format: StreamFormat,
+    fields: list[str] | None = None,
+) -> StreamingResponse:
+    """
+    Create a chunked response streaming the given objects.
+
+    The body is pulled from `objs` only when the previous chunk has been sent,
+    so a slow client slows down the database reads instead of filling the memory.
+
+    :param objs: The objects to serialize
+    :param schema: The Pydantic schema used to validate and serialize each object
+    :param stream_format: The format of the response body
+    :param fields: The fields to serialize (sparse fieldset), None for all of them
+    :return: The streaming response
+    """
+    return StreamingResponse(
+        serialize_stream(objs, schema, stream_format, fields),
+        media_type=STREAM_MEDIA_TYPES[stream_format],
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, NamedTuple, TypeVar
+
+ResultT = TypeVar("ResultT")
+
+logger = logging.getLogger("app.core.utils.worker_pool")
+
+
+class WorkerPoolBusyError(RuntimeError):
+    """
+    Raised when the queue of a worker pool is full, the call is not made.
+    """
+
+
+class PoolInfo(NamedTuple):
+    workers: int
+    max_queue: int
+    pending: int
+    completed: int
+    rejected: int
+    queue_wait_total: float
+    queue_wait_max: float
+
+    @property
+    def queue_wait_mean(self) -> float:
+        """The mean time the completed calls waited for a worker, in seconds, 0 if there was no call."""
+        return self.queue_wait_total / self.completed if self.completed else 0.0
+
+
+class WorkerPool:
+    """
+    Bounded pool of threads running the blocking (CPU bound) calls of the event loop, e.g. password hashing.
+
+    At most `max_queue` calls wait for a worker, the next calls are rejected with `WorkerPoolBusyError`
+    instead of piling up, so that a burst fails fast rather than making every caller wait.
+    The time spent by the calls waiting for a worker is measured, see `info`.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, name: str = "worker"):
+        """
+        :param max_workers: The number of threads
+        :param max_queue: The maximum number of calls waiting for a thread
+        :param name: The prefix of the names of the threads
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    async def run(self, fn: Callable[..., ResultT], *args: Any) -> ResultT:
+        """
+        Run a function in a thread of the pool.
+
+        :param fn: The function
+        :param args: The arguments of the function
+        :return: The result of the function
+        :raises WorkerPoolBusyError: If `max_queue` calls are already waiting for a worker
+        """
+        if self._pending >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            logger.warning(f"Worker pool busy, {self._pending} calls pending")
+            raise WorkerPoolBusyError(f"{self._pending} calls pending")
+
+        loop = asyncio.get_running_loop()
+        submitted = time.monotonic()
+        started: list[float] = []
+
+        def call() -> ResultT:
+            started.append(time.monotonic())
+            return fn(*args)
+
+        def done(_future: Future[ResultT]) -> None:
+            # Called by the worker, or by the event loop if the call is cancelled before it starts
+            wait = (started[0] if started else time.monotonic()) - submitted
+            loop.call_soon_threadsafe(self._done, wait)
+
+        self._pending += 1
+        future = self._executor.submit(call)
+        future.add_done_callback(done)
+        # Cancelling the caller cancels the call if it has not started yet
+        return await asyncio.wrap_future(future)
+
+    def _done(self, wait: float) -> None:
+        self._pending -= 1
+        self._completed += 1
+        self._queue_wait_total += wait
+        self._queue_wait_max = max(self._queue_wait_max, wait)
+
+    def info(self) -> PoolInfo:
+        """
+        Get the statistics of the pool, the queue wait is the time between the submission of a call and its start.
+        """
+        return PoolInfo(
+            workers=self.max_workers,
+            max_queue=self.max_queue,
+            pending=self._pending,
+            completed=self._completed,
+            rejected=self._rejected,
+            queue_wait_total=self._queue_wait_total,
+            queue_wait_max=self._queue_wait_max,
+        )
+
+    def shutdown(self) -> None:
+        """
+        Wait for the running calls and stop the threads.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,15 +1,30 @@
-from datetime import datetime, timezone
-from typing import Any, Generic, Sequence, Tuple, Type, TypeVar
-
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable, Iterator, Sequence
+from datetime import datetime
+from enum import Enum
+from math import inf
+from typing import Any, Generic, TypeVar, cast
+
+from sqlalchemy import ColumnElement, Integer, Table, bindparam, delete, func, insert, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.orm import InstrumentedAttribute, load_only, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.sql.expression import Select, select
 
-from app.db.base_class import Base
+from app.core.config import settings
+from app.core.types import CountStrategy
+from app.core.utils.cache import CacheInfo, TTLCache
+from app.core.utils.loader import BatchLoader
+from app.core.utils.pagination import decode_cursor, encode_cursor
+from app.db.base_class import Base, get_model_info
+from app.db.databases.postgres import PostgresDatabase
 from app.db.databases.sqlite import SqliteDatabase
+from app.db.explain import Explain, plan_rows
+from app.db.search import search_params, search_statement, search_terms
 from app.db.select_db import select_db
-from app.schemas.base import DefaultModel
+from app.schemas.base import DefaultModel, in_
 
 
 # SQLAlchemy model representing the object
@@ -18,28 +33,11 @@ ModelT = TypeVar("ModelT", bound=Base)
 CreateSchemaT = TypeVar("CreateSchemaT", bound=DefaultModel)
 # Pydantic validation schema for updating the object
 UpdateSchemaT = TypeVar("UpdateSchemaT", bound=DefaultModel)
+# Statement stored in the statement cache
+StatementT = TypeVar("StatementT")
 
 
-def patch_timezone_sqlite(obj: ModelT) -> ModelT:
-    """
-    Patch the timezone of a datetime object to UTC.
-    If the database is not SQLite, the object is returned unchanged.
-
-    :param obj: The object to patch
-    :return: The patched object
-    """
-    if not isinstance(select_db(), SqliteDatabase):
-        return obj
-
-    for attr in dir(obj):
-        if not attr.startswith("_"):
-            value = getattr(obj, attr)
-            if isinstance(value, datetime):
-                setattr(obj, attr, value.replace(tzinfo=timezone.utc))
-    return obj
-
-
-def apply_distinct(query: Select[Tuple[ModelT]], distinct: InstrumentedAttribute[Any] | None) -> Select[Tuple[ModelT]]:
+def apply_distinct(query: Select[tuple[ModelT]], distinct: InstrumentedAttribute[Any] | None) -> Select[tuple[ModelT]]:
     """
     Apply a distinct clause to a query.
     With SQLite, the distinct clause is applied using the group_by method, while with
@@ -57,6 +55,95 @@ def apply_distinct(query: Select[Tuple[ModelT]], distinct: InstrumentedAttribute
     return query
 
 
+class BulkIntegrityError(IntegrityError):
+    """
+    IntegrityError raised by the bulk operations of `CRUDBase`.
+    The whole operation is rolled back, `failed_rows` maps each row violating a constraint
+    (its index in the input for `create_many`, its id otherwise) to the database error.
+    """
+
+    def __init__(self, error: IntegrityError, failed_rows: dict[Any, BaseException]):
+        super().__init__(error.statement, error.params, error.orig)
+        self.failed_rows = failed_rows
+
+
+def batched(items: Sequence[Any], batch_size: int) -> list[Sequence[Any]]:
+    """
+    Split a sequence in batches of at most `batch_size` items.
+
+    :param items: The sequence to split
+    :param batch_size: The maximum size of a batch
+    :return: The list of batches
+    """
+    return [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def filter_shape(filters: dict[str, Any]) -> Hashable:
+    """
+    Get the shape of filters, i.e. what changes the SQL of the query but not its parameters:
+    the filtered columns, the operators and whether the values are NULL.
+
+    :param filters: The filters, should be in the form of {column_name: value}
+    :return: A hashable description of the filters
+    """
+    return tuple(
+        (
+            column,
+            tuple((operator, operand is None) for operator, operand in value.items())
+            if isinstance(value, dict)
+            else value is None,
+        )
+        for column, value in filters.items()
+    )
+
+
+def filter_params(filters: dict[str, Any]) -> dict[str, Any]:
+    """
+    Get the values of the bound parameters of the filters, see `CRUDBase._build_query`.
+
+    :param filters: The filters, should be in the form of {column_name: value}
+    :return: The bound parameters, by name
+    """
+    params: dict[str, Any] = {}
+    for column, value in filters.items():
+        if isinstance(value, dict):
+            for operator, operand in value.items():
+                params[f"filter_{column}_{operator.__name__}"] = operand
+        else:
+            params[f"filter_{column}"] = value
+    return params
+
+
+def coerce_cursor_value(column: ColumnElement[Any], value: Any) -> Any:
+    """
+    Convert a value decoded from a cursor back to the Python type of the column.
+    Cursors are JSON encoded, so datetimes and enums are stored as strings.
+
+    :param column: The column the value belongs to
+    :param value: The decoded value
+    :return: The value with the type expected by the column
+    """
+    if value is None:
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:  # pragma: no cover
+        return value
+    try:
+        if issubclass(python_type, datetime):
+            return datetime.fromisoformat(value)
+        if issubclass(python_type, Enum):
+            return python_type(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor value {value!r} for {column}") from e
+    # JSON has no distinct integer and float types, and booleans are integers in Python
+    if python_type is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, python_type) or (isinstance(value, bool) and python_type is not bool):
+        raise ValueError(f"Invalid cursor value {value!r} for {column}")
+    return value
+
+
 class CRUDBase(
     Generic[
         ModelT,
@@ -64,58 +151,179 @@ class CRUDBase(
         UpdateSchemaT,
     ]
 ):
-    def __init__(self, model: Type[ModelT]):
+    def __init__(
+        self,
+        model: type[ModelT],
+        batch_size: int = 500,
+        statement_cache_size: int = 128,
+        cache_size: int = 0,
+        cache_ttl: float = 60,
+    ):
         """
         CRUD object with default methods to Create, Read, Update and Delete.
 
         :param model: A SQLAlchemy model class
+        :param batch_size: The default number of rows sent in a single statement by bulk operations
+        :param statement_cache_size: The maximum number of query shapes whose statement is cached
+        :param cache_size: The maximum number of records kept in the read-through cache of `read`, 0 to disable it
+        :param cache_ttl: The time to live of the records in the read-through cache, in seconds
         """
         super().__init__()
         self.model = model
+        self.batch_size = batch_size
+        # Column values of the records read by id, the cache is local to the process so the
+        # writes made by other workers are only seen once the entries expire
+        self.cache: TTLCache[Any, dict[str, Any]] = TTLCache(cache_size, cache_ttl)
+        # Statements never expire, they only depend on the shape of the query
+        self._statements: TTLCache[Hashable, Any] = TTLCache(statement_cache_size, ttl=inf)
+
+    def _cached_statement(self, key: Hashable, build: Callable[[], StatementT]) -> StatementT:
+        """
+        Get a statement from the LRU statement cache, building it on a miss.
+        The cached statements only contain bound parameters, so that they can be reused
+        with other values, and SQLAlchemy also finds their compiled form in its own cache.
+
+        :param key: The shape of the statement
+        :param build: Build the statement
+
+        :return: The statement
+        """
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = build()
+            self._statements.set(key, statement)
+        return statement
+
+    def statement_cache_info(self) -> CacheInfo:
+        """
+        Get the statistics of the statement cache, like `functools.lru_cache`.
+
+        :return: The hits, misses, maximum size and current size of the cache
+        """
+        return self._statements.info()
+
+    def statement_cache_clear(self) -> None:
+        """
+        Empty the statement cache and reset its statistics.
+        """
+        self._statements.clear()
+
+    def _load_columns(self, columns: Sequence[str] | None) -> list[Any]:
+        """
+        Get the loader options restricting the SELECT to the given columns.
+        The id is always loaded, and accessing a column that has not been loaded raises
+        instead of silently emitting another query.
 
-    async def read(self, db: AsyncSession, id: Any, for_update: bool = False) -> ModelT | None:
+        :param columns: The names of the columns to load, None to load the non-deferred columns
+
+        :return: The loader options
+        :raises ValueError: If a column does not exist
+        """
+        if columns is None:
+            return []
+        model_columns = get_model_info(self.model).columns
+        unknown_columns = [column for column in columns if column not in model_columns]
+        if unknown_columns:
+            raise ValueError(f"Unknown columns {unknown_columns}")
+        attributes = [getattr(self.model, column) for column in model_columns if column in columns or column == "id"]
+        return [load_only(*attributes, raiseload=True)]
+
+    async def read(
+        self,
+        db: AsyncSession,
+        id: Any,
+        for_update: bool = False,
+        columns: Sequence[str] | None = None,
+        use_cache: bool = True,
+    ) -> ModelT | None:
         """
         Get a record by id.
 
+        The records are cached in the process (if `cache_size` is set), so that a record updated
+        by another worker can be read up to `cache_ttl` seconds late. Reads whose result must be
+        fresh (e.g. the version checked before an update) have to bypass the cache.
+
         :param db: The database session
         :param id: The record id
         :param for_update: Whether to lock the record for update
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param use_cache: Whether the record can be read from the cache, if False the record is read from
+            the primary database, even if it is already in the session, and the cache is refreshed
 
         :return: The record
         """
-        obj = await db.get(self.model, id, with_for_update=for_update)
-        return patch_timezone_sqlite(obj) if obj else None
+        # Locking reads and partial reads always go to the database, and are not cached
+        cacheable = self.cache.maxsize > 0 and not for_update and columns is None
+        if use_cache and cacheable and db.identity_key(self.model, id) in db.identity_map:
+            # The record already in the session is returned by `get` without a query,
+            # it must not be overwritten by the cached copy
+            cacheable = False
+
+        if use_cache and cacheable and (values := self.cache.get(id)) is not None:
+            # Attach a copy of the cached record to the session without emitting any query
+            cached_obj = self.model(**values)
+            make_transient_to_detached(cached_obj)
+            return await db.merge(cached_obj, load=False)
+
+        obj = await db.get(
+            self.model,
+            id,
+            with_for_update=for_update,
+            options=self._load_columns(columns),
+            populate_existing=not use_cache,
+            # Not from a replica, which can lag behind as much as the cache
+            execution_options={} if use_cache else {"primary": True},
+        )
+        # The reads bypassing the cache refresh it
+        if cacheable and obj is not None and not db.is_modified(obj):
+            self.cache.set(id, dict(obj.attributes))
+        return obj
 
-    async def query(
+    def loader(self, db: AsyncSession) -> BatchLoader[Any, ModelT]:
+        """
+        Get the loader of the records by id of a session: the `load(id)` calls made concurrently
+        (in the same iteration of the event loop) are read by a single `SELECT ... WHERE id IN (...)`.
+        The loader is stored in the session, so it lives as long as the request.
+
+        :param db: The database session
+
+        :return: The loader
+        """
+        key = ("crud_loader", self.model)
+        if key not in db.info:
+
+            async def batch_load(ids: list[Any]) -> dict[Any, ModelT]:
+                return {obj.id: obj for obj in await self.query(db, limit=None, id={in_: ids})}
+
+            db.info[key] = BatchLoader(batch_load)
+        return db.info[key]
+
+    def _build_query(
         self,
-        db: AsyncSession,
         distinct: InstrumentedAttribute[Any] | None = None,
-        skip: int = 0,
-        limit: int | None = 100,
-        **filters,
-    ) -> Sequence[ModelT]:
+        columns: Sequence[str] | None = None,
+        filters: dict[str, Any] | None = None,
+    ) -> Select[tuple[ModelT]]:
         """
-        Get multiple records with filters and distinct option.
+        Build the select statement shared by `query`, `paginate`, `count` and `stream`.
+        The values of the filters are bound parameters named after the filters (see `filter_params`),
+        so the statement only depends on the shape of the filters (see `filter_shape`).
 
-        :param db: The database session
         :param distinct: The distinct option, specify the column name
-        :param skip: The number of records to skip
-        :param limit: The number of records to return
+        :param columns: The columns to load, defaults to all the non-deferred columns
         :param filters: The filters, should be in the form of {column_name: value}
 
-        :return: The list of records
+        :return: The select statement
         """
 
-        # The function first creates a query object using the db.query method, and then
-        # iterates over the filters to apply them to the query using the query.filter method.
-        # The query.distinct method is used to apply the DISTINCT option if specified, and
-        # the query.offset and query.limit methods are used to apply the skip and
-        # limit parameters. Finally, the query.all method is used to execute the query and
-        # return the results as a list of records.
+        # The function first creates a query object using the select function, and then
+        # iterates over the filters to apply them to the query using the query.where method.
+        # The apply_distinct function is used to apply the DISTINCT option if specified.
 
-        query = select(self.model)
+        query = select(self.model).options(*self._load_columns(columns))
 
-        for column, value in filters.items():
+        for column, value in (filters or {}).items():
+            attribute = getattr(self.model, column)
             if isinstance(value, dict):  # Check whether the value of the filter is a dictionary
                 for (
                     operator,
@@ -127,14 +335,295 @@ class CRUDBase(
                     # (e.g. > and <), and the operand variable is used as the operand for
                     # the filter. For example, if the value dictionary contained the items {gt: 10},
                     # (the operator comes from the operator module) the filter applied would be column > 10.
-                    query = query.where(operator(getattr(self.model, column), operand))
+                    # NULL operands are kept as is, so that they are rendered as IS (NOT) NULL.
+                    # The list of an IN is expanded when the statement is executed, whatever its length.
+                    operand = (
+                        None
+                        if operand is None
+                        else bindparam(f"filter_{column}_{operator.__name__}", expanding=operator is in_)
+                    )
+                    query = query.where(operator(attribute, operand))
+            elif value is None:
+                query = query.where(attribute.is_(None))
+            else:
+                query = query.where(attribute == bindparam(f"filter_{column}"))
+
+        return apply_distinct(query, distinct)
+
+    def _filtered_statement(
+        self,
+        kind: Hashable,
+        distinct: InstrumentedAttribute[Any] | None,
+        columns: Sequence[str] | None,
+        filters: dict[str, Any],
+        build: Callable[[Select[tuple[ModelT]]], StatementT],
+    ) -> tuple[StatementT, dict[str, Any]]:
+        """
+        Get the cached statement of a filtered query and its parameters.
+
+        :param kind: What the statement is used for, along with what changes its SQL besides the filters
+        :param distinct: The distinct option, specify the column name
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param filters: The filters, should be in the form of {column_name: value}
+        :param build: Build the final statement from the filtered select statement
+
+        :return: The statement and the parameters of the filters
+        """
+        key = (
+            kind,
+            None if distinct is None else distinct.key,
+            None if columns is None else tuple(columns),
+            filter_shape(filters),
+        )
+        statement = self._cached_statement(key, lambda: build(self._build_query(distinct, columns, filters)))
+        return statement, filter_params(filters)
+
+    async def query(
+        self,
+        db: AsyncSession,
+        distinct: InstrumentedAttribute[Any] | None = None,
+        skip: int = 0,
+        limit: int | None = 100,
+        columns: Sequence[str] | None = None,
+        **filters,
+    ) -> Sequence[ModelT]:
+        """
+        Get multiple records with filters and distinct option.
+
+        :param db: The database session
+        :param distinct: The distinct option, specify the column name
+        :param skip: The number of records to skip
+        :param limit: The number of records to return
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param filters: The filters, should be in the form of {column_name: value}
+
+        :return: The list of records
+        """
+
+        def build(query: Select[tuple[ModelT]]) -> Select[tuple[ModelT]]:
+            query = query.offset(bindparam("crud_skip", type_=Integer))
+            return query if limit is None else query.limit(bindparam("crud_limit", type_=Integer))
+
+        query, params = self._filtered_statement(("query", limit is None), distinct, columns, filters, build)
+
+        objs = await db.execute(query, {**params, "crud_skip": skip, "crud_limit": limit})
+        return objs.scalars().all()
+
+    def _sorted_statement(self, query: Select[tuple[ModelT]], order_by: str, after: bool) -> Select[tuple[ModelT]]:
+        """
+        Sort a statement for the keyset pagination of `paginate`, by `(order_by, id)`.
+
+        :param query: The filtered select statement
+        :param order_by: The name of the column used to sort the records
+        :param after: Whether the page starts after a cursor, given by the `crud_cursor_value`
+            and `crud_cursor_id` bound parameters
+
+        :return: The sorted statement, limited by the `crud_limit` bound parameter
+        """
+        sort_column = getattr(self.model, order_by)
+        if after:
+            last_id = bindparam("crud_cursor_id", type_=self.model.id.type)
+            if order_by == "id":
+                query = query.where(self.model.id > last_id)
+            else:
+                value = bindparam("crud_cursor_value", type_=sort_column.type)
+                # Row value comparison, i.e. WHERE (sort_column, id) > (value, last_id)
+                query = query.where(tuple_(sort_column, self.model.id) > tuple_(value, last_id))
+        return query.order_by(sort_column, self.model.id).limit(bindparam("crud_limit", type_=Integer))
+
+    def query_shapes(
+        self, sample_values: dict[str, Any]
+    ) -> Iterator[tuple[str, Select[tuple[ModelT]], dict[str, Any]]]:
+        """
+        Get the statements generated for each column: filtered by it (as by `query`, `count` and `stream`)
+        and sorted by it (as by `paginate`), e.g. to check with `EXPLAIN` that they are served by an index.
+
+        :param sample_values: A value of each column, bound to the parameters of the filters
+
+        :return: The name of the shape, its statement and its parameters
+        """
+        for column, value in sample_values.items():
+            filters = {column: value}
+            yield f"filter by {column}", self._build_query(filters=filters), filter_params(filters)
+            sorted_query = self._sorted_statement(self._build_query(), column, after=False)
+            yield f"sort by {column}", sorted_query, {"crud_limit": settings.MAX_PAGE_SIZE + 1}
+
+    async def paginate(
+        self,
+        db: AsyncSession,
+        cursor: str | None = None,
+        limit: int | None = None,
+        order_by: str = "id",
+        columns: Sequence[str] | None = None,
+        **filters,
+    ) -> tuple[Sequence[ModelT], str | None]:
+        """
+        Get a page of records using keyset pagination.
+
+        Instead of an OFFSET, the position of the page is given by a cursor encoding the
+        `(order_by, id)` values of the last record of the previous page, so that fetching
+        a page costs the same whatever its depth.
+
+        :param db: The database session
+        :param cursor: The cursor returned with the previous page, None for the first page
+        :param limit: The number of records to return, capped to `settings.MAX_PAGE_SIZE`
+        :param order_by: The name of the column used to sort the records
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param filters: The filters, should be in the form of {column_name: value}
+
+        :return: The list of records and the cursor of the next page (None if it is the last page)
+        :raises ValueError: If the sort key is not sortable or nullable, or if the cursor is invalid
+        """
+        table_columns = self.model.__table__.columns
+        # Only the columns with a `(column, id)` index can be sorted by, see `query_column`
+        # (the deferred columns, which may not be exposed in a cursor, are not sortable)
+        model_info = get_model_info(self.model)
+        if order_by != "id" and order_by not in model_info.sortable:
+            raise ValueError(f"Unknown sort key {order_by}")
+        # The row value comparison of the cursor is never true for a NULL sort key, these rows would be skipped
+        if model_info.nullable[order_by]:
+            raise ValueError(f"Sort key {order_by} is nullable")
+        limit = min(limit or settings.MAX_PAGE_SIZE, settings.MAX_PAGE_SIZE)
+
+        params: dict[str, Any] = {}
+        if cursor is not None:
+            sort_key, value, last_id = decode_cursor(cursor)
+            if sort_key != order_by:
+                raise ValueError(f"Cursor is sorted by {sort_key}, not by {order_by}")
+            params["crud_cursor_value"] = coerce_cursor_value(table_columns[order_by], value)
+            params["crud_cursor_id"] = last_id
+        # Fetch one more record than requested to know whether there is a next page
+        params["crud_limit"] = limit + 1
+
+        # The sort column is needed to build the cursor of the next page
+        query, filters_params = self._filtered_statement(
+            ("paginate", order_by, cursor is not None),
+            None,
+            None if columns is None else [*columns, order_by],
+            filters,
+            lambda query: self._sorted_statement(query, order_by, cursor is not None),
+        )
+        objs = list((await db.execute(query, {**filters_params, **params})).scalars().all())
+
+        next_cursor = None
+        if len(objs) > limit:
+            objs = objs[:limit]
+            last = objs[-1]
+            next_cursor = encode_cursor(order_by, getattr(last, order_by), last.id)
+        return objs, next_cursor
+
+    async def search(
+        self,
+        db: AsyncSession,
+        q: str,
+        limit: int | None = None,
+        columns: Sequence[str] | None = None,
+        **filters,
+    ) -> Sequence[ModelT]:
+        """
+        Search the records whose searchable columns (see `query_column`) match every term of `q`,
+        as a word or as the beginning of a word, most relevant first.
+
+        The matching, the relevance ordering and the limit are all done by the database, using its full-text
+        index (see `app.db.search`), so that the search does not scan the table.
+
+        :param db: The database session
+        :param q: The search query
+        :param limit: The number of records to return, capped to `settings.MAX_PAGE_SIZE`
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param filters: The filters, should be in the form of {column_name: value}
+
+        :return: The list of records, empty if the query has no term
+        :raises ValueError: If the model has no searchable column
+        :raises NotImplementedError: If the database is neither PostgreSQL nor SQLite
+        """
+        searchable = get_model_info(self.model).searchable
+        if not searchable:
+            raise ValueError(f"{self.model.__name__} has no searchable column")
+        if not search_terms(q):
+            return []
+        limit = min(limit or settings.MAX_PAGE_SIZE, settings.MAX_PAGE_SIZE)
+        dialect = db.get_bind().dialect.name
+        table = cast(Table, self.model.__table__)
+
+        def build(query: Select[tuple[ModelT]]) -> Select[tuple[ModelT]]:
+            query = search_statement(dialect, query, table, [table.columns[key] for key in searchable])
+            return query.limit(bindparam("crud_limit", type_=Integer))
+
+        query, params = self._filtered_statement(("search", dialect), None, columns, filters, build)
+        objs = await db.execute(query, {**params, **search_params(q), "crud_limit": limit})
+        return objs.scalars().all()
+
+    async def count(
+        self,
+        db: AsyncSession,
+        strategy: CountStrategy = CountStrategy.EXACT,
+        distinct: InstrumentedAttribute[Any] | None = None,
+        **filters,
+    ) -> int | None:
+        """
+        Count the records matching the filters.
+
+        - `exact` runs a `COUNT(*)` over the filtered query, which scans every matching row.
+        - `estimated` asks the PostgreSQL planner: the table statistics (`pg_class.reltuples`)
+          without filters, the row estimate of `EXPLAIN` otherwise. It falls back to an exact
+          count on other databases or when the table has never been analyzed.
+        - `none` does not count at all.
+
+        :param db: The database session
+        :param strategy: The counting strategy
+        :param distinct: The distinct option, specify the column name
+        :param filters: The filters, should be in the form of {column_name: value}
+
+        :return: The number of records, None with the `none` strategy
+        """
+        if strategy == CountStrategy.NONE:
+            return None
+
+        query, params = self._filtered_statement("select", distinct, None, filters, lambda query: query)
+
+        if strategy == CountStrategy.ESTIMATED and isinstance(select_db(), PostgresDatabase):  # pragma: no cover
+            if not filters and distinct is None:
+                reltuples = await db.scalar(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)"),
+                    {"table": self.model.__tablename__},
+                )
+                # reltuples is -1 until the table is vacuumed or analyzed for the first time
+                if reltuples is not None and reltuples >= 0:
+                    return reltuples
             else:
-                query = query.where(getattr(self.model, column) == value)
+                return plan_rows(await db.scalar(Explain(query), params))
 
-        query = apply_distinct(query, distinct)
+        count_query, params = self._filtered_statement(
+            "count", distinct, None, filters, lambda query: select(func.count()).select_from(query.subquery())
+        )
+        return await db.scalar(count_query, params)
 
-        objs = await db.execute(query.offset(skip).limit(limit))
-        return [patch_timezone_sqlite(obj) for obj in objs.scalars().all()]
+    async def stream(
+        self,
+        db: AsyncSession,
+        distinct: InstrumentedAttribute[Any] | None = None,
+        batch_size: int = 500,
+        columns: Sequence[str] | None = None,
+        **filters,
+    ) -> AsyncIterator[ModelT]:
+        """
+        Iterate over the records matching the filters without loading them all in memory.
+        The records are fetched from a server-side cursor, `batch_size` rows at a time.
+
+        :param db: The database session, it must stay open during the iteration
+        :param distinct: The distinct option, specify the column name
+        :param batch_size: The number of rows fetched from the cursor at a time
+        :param columns: The columns to load, defaults to all the non-deferred columns
+        :param filters: The filters, should be in the form of {column_name: value}
+
+        :return: An asynchronous iterator over the records
+        """
+        query, params = self._filtered_statement("select", distinct, columns, filters, lambda query: query)
+
+        result = await db.stream_scalars(query, params, execution_options={"yield_per": batch_size})
+        async for obj in result:
+            yield obj
 
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaT) -> ModelT:
         """
@@ -149,11 +638,11 @@ class CRUDBase(
         # by_alias=False means that the keys of the dictionary will be the same as the field names in
         # the Pydantic schema in order to match the column names in the database
         obj_in_data = obj_in.model_dump()
-        # Create a new model instance from the input data
-        db_obj = self.model(**obj_in_data)
+        # INSERT ... RETURNING hydrates the new model instance, including the default values
+        # of the columns, in the same round trip (no refresh needed)
+        statement = insert(self.model).values(**obj_in_data).returning(self.model)
         try:
-            # Add the new model instance to the database session
-            db.add(db_obj)
+            db_obj = (await db.scalars(statement)).one()
             # Commit the session to persist the model instance in the database
             await db.commit()
         except IntegrityError as e:
@@ -162,10 +651,83 @@ class CRUDBase(
             await db.rollback()
             # The exception is raised to be handled by the exception handler
             raise e.orig
-        # Refresh the model instance to get the default values for the columns
-        await db.refresh(db_obj)
         # Return the created model instance
-        return patch_timezone_sqlite(db_obj)
+        return db_obj
+
+    async def create_or_conflict(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: CreateSchemaT,
+        index_elements: Sequence[str] | None = None,
+    ) -> ModelT | None:
+        """
+        Create a new record unless it conflicts with an existing one, with a single
+        `INSERT ... ON CONFLICT DO NOTHING RETURNING`: there is no race between a check and the insert.
+
+        :param db: The database session
+        :param obj_in: The record data
+        :param index_elements: The columns of the unique index to check, every unique constraint if None
+
+        :return: The created record, None if it conflicts with an existing record
+        :raises IntegrityError: If the record violates another constraint
+        """
+        dialect = db.get_bind().dialect.name
+        insert_: Callable[..., Any]
+        if dialect == "postgresql":
+            insert_ = postgresql.insert
+        elif dialect == "sqlite":
+            insert_ = sqlite.insert
+        else:
+            raise NotImplementedError(f"ON CONFLICT is not supported by {dialect}")
+        statement = (
+            insert_(self.model)
+            .values(**obj_in.model_dump())
+            .on_conflict_do_nothing(index_elements=index_elements)
+            .returning(self.model)
+        )
+        try:
+            # No row is returned on conflict
+            db_obj = (await db.scalars(statement)).one_or_none()
+            await db.commit()
+        except IntegrityError:
+            # Other constraints (e.g. NOT NULL) are still violations, handled by the exception handler
+            await db.rollback()
+            raise
+        return db_obj
+
+    def _versioned_values(self, values: dict[str, Any]) -> dict[str, Any]:
+        """
+        Add the increment of the version counter to the values of an UPDATE statement, if the model is versioned.
+
+        :param values: The new values of the columns
+
+        :return: The values to update
+        """
+        version_column = get_model_info(self.model).version_column
+        if version_column is None:
+            return values
+        return {**values, version_column: getattr(self.model, version_column) + 1}
+
+    def _update_data(self, obj_in: UpdateSchemaT | dict[str, Any]) -> dict[str, Any]:
+        """
+        Get the fields to update from the input data.
+
+        :param obj_in: The record data
+
+        :return: The fields to update and their new values
+        """
+        # If the input data is a dictionary, use it as the update data
+        # otherwise encode the input data as a dictionary to get the update data
+        if isinstance(obj_in, dict):
+            return obj_in
+        # We only want to update the fields that were actually passed in the request.
+        update_data = obj_in.model_dump(exclude_unset=True)
+        # At this point we have a dict with some None value for non-optional fields, we need to clear them
+        for field, value in list(update_data.items()):
+            if value is None and not self.model.is_optional(field):
+                del update_data[field]
+        return update_data
 
     async def update(
         self,
@@ -173,59 +735,253 @@ class CRUDBase(
         *,
         db_obj: ModelT,
         obj_in: UpdateSchemaT | dict[str, Any],
-    ) -> ModelT:
+    ) -> ModelT | None:
         """
-        Update a record.
+        Update a record, with a single `UPDATE ... RETURNING` refreshing `db_obj`.
 
         :param db: The database session
         :param db_obj: The record to update
         :param obj_in: The record data
 
-        :return: The updated record
+        :return: The updated record, None if it no longer exists
+        :raises IntegrityError: If the record violates a constraint
+        :raises StaleDataError: If the model is versioned and the record was updated since `db_obj` was read
         """
-        # If the input data is a dictionary, use it as the update data
-        # otherwise encode the input data as a dictionary to get the update data
-        if isinstance(obj_in, dict):
-            update_data = obj_in
-        else:
-            # We only want to update the fields that were actually passed in the request.
-            update_data = obj_in.model_dump(exclude_unset=True)
-            # At this point we have a dict with some None value for non-optional fields, we need to clear them
-            for field, value in list(update_data.items()):
-                if value is None and not self.model.is_optional(field):
-                    del update_data[field]
-
-        # Update the fields of the database object with the corresponding
-        # values from the update data
-        for field, _ in db_obj.attributes:
-            if field in update_data:
-                # It means: db_obj.field = update_data[field],
-                # i.e. set the value of the field of the database object to the value of the field in the update data
-                setattr(db_obj, field, update_data[field])
+        update_data = self._update_data(obj_in)
+        model_info = get_model_info(self.model)
+        values = {field: value for field, value in update_data.items() if field in model_info.columns}
 
         try:
-            db.add(db_obj)
+            if values:
+                # The current values are not read, so deferred columns do not need to be loaded
+                statement = (
+                    update(self.model)
+                    .where(self.model.id == db_obj.id)
+                    .values(**self._versioned_values(values))
+                    .returning(self.model)
+                    .execution_options(synchronize_session=False, populate_existing=True)
+                )
+                if model_info.version_column is not None:
+                    # Only update the version that was read, ORM UPDATE statements do not check it by themselves
+                    version_column = getattr(self.model, model_info.version_column)
+                    statement = statement.where(version_column == getattr(db_obj, model_info.version_column))
+                updated_obj = (await db.scalars(statement)).one_or_none()
+                if updated_obj is None and model_info.version_column is not None:
+                    if await db.scalar(select(self.model.id).where(self.model.id == db_obj.id)) is not None:
+                        raise StaleDataError(f"{db_obj} was updated by another transaction")
+                if updated_obj is not None and updated_obj is not db_obj:
+                    # db_obj comes from another session, the returned row is copied into it
+                    for key, value in updated_obj.attributes:
+                        set_committed_value(db_obj, key, value)
+                    updated_obj = db_obj
+            else:
+                updated_obj = db_obj
             await db.commit()
-        except IntegrityError as e:
+        except IntegrityError:
+            # e.g. a unique index, the caller can tell which one was violated
             await db.rollback()
-            raise e.orig
-        await db.refresh(db_obj)
-        return patch_timezone_sqlite(db_obj)
+            raise
+        except StaleDataError:
+            await db.rollback()
+            # The cached record is stale as well
+            self.cache.pop(db_obj.id)
+            raise
+        self.cache.pop(db_obj.id)
+        return updated_obj
 
     async def delete(self, db: AsyncSession, *, id: int) -> ModelT | None:
         """
-        Delete a record.
+        Delete a record, with a single `DELETE ... RETURNING`, the record does not have to be read first.
 
         :param db: The database session
         :param id: The record id
 
-        :return: The deleted record
+        :return: The deleted record, None if it does not exist
         """
-        obj = await db.get(self.model, id)
+        statement = (
+            delete(self.model)
+            .where(self.model.id == id)
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch")
+        )
         try:
-            await db.delete(obj)
+            obj = (await db.scalars(statement)).one_or_none()
+            if obj is not None:
+                # The returned row is loaded as a persistent record, it must not stay in the identity map
+                db.expunge(obj)
             await db.commit()
         except IntegrityError as e:
             await db.rollback()
             raise e.orig
+        self.cache.pop(id)
         return obj
+
+    async def _locate_failed_rows(
+        self,
+        db: AsyncSession,
+        error: IntegrityError,
+        rows: dict[Any, Any],
+        execute_row: Callable[[Any], Awaitable[Any]],
+    ) -> BulkIntegrityError:
+        """
+        Find the rows responsible for the failure of a bulk operation.
+        The operation is rolled back and replayed row by row, each row in its own savepoint,
+        so this extra cost is only paid when a constraint is violated.
+
+        :param db: The database session
+        :param error: The error raised by the bulk operation
+        :param rows: The rows of the operation, indexed by the key used in the report
+        :param execute_row: Execute the operation for a single row
+
+        :return: The error to raise, listing the rows violating a constraint
+        """
+        await db.rollback()
+        failed_rows: dict[Any, BaseException] = {}
+        for key, row in rows.items():
+            try:
+                async with db.begin_nested():
+                    await execute_row(row)
+            except IntegrityError as e:
+                failed_rows[key] = e.orig
+        await db.rollback()
+        return BulkIntegrityError(error, failed_rows)
+
+    async def create_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[CreateSchemaT],
+        batch_size: int | None = None,
+    ) -> Sequence[ModelT]:
+        """
+        Create several records in a single transaction.
+        Each batch is sent as a multi-row `INSERT ... RETURNING`, so that the created records
+        are hydrated without any additional query.
+
+        :param db: The database session
+        :param objs_in: The records data
+        :param batch_size: The number of rows inserted per statement, defaults to `self.batch_size`
+
+        :return: The created records, in the same order as `objs_in`
+        :raises BulkIntegrityError: If some records violate a constraint, nothing is created
+        """
+        data = [obj_in.model_dump() for obj_in in objs_in]
+        statement = insert(self.model).returning(self.model, sort_by_parameter_order=True)
+
+        db_objs: list[ModelT] = []
+        try:
+            for batch in batched(data, batch_size or self.batch_size):
+                db_objs.extend((await db.scalars(statement, batch)).all())
+            await db.commit()
+        except IntegrityError as e:
+            raise await self._locate_failed_rows(
+                db, e, dict(enumerate(data)), lambda row: db.execute(insert(self.model).values(**row))
+            ) from e
+        return db_objs
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: UpdateSchemaT | dict[str, Any],
+        ids: Sequence[Any] | None = None,
+        batch_size: int | None = None,
+        **filters,
+    ) -> Sequence[ModelT]:
+        """
+        Apply the same update to several records in a single transaction.
+        The records are selected either by id, with one `UPDATE ... WHERE id IN (...)` per batch,
+        or by filters, with a single `UPDATE ... WHERE ...`.
+
+        :param db: The database session
+        :param obj_in: The fields to update
+        :param ids: The ids of the records to update
+        :param batch_size: The number of ids per statement, defaults to `self.batch_size`
+        :param filters: The filters, used when `ids` is None, should be in the form of {column_name: value}
+
+        :return: The updated records
+        :raises ValueError: If neither `ids` nor filters are given, or if there is no column to update
+        :raises BulkIntegrityError: If some records violate a constraint, nothing is updated
+        """
+        if ids is None and not filters:
+            # Updating the whole table has to be explicit, e.g. with id={ne: None}
+            raise ValueError("Either ids or filters are required")
+        columns = get_model_info(self.model).columns
+        update_data = {field: value for field, value in self._update_data(obj_in).items() if field in columns}
+        if not update_data:
+            raise ValueError("No column to update")
+        statement = (
+            update(self.model)
+            .values(**self._versioned_values(update_data))
+            .returning(self.model)
+            .execution_options(synchronize_session="fetch", populate_existing=True)
+        )
+
+        params = filter_params(filters)
+        if ids is None:
+            whereclause = self._build_query(filters=filters).whereclause
+            statements = [statement if whereclause is None else statement.where(whereclause)]
+        else:
+            statements = [
+                statement.where(self.model.id.in_(batch)) for batch in batched(ids, batch_size or self.batch_size)
+            ]
+
+        db_objs: list[ModelT] = []
+        try:
+            for batch_statement in statements:
+                db_objs.extend((await db.scalars(batch_statement, params)).all())
+            await db.commit()
+        except IntegrityError as e:
+            if ids is None:
+                await db.rollback()
+                ids = (
+                    await db.scalars(self._build_query(filters=filters).with_only_columns(self.model.id), params)
+                ).all()
+            raise await self._locate_failed_rows(
+                db,
+                e,
+                {id: id for id in ids},
+                lambda id: db.execute(update(self.model).where(self.model.id == id).values(**update_data)),
+            ) from e
+        for db_obj in db_objs:
+            self.cache.pop(db_obj.id)
+        return db_objs
+
+    async def delete_many(
+        self,
+        db: AsyncSession,
+        *,
+        ids: Sequence[Any],
+        batch_size: int | None = None,
+    ) -> Sequence[ModelT]:
+        """
+        Delete several records in a single transaction,
+        with one `DELETE ... WHERE id IN (...) RETURNING` per batch.
+
+        :param db: The database session
+        :param ids: The ids of the records to delete
+        :param batch_size: The number of ids per statement, defaults to `self.batch_size`
+
+        :return: The deleted records, ids that do not exist are ignored
+        :raises BulkIntegrityError: If some records are still referenced, nothing is deleted
+        """
+        db_objs: list[ModelT] = []
+        try:
+            for batch in batched(ids, batch_size or self.batch_size):
+                statement = (
+                    delete(self.model)
+                    .where(self.model.id.in_(batch))
+                    .returning(self.model)
+                    .execution_options(synchronize_session="fetch")
+                )
+                db_objs.extend((await db.scalars(statement)).all())
+            for db_obj in db_objs:
+                db.expunge(db_obj)
+            await db.commit()
+        except IntegrityError as e:
+            raise await self._locate_failed_rows(
+                db, e, {id: id for id in ids}, lambda id: db.execute(delete(self.model).where(self.model.id == id))
+            ) from e
+        for id in ids:
+            self.cache.pop(id)
+        return db_objs
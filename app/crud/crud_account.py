@@ -1,9 +1,93 @@
+from collections.abc import Sequence
+from typing import Any, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import is_hashed_password, password_service
 from app.crud.base import CRUDBase
 from app.models.account import Account
-from app.schemas.account import AccountCreate, AccountUpdate
+from app.schemas.account import AccountCreate, AccountProfile, AccountUpdate
+
+AccountInT = TypeVar("AccountInT", bound=BaseModel | dict[str, Any])
+
+
+class CRUDAccount(CRUDBase[Account, AccountCreate, AccountUpdate]):
+    """
+    The plain passwords are checked by the cheap rules of the schemas, then checked by zxcvbn
+    and hashed here by `password_service`, off the event loop.
+    """
+
+    async def _hash_password(self, obj_in: AccountInT) -> AccountInT:
+        """
+        Check the strength of the password of the account data and hash it, unless it is missing or already hashed.
+
+        :param obj_in: The account data
+        :return: The account data with the hashed password
+        :raises WeakPasswordError: If the password is too weak
+        """
+        data = obj_in if isinstance(obj_in, dict) else obj_in.model_dump()
+        password = data.get("password")
+        if password is None or is_hashed_password(password):
+            return obj_in
+        user_inputs = [data[field] for field in AccountProfile.model_fields if isinstance(data.get(field), str)]
+        await password_service.check_strength(password, user_inputs)
+        hashed_password = await password_service.hash(password)
+        if isinstance(obj_in, dict):
+            return {**obj_in, "password": hashed_password}  # type: ignore[return-value]
+        return obj_in.model_copy(update={"password": hashed_password})
+
+    async def create(self, db: AsyncSession, *, obj_in: AccountCreate) -> Account:
+        return await super().create(db, obj_in=await self._hash_password(obj_in))
+
+    async def create_or_conflict(
+        self, db: AsyncSession, *, obj_in: AccountCreate, index_elements: Sequence[str] | None = None
+    ) -> Account | None:
+        return await super().create_or_conflict(
+            db, obj_in=await self._hash_password(obj_in), index_elements=index_elements
+        )
+
+    async def create_many(
+        self, db: AsyncSession, *, objs_in: Sequence[AccountCreate], batch_size: int | None = None
+    ) -> Sequence[Account]:
+        objs_in = [await self._hash_password(obj_in) for obj_in in objs_in]
+        return await super().create_many(db, objs_in=objs_in, batch_size=batch_size)
+
+    async def update(
+        self, db: AsyncSession, *, db_obj: Account, obj_in: AccountUpdate | dict[str, Any]
+    ) -> Account | None:
+        return await super().update(db, db_obj=db_obj, obj_in=await self._hash_password(obj_in))
+
+    async def update_many(
+        self,
+        db: AsyncSession,
+        *,
+        obj_in: AccountUpdate | dict[str, Any],
+        ids: Sequence[Any] | None = None,
+        batch_size: int | None = None,
+        **filters,
+    ) -> Sequence[Account]:
+        return await super().update_many(
+            db, obj_in=await self._hash_password(obj_in), ids=ids, batch_size=batch_size, **filters
+        )
+
+    async def rehash_password(self, db: AsyncSession, *, id: int, password: str, hashed_password: str) -> bool:
+        """
+        Replace the hash of a password by a new hash, e.g. of the configured cost, see `PasswordService.needs_update`.
+        The password is not checked again, it was accepted when it was set.
 
+        :param db: The database session
+        :param id: The id of the account
+        :param password: The plain password, verified against `hashed_password`
+        :param hashed_password: The current hash, the account is not updated if its password changed since
 
-class CRUDAccount(CRUDBase[Account, AccountCreate, AccountUpdate]): ...
+        :return: True if the hash was replaced
+        """
+        new_hashed_password = await password_service.hash(password)
+        # The new hash is already hashed, `_hash_password` keeps it as is
+        updated = await self.update_many(db, obj_in={"password": new_hashed_password}, id=id, password=hashed_password)
+        return bool(updated)
 
 
-account = CRUDAccount(Account)
+account = CRUDAccount(Account, cache_size=settings.ENTITY_CACHE_SIZE, cache_ttl=settings.ENTITY_CACHE_TTL)
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.utils.bloom_filter import BloomFilter
+from app.crud.base import CRUDBase
+from app.models.revoked_token import RevokedToken
+from app.schemas.token import RevokedTokenCreate
+
+logger = logging.getLogger("app.crud.revoked_token")
+
+# The revocations committed by other workers are read again for this long after their `revoked_at`,
+# so that the slow transactions and the clock drifts between the workers are not missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class CRUDRevokedToken(CRUDBase[RevokedToken, RevokedTokenCreate, RevokedTokenCreate]):
+    """
+    The revoked tokens are kept in a Bloom filter local to the worker, refreshed incrementally by `refresh`:
+    checking a token that is not revoked, the common case, needs no query.
+    A token found in the filter is looked up in the table, the filter has false positives.
+    """
+
+    def __init__(self, *args, capacity: int = 100_000, error_rate: float = 0.001, **kwargs):
+        """
+        :param capacity: The number of revoked tokens the filter is sized for, doubled when exceeded
+        :param error_rate: The proportion of the tokens checked in the table while they are not revoked
+        """
+        super().__init__(*args, **kwargs)
+        self.filter = BloomFilter(capacity, error_rate)
+        # The `revoked_at` of the last revocation read by `refresh`, None until the first refresh
+        self.refreshed_until: datetime | None = None
+        # The tokens revoked by this worker while the filter is rebuilt, added to the new filter
+        self._revoked_during_rebuild: list[str] | None = None
+
+    async def revoke(self, db: AsyncSession, *, jti: str, expires_at: datetime) -> None:
+        """
+        Revoke a token, the tokens already revoked are ignored.
+        The other workers reject the token once they refresh their filter.
+
+        :param db: The database session
+        :param jti: The `jti` claim of the token
+        :param expires_at: The expiration date of the token
+        """
+        await self.create_or_conflict(db, obj_in=RevokedTokenCreate(jti=jti, expires_at=expires_at))
+        self.filter.add(jti)
+        if self._revoked_during_rebuild is not None:
+            self._revoked_during_rebuild.append(jti)
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        """
+        Check whether a token is revoked, the table is only queried if the token is in the filter.
+
+        :param db: The database session
+        :param jti: The `jti` claim of the token
+        :return: True if the token is revoked
+        """
+        if jti not in self.filter:
+            return False
+        # A replica may not have the revocation yet, while this worker already added it to the filter
+        statement = select(exists().where(self.model.jti == jti))
+        return bool(await db.scalar(statement, execution_options={"primary": True}))
+
+    async def refresh(self, db: AsyncSession) -> int:
+        """
+        Add the tokens revoked since the last refresh to the filter, from every worker.
+        The filter is rebuilt without the expired tokens when it is full.
+
+        :param db: The database session
+        :return: The number of revocations read
+        """
+        if self.filter.is_full():
+            return await self.rebuild(db)
+        return await self._load(db, self.filter, self.refreshed_until)
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """
+        Delete the expired revocations and replace the filter by one holding the others,
+        twice as large if they do not fit. The tokens are checked against the previous filter meanwhile.
+
+        :param db: The database session
+        :return: The number of revocations read
+        """
+        self._revoked_during_rebuild = []
+        try:
+            await db.execute(delete(self.model).where(self.model.expires_at < datetime.now(timezone.utc)))
+            await db.commit()
+            remaining = await self.count(db) or 0
+            capacity = self.filter.capacity
+            while remaining >= capacity:
+                capacity *= 2
+            bloom_filter = BloomFilter(capacity, self.filter.error_rate)
+            self.refreshed_until = None
+            loaded = await self._load(db, bloom_filter, None)
+            # Their rows may have been committed after the load
+            for jti in self._revoked_during_rebuild:
+                bloom_filter.add(jti)
+            self.filter = bloom_filter
+        finally:
+            self._revoked_during_rebuild = None
+        logger.info(f"Revocation filter rebuilt for {capacity} tokens, {loaded} revoked")
+        return loaded
+
+    async def _load(self, db: AsyncSession, bloom_filter: BloomFilter, since: datetime | None) -> int:
+        """
+        Add the tokens revoked since a date to a filter, and move `refreshed_until` forward.
+
+        :param db: The database session
+        :param bloom_filter: The filter
+        :param since: The date of the last revocation already read, None to read them all
+        :return: The number of revocations read
+        """
+        statement = select(self.model.jti, self.model.revoked_at).order_by(self.model.revoked_at)
+        if since is not None:
+            statement = statement.where(self.model.revoked_at >= since - REFRESH_OVERLAP)
+        rows = (await db.execute(statement)).all()
+        for jti, revoked_at in rows:
+            # The overlap reads the recent revocations again, they are only counted once
+            if jti not in bloom_filter:
+                bloom_filter.add(jti)
+            self.refreshed_until = revoked_at
+        return len(rows)
+
+    async def watch(self, get_session: Callable[[], AsyncSession], interval: float) -> None:
+        """
+        Refresh the filter every `interval` seconds, until cancelled.
+
+        :param get_session: The factory of the database sessions
+        :param interval: The number of seconds between two refreshes
+        """
+        while True:
+            try:
+                async with get_session() as session:
+                    await self.refresh(session)
+            except Exception:
+                # The filter is refreshed again at the next interval
+                logger.exception("Revocation filter not refreshed")
+            await asyncio.sleep(interval)
+
+
+revoked_token = CRUDRevokedToken(
+    RevokedToken,
+    capacity=settings.REVOCATION_FILTER_CAPACITY,
+    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+)
@@ -1,16 +1,124 @@
-from datetime import datetime
-from typing import Annotated
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Annotated, Any, cast
+
+from sqlalchemy import DateTime, ForeignKey, Index, String, Table, UnicodeText, event
+from sqlalchemy.engine import Dialect
+from sqlalchemy.orm import DeclarativeBase, Mapped, Mapper, configure_mappers, declared_attr, mapped_column
+from sqlalchemy.types import TypeDecorator
+
+from app.db.search import add_search_index
+
+
+class UTCDateTime(TypeDecorator[datetime]):
+    """
+    Timezone aware datetime, always returned in UTC.
+    SQLite has no timezone support and returns naive datetimes, they are stored and read back as UTC.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    @property
+    def python_type(self) -> type[datetime]:
+        return datetime
+
+    def process_bind_param(self, value: datetime | None, dialect: Dialect) -> datetime | None:
+        if value is None:
+            return value
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value: datetime | None, dialect: Dialect) -> datetime | None:
+        if value is None:
+            return value
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
 
-from sqlalchemy import DateTime, ForeignKey, String, UnicodeText, inspect
-from sqlalchemy.orm import DeclarativeBase, Mapped, declared_attr, mapped_column
 
 PrimaryKey = Annotated[int, mapped_column(primary_key=True, nullable=False)]
 Str256 = Annotated[str, mapped_column(String(256), nullable=False)]
 Str512 = Annotated[str, mapped_column(String(512), nullable=False)]
-Datetime = Annotated[datetime, mapped_column(DateTime(timezone=True), nullable=False)]
+Datetime = Annotated[datetime, mapped_column(UTCDateTime(), nullable=False)]
 Text = Annotated[str, mapped_column(UnicodeText, nullable=True)]
 
 
+def query_column(*, sortable: bool = False, searchable: bool = False, **kwargs: Any) -> Any:
+    """
+    Mapped column that the API filters by, sorts by if `sortable` and searches if `searchable`,
+    indexed accordingly.
+
+    A filterable column gets an index on the column, a sortable one a `(column, id)` index matching the
+    `ORDER BY` of the keyset pagination (which also serves the filters on the column). The searchable columns
+    of a model share a full-text index, see `app.db.search.add_search_index`. The indexes are part of the
+    metadata, so that `alembic revision --autogenerate` creates them.
+
+    Args:
+        sortable (bool): Whether the records are sorted by the column.
+        searchable (bool): Whether the column is part of the full-text search of the records.
+        **kwargs: The other arguments of `mapped_column`.
+
+    Returns:
+        The mapped column.
+    """
+    info = {"filterable": True, "sortable": sortable, "searchable": searchable}
+    if not sortable:
+        kwargs.setdefault("index", True)
+    return mapped_column(info=info, **kwargs)
+
+
+@dataclass(frozen=True)
+class ModelInfo:
+    """
+    Column metadata of a model, computed once when its mapper is configured.
+
+    Attributes:
+        columns (tuple[str, ...]): The names of the column attributes, in the order of the table.
+        nullable (dict[str, bool]): Whether each column attribute accepts NULL.
+        datetime_columns (tuple[str, ...]): The names of the datetime column attributes.
+        version_column (str | None): The name of the version counter attribute, None if the model is not versioned.
+        filterable (tuple[str, ...]): The names of the column attributes marked as filterable, see `query_column`.
+        sortable (tuple[str, ...]): The names of the column attributes marked as sortable, see `query_column`.
+        searchable (tuple[str, ...]): The names of the column attributes marked as searchable, see `query_column`.
+    """
+
+    columns: tuple[str, ...]
+    nullable: dict[str, bool]
+    datetime_columns: tuple[str, ...]
+    version_column: str | None = None
+    filterable: tuple[str, ...] = ()
+    sortable: tuple[str, ...] = ()
+    searchable: tuple[str, ...] = ()
+
+
+model_registry: dict[type, ModelInfo] = {}
+
+
+def get_model_info(model: type) -> ModelInfo:
+    """
+    Get the column metadata of a model.
+
+    Args:
+        model (type): The model class.
+
+    Returns:
+        ModelInfo: The column metadata of the model.
+    """
+    if model not in model_registry:
+        # The registry is filled when the mappers are configured, which happens lazily
+        configure_mappers()
+    return model_registry[model]
+
+
+def _is_datetime(column: Any) -> bool:
+    try:
+        return issubclass(column.type.python_type, datetime)
+    except NotImplementedError:  # pragma: no cover
+        return False
+
+
 # Decorate the `Base` class to make it a declarative base class
 class Base(DeclarativeBase):
     # id field for all models
@@ -23,13 +131,15 @@ class Base(DeclarativeBase):
 
     @property
     def attributes(self):
-        """Iterate over the attributes of the model.
+        """Iterate over the loaded column attributes of the model.
+        Deferred columns that have not been loaded are skipped.
 
         Yields:
             Tuple[str, Any]: The name of the attribute and its value.
         """
-        for key, value in inspect(self).attrs.items():
-            yield key, value.value
+        for key in get_model_info(type(self)).columns:
+            if key in self.__dict__:
+                yield key, getattr(self, key)
 
     @classmethod
     def is_optional(cls, attr: str) -> bool:
@@ -41,7 +151,7 @@ class Base(DeclarativeBase):
         Returns:
             bool: True if the attribute is optional, False otherwise.
         """
-        return inspect(cls).attrs[attr].columns[0].nullable
+        return get_model_info(cls).nullable[attr]
 
     def __eq__(self, __value: object) -> bool:
         if not isinstance(__value, self.__class__):
@@ -61,6 +171,56 @@ class Base(DeclarativeBase):
         return dict(self.attributes)
 
 
+class Versioned:
+    """Mixin enabling optimistic concurrency control on a model.
+
+    The `version` column is incremented by each update, and an update made from a stale
+    version of the record fails instead of silently overwriting a concurrent one.
+    see https://docs.sqlalchemy.org/en/20/orm/versioning.html
+    """
+
+    version: Mapped[int] = mapped_column(nullable=False, default=1, server_default="1")
+
+    @declared_attr.directive
+    def __mapper_args__(cls) -> dict[str, Any]:
+        return {"version_id_col": cls.__table__.c.version}  # type: ignore[attr-defined]
+
+
+@event.listens_for(Base, "mapper_configured", propagate=True)
+def register_model_info(mapper: Mapper[Any], cls: type) -> None:
+    """
+    Store the column metadata of a model in `model_registry` once its mapper is configured,
+    so that it is not computed again with `sqlalchemy.inspect` for each row.
+    """
+    column_attrs = [(prop.key, prop.columns[0]) for prop in mapper.column_attrs]
+    model_registry[cls] = ModelInfo(
+        columns=tuple(key for key, _ in column_attrs),
+        nullable={key: bool(column.nullable) for key, column in column_attrs},
+        datetime_columns=tuple(key for key, column in column_attrs if _is_datetime(column)),
+        version_column=next((key for key, column in column_attrs if column is mapper.version_id_col), None),
+        filterable=tuple(key for key, column in column_attrs if column.info.get("filterable")),
+        sortable=tuple(key for key, column in column_attrs if column.info.get("sortable")),
+        searchable=tuple(key for key, column in column_attrs if column.info.get("searchable")),
+    )
+
+
+@event.listens_for(Base, "instrument_class", propagate=True)
+def add_query_indexes(mapper: Mapper[Any], cls: type) -> None:
+    """
+    Add the `(column, id)` index of each sortable column and the full-text index of the searchable columns
+    (see `query_column`) to the table of a model, when the model is declared so that the indexes are in
+    the metadata before the tables are created.
+    """
+    table = cast(Table, mapper.local_table)
+    for column in table.columns:
+        if column.info.get("sortable"):
+            # Creating the index attaches it to the table
+            Index(f"ix_{table.name}_{column.name}_id", column, table.c.id)
+    searchable = [column for column in table.columns if column.info.get("searchable")]
+    if searchable:
+        add_search_index(table, searchable)
+
+
 def build_fk_annotation(class_name: str):
     """
     Build a foreign key annotation for a given class name.
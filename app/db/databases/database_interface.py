@@ -1,13 +1,18 @@
 from abc import ABC, abstractmethod
+from collections.abc import Sequence
 from typing import Any, AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.routing import ReplicaSet
 
 
 class DatabaseInterface(ABC):
-    def __init__(self):
+    def __init__(self) -> None:
         self.async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
         self.async_engine: AsyncEngine | None = None
+        self.replicas: ReplicaSet | None = None
 
     async def __call__(self) -> AsyncGenerator[AsyncSession, Any]:
         """
@@ -32,12 +37,33 @@ class DatabaseInterface(ABC):
     async def drop(self) -> None:  # pragma: no cover
         ...
 
+    def setup_replicas(self, uris: Sequence[str], **engine_kwargs: Any) -> ReplicaSet | None:
+        """
+        Create an engine, with its own connection pool, for each read replica.
+        The sessions send their reads to the replicas when they are given to the sessionmaker
+        with `sync_session_class=RoutingSession`.
+
+        :param uris: The URIs of the replicas
+        :param engine_kwargs: The arguments of `create_async_engine`
+        :return: The replicas, None if there is none
+        """
+        if not uris:
+            self.replicas = None
+        else:
+            self.replicas = ReplicaSet(
+                [create_async_engine(uri, **engine_kwargs) for uri in uris],
+                retry_interval=settings.DATABASE_REPLICA_RETRY_INTERVAL,
+            )
+        return self.replicas
+
     async def shutdown(self) -> None:
         """
-        Close the SQLAlchemy engine.
+        Close the SQLAlchemy engines.
         """
         if self.async_engine:
             await self.async_engine.dispose()
+        if self.replicas:
+            await self.replicas.dispose()
 
     def get_session(self) -> AsyncSession:
         """
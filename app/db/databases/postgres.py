@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 import asyncpg
 from sqlalchemy import URL, text
 from sqlalchemy.ext.asyncio import (
@@ -9,12 +11,14 @@ from sqlalchemy.ext.asyncio import (
 
 from app.core.config import settings
 from app.db.databases.database_interface import DatabaseInterface
+from app.db.routing import RoutingSession
 
 
 class PostgresDatabase(DatabaseInterface):
-    def setup(self) -> async_sessionmaker[AsyncSession]:
+    def setup(self, replica_uris: Sequence[str] = settings.DATABASE_REPLICA_URIS) -> async_sessionmaker[AsyncSession]:
         """
         Create a new SQLAlchemy engine and sessionmaker.
+        Reads are sent to the replicas if there are any, see `RoutingSession`.
         """
         self.async_engine: AsyncEngine = create_async_engine(
             URL.create(
@@ -27,9 +31,12 @@ class PostgresDatabase(DatabaseInterface):
             ),
             pool_pre_ping=True,
         )
+        self.setup_replicas(replica_uris, pool_pre_ping=True)
         self.async_sessionmaker = async_sessionmaker(
             self.async_engine,
             class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=self.replicas,
             expire_on_commit=False,
             autoflush=False,
         )
@@ -1,6 +1,8 @@
 import os
+from collections.abc import Sequence
 from typing import Any
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -12,18 +14,45 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.db.base_class import Base
 from app.db.databases.database_interface import DatabaseInterface
+from app.db.deadline import watch_deadlines
+from app.db.routing import RoutingSession
 
 
 class SqliteDatabase(DatabaseInterface):
-    def setup(self, path: str = settings.DATABASE_URI) -> async_sessionmaker[AsyncSession]:
+    def setup(
+        self, path: str = settings.DATABASE_URI, replica_paths: Sequence[str] = settings.DATABASE_REPLICA_URIS
+    ) -> async_sessionmaker[AsyncSession]:
         """
         Create a new SQLAlchemy engine and sessionmaker.
+        Reads are sent to the replicas if there are any, see `RoutingSession`.
         """
         if settings.ENVIRONMENT == "production":
             raise ValueError("Use migrations in production")
 
         self.async_engine: AsyncEngine = create_async_engine(path)
-        self.async_sessionmaker = async_sessionmaker(self.async_engine, class_=AsyncSession, expire_on_commit=False)
+
+        # The sqlite3 driver only emits BEGIN before DML statements, so a SAVEPOINT would start
+        # (and its RELEASE would commit) a transaction of its own. Let SQLAlchemy emit BEGIN itself.
+        # see https://docs.sqlalchemy.org/en/20/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+        @event.listens_for(self.async_engine.sync_engine, "connect")
+        def do_connect(dbapi_connection: Any, _connection_record: Any) -> None:
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(self.async_engine.sync_engine, "begin")
+        def do_begin(connection: Any) -> None:
+            connection.exec_driver_sql("BEGIN")
+
+        self.setup_replicas(replica_paths)
+        # The statements running past the deadline of their session are interrupted, see `set_deadline`
+        for engine in [self.async_engine, *(self.replicas.engines if self.replicas else [])]:
+            watch_deadlines(engine.sync_engine)
+        self.async_sessionmaker = async_sessionmaker(
+            self.async_engine,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            replicas=self.replicas,
+            expire_on_commit=False,
+        )
         return self.async_sessionmaker
 
     async def drop(self, path: str = settings.DATABASE_URI) -> None:
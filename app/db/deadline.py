@@ -0,0 +1,91 @@
+import math
+import time
+from typing import Any
+
+from sqlalchemy import Connection, Engine, event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, SessionTransaction
+from sqlalchemy.util import await_only
+
+from app.db.routing import RoutingSession
+
+DEADLINE_KEY = "deadline"
+# The number of SQLite virtual machine instructions between two checks of the deadline
+SQLITE_PROGRESS_INTERVAL = 1000
+# The SQLSTATE of a statement cancelled by PostgreSQL (statement_timeout, pg_cancel_backend...)
+QUERY_CANCELED = "57014"
+
+
+def set_deadline(session: Any, seconds: float) -> None:
+    """
+    Limit the time the statements of a session can run, from now.
+    The statements still running at the deadline are cancelled by the database, see `is_deadline_exceeded`.
+
+    :param session: The session (`AsyncSession` or `Session`)
+    :param seconds: The number of seconds before the deadline
+    """
+    session.info[DEADLINE_KEY] = time.monotonic() + seconds
+
+
+def remaining_ms(deadline: float) -> int:
+    """
+    Get the time left before a deadline.
+
+    :param deadline: The deadline, a `time.monotonic` value
+    :return: The number of milliseconds left, at least 1 (a statement_timeout of 0 disables the timeout)
+    """
+    return max(1, math.ceil((deadline - time.monotonic()) * 1000))
+
+
+def is_deadline_exceeded(exc: DBAPIError) -> bool:
+    """
+    Check whether a database error is the cancellation of a statement that ran past its deadline.
+
+    :param exc: The database error
+    :return: True if the statement was cancelled
+    """
+    # asyncpg's errors are adapted with their SQLSTATE, sqlite3's interruptions only have a message
+    return getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED or str(exc.orig) == "interrupted"
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def propagate_deadline(session: Session, _transaction: SessionTransaction, connection: Connection) -> None:
+    """
+    Propagate the deadline of a session to the connection of each of its transactions
+    (the primary or a replica), so that the database cancels the statements running past it.
+
+    - PostgreSQL: `SET LOCAL statement_timeout`, reset at the end of the transaction.
+    - SQLite: the progress handler installed by `watch_deadlines` interrupts the statements.
+    """
+    deadline: float | None = session.info.get(DEADLINE_KEY)
+    if connection.dialect.name == "postgresql":
+        if deadline is not None:
+            connection.exec_driver_sql(f"SET LOCAL statement_timeout = {remaining_ms(deadline)}")
+    elif connection.dialect.name == "sqlite":
+        connection.connection.info[DEADLINE_KEY] = deadline
+
+
+def watch_deadlines(engine: Engine) -> None:
+    """
+    Install a progress handler on the connections of an SQLite engine, interrupting the statements
+    that run past the deadline propagated by `propagate_deadline`.
+
+    :param engine: The (synchronous) engine
+    """
+
+    @event.listens_for(engine, "connect")
+    def install_progress_handler(_dbapi_connection: Any, connection_record: Any) -> None:
+        info = connection_record.info
+
+        def progress_handler() -> bool:
+            # Called by the thread of aiosqlite, a non-zero value interrupts the statement
+            deadline = info.get(DEADLINE_KEY)
+            return deadline is not None and time.monotonic() > deadline
+
+        driver_connection = connection_record.driver_connection
+        await_only(driver_connection.set_progress_handler(progress_handler, SQLITE_PROGRESS_INTERVAL))
+
+    @event.listens_for(engine, "checkin")
+    def reset_deadline(_dbapi_connection: Any, connection_record: Any) -> None:
+        # The next user of the connection may have no deadline, or not use a session
+        connection_record.info.pop(DEADLINE_KEY, None)
@@ -0,0 +1,76 @@
+import json
+from typing import Any
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (FORMAT JSON)` of a statement, keeping its bound parameters.
+    On SQLite, `EXPLAIN QUERY PLAN` is used instead, which returns one row per step of the plan.
+    see https://www.postgresql.org/docs/current/sql-explain.html
+    see https://www.sqlite.org/eqp.html
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: ClauseElement):
+        self.statement = statement
+
+
+def _compile_explain(prefix: str, element: Explain, compiler: Any, **kw: Any) -> str:
+    sql = prefix + compiler.process(element.statement, **kw)
+    # The rows are the plan, the types of the columns of the statement must not be applied to them
+    compiler._result_columns = []
+    return sql
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler: Any, **kw: Any) -> str:
+    return _compile_explain("EXPLAIN (FORMAT JSON) ", element, compiler, **kw)
+
+
+@compiles(Explain, "sqlite")
+def compile_explain_sqlite(element: Explain, compiler: Any, **kw: Any) -> str:
+    return _compile_explain("EXPLAIN QUERY PLAN ", element, compiler, **kw)
+
+
+def plan_rows(plan: Any) -> int:
+    """
+    Get the estimated number of rows returned by a query from its JSON plan.
+
+    :param plan: The output of `Explain`, as a JSON string or as the decoded list
+    :return: The number of rows estimated by the planner
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def unindexed_steps(plan: Any) -> list[str]:
+    """
+    Get the steps of a plan that an index would avoid: full table scans and sorts.
+
+    :param plan: The output of `Explain`, the JSON plan of PostgreSQL (as a string or as the decoded list)
+        or the rows of SQLite
+    :return: The description of the steps, empty if the plan only uses indexes
+    """
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    steps = []
+    if plan and isinstance(plan[0], dict):
+        nodes = [plan[0]["Plan"]]
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                steps.append(f"Seq Scan on {node['Relation Name']}")
+            elif node["Node Type"] in ("Sort", "Incremental Sort"):
+                steps.append(f"{node['Node Type']} on {', '.join(node['Sort Key'])}")
+            nodes.extend(node.get("Plans", []))
+    else:
+        # SQLite rows are (id, parent, notused, detail), an index scan reads "SCAN table USING INDEX ..."
+        for *_, detail in plan:
+            if (detail.startswith("SCAN ") and " USING " not in detail) or detail.startswith("USE TEMP B-TREE"):
+                steps.append(detail)
+    return steps
@@ -0,0 +1,118 @@
+import logging
+import time
+from collections.abc import Sequence
+from itertools import count
+from typing import Any
+
+from sqlalchemy import Engine, event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger("app.db.routing")
+
+
+class ReplicaSet:
+    """
+    Read replicas of a database, chosen with a round-robin.
+
+    A replica that fails to connect (or loses its connection) is skipped
+    for `retry_interval` seconds, then tried again.
+    """
+
+    def __init__(self, engines: Sequence[AsyncEngine], retry_interval: float = 30):
+        """
+        :param engines: The engines of the replicas, each with its own connection pool
+        :param retry_interval: The number of seconds an unhealthy replica is skipped
+        """
+        self.engines = list(engines)
+        self.retry_interval = retry_interval
+        self._unhealthy_until: dict[Engine, float] = {}
+        self._counter = count()
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    def _handle_error(self, context: ExceptionContext) -> None:
+        # No connection means the error happened while connecting
+        if context.engine is not None and (context.is_disconnect or context.connection is None):
+            self.mark_unhealthy(context.engine)
+
+    def mark_unhealthy(self, engine: Engine) -> None:
+        """
+        Skip a replica for `retry_interval` seconds.
+
+        :param engine: The (synchronous) engine of the replica
+        """
+        logger.warning(f"Replica {engine.url.render_as_string()} is unhealthy, skipped for {self.retry_interval}s")
+        self._unhealthy_until[engine] = time.monotonic() + self.retry_interval
+
+    def healthy(self) -> list[Engine]:
+        """
+        Get the replicas that are not skipped.
+
+        :return: The (synchronous) engines of the healthy replicas
+        """
+        now = time.monotonic()
+        return [
+            engine.sync_engine for engine in self.engines if self._unhealthy_until.get(engine.sync_engine, 0) <= now
+        ]
+
+    def choose(self) -> Engine | None:
+        """
+        Choose the replica of the next read.
+
+        :return: The (synchronous) engine of the replica, None if no replica is healthy
+        """
+        healthy = self.healthy()
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    async def dispose(self) -> None:
+        """
+        Close the connection pools of the replicas.
+        """
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session sending plain SELECT statements to the read replicas, and everything else to the primary.
+
+    Once the session has written (a flush, an INSERT, UPDATE or DELETE statement) or locked rows,
+    it is pinned to the primary, so that a request reads its own writes.
+    The reads that must see the latest commits of every worker (e.g. an authorization, or the version checked
+    by an update) are sent to the primary with the `primary` execution option,
+    e.g. `session.get(Model, id, execution_options={"primary": True})`, the session is not pinned by them.
+    see https://docs.sqlalchemy.org/en/20/orm/persistence_techniques.html#custom-vertical-partitioning
+    """
+
+    def __init__(self, *args: Any, replicas: ReplicaSet | None = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.pinned = False
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, primary: bool = False, **kwargs: Any) -> Any:
+        if self.replicas is None or self.pinned:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+
+        is_select = isinstance(clause, Select)
+        if self._flushing or getattr(clause, "is_dml", False) or (is_select and clause._for_update_arg is not None):
+            self.pinned = True
+        elif is_select and not primary:
+            replica = self.replicas.choose()
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def read_from_primary(orm_execute_state: ORMExecuteState) -> None:
+    """
+    Pass the `primary` execution option of a statement to `RoutingSession.get_bind`,
+    which only receives the bind arguments.
+    """
+    if orm_execute_state.execution_options.get("primary", False):
+        orm_execute_state.bind_arguments["primary"] = True
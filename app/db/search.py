@@ -0,0 +1,152 @@
+import re
+from collections.abc import Sequence
+from functools import reduce
+from typing import Any
+
+from sqlalchemy import DDL, Column, ColumnElement, Index, String, Table, bindparam, event, func, or_, text
+from sqlalchemy.sql import Select, column, table
+
+# The `simple` configuration neither stems nor removes stop words, which suits names
+SEARCH_CONFIG = text("'simple'::regconfig")
+
+# The PostgreSQL extensions of the search indexes, created with the tables by `create_all`
+# and before the migrations by alembic/env.py: Alembic does not fire the `before_create` events
+POSTGRESQL_EXTENSIONS = ("pg_trgm",)
+
+
+def create_extension_statements() -> list[str]:
+    """
+    Get the statements creating the PostgreSQL extensions of the search indexes, if they do not exist yet.
+
+    :return: The `CREATE EXTENSION` statements
+    """
+    return [f"CREATE EXTENSION IF NOT EXISTS {extension}" for extension in POSTGRESQL_EXTENSIONS]
+
+
+def search_terms(q: str) -> list[str]:
+    """
+    Split a search query into terms, the other characters (quotes, operators...) are ignored.
+
+    :param q: The search query
+    :return: The lowercase terms
+    """
+    return re.findall(r"[^\W_]+", q.lower())
+
+
+def search_table_name(table: Table) -> str:
+    """
+    Get the name of the SQLite FTS5 table indexing the searchable columns of a table.
+
+    :param table: The table
+    :return: The name of the FTS5 table
+    """
+    return f"{table.name}_search"
+
+
+def search_vector(columns: Sequence[ColumnElement[Any]]) -> ColumnElement[Any]:
+    """
+    Get the PostgreSQL `tsvector` of the searchable columns, indexed by `add_search_index`.
+    The expression of the queries must be the same as the one of the index for the index to be used.
+
+    :param columns: The searchable columns
+    :return: The `tsvector` expression
+    """
+    # concat_ws is not immutable so it can not be indexed, and the literals are not bound parameters,
+    # so that the queries and the index have the same expression
+    values: list[ColumnElement[Any]] = [func.coalesce(searchable, text("''")) for searchable in columns]
+    document = reduce(lambda left, right: left.op("||")(text("' '")).op("||")(right), values)
+    return func.to_tsvector(SEARCH_CONFIG, document)
+
+
+def add_search_index(table: Table, columns: Sequence[Column[Any]]) -> None:
+    """
+    Index the searchable columns of a table.
+
+    - PostgreSQL: a GIN index on the `tsvector` of the columns for the terms and their prefixes,
+      and a GIN `pg_trgm` index on each column for the partial matches (`ILIKE '%...%'`).
+    - SQLite: an external content FTS5 table, kept up to date by triggers.
+
+    :param table: The table
+    :param columns: The searchable columns
+    """
+    Index(f"ix_{table.name}_search", search_vector(columns), postgresql_using="gin").ddl_if(dialect="postgresql")
+    for searchable in columns:
+        Index(
+            f"ix_{table.name}_{searchable.name}_trgm",
+            searchable,
+            postgresql_using="gin",
+            postgresql_ops={searchable.name: "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql")
+    for statement in create_extension_statements():
+        event.listen(table, "before_create", DDL(statement).execute_if(dialect="postgresql"))
+
+    name = search_table_name(table)
+    names = ", ".join(searchable.name for searchable in columns)
+    new_values = ", ".join(f"new.{searchable.name}" for searchable in columns)
+    old_values = ", ".join(f"old.{searchable.name}" for searchable in columns)
+    insert = f"INSERT INTO {name}(rowid, {names}) VALUES (new.id, {new_values});"
+    delete = f"INSERT INTO {name}({name}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    for statement in (
+        # The prefix indexes make the prefix queries of 2 and 3 characters fast
+        f"CREATE VIRTUAL TABLE {name} USING fts5({names}, content='{table.name}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER {name}_insert AFTER INSERT ON {table.name} BEGIN {insert} END",
+        f"CREATE TRIGGER {name}_delete AFTER DELETE ON {table.name} BEGIN {delete} END",
+        f"CREATE TRIGGER {name}_update AFTER UPDATE ON {table.name} BEGIN {delete} {insert} END",
+    ):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    event.listen(table, "after_drop", DDL(f"DROP TABLE IF EXISTS {name}").execute_if(dialect="sqlite"))
+
+
+def search_statement(
+    dialect: str, query: Select[Any], model_table: Table, columns: Sequence[ColumnElement[Any]]
+) -> Select[Any]:
+    """
+    Restrict a statement to the records matching a search, sorted by relevance then by id.
+    The values of the bound parameters are given by `search_params`.
+
+    :param dialect: The name of the dialect of the database
+    :param query: The select statement
+    :param model_table: The table of the records
+    :param columns: The searchable columns
+    :return: The statement
+    :raises NotImplementedError: If the database is neither PostgreSQL nor SQLite
+    """
+    if dialect == "postgresql":
+        vector = search_vector(columns)
+        tsquery = func.to_tsquery(SEARCH_CONFIG, bindparam("crud_search_tsquery"))
+        pattern = bindparam("crud_search_pattern", type_=String)
+        relevance = func.ts_rank(vector, tsquery) + func.greatest(
+            *(func.similarity(searchable, bindparam("crud_search")) for searchable in columns)
+        )
+        return query.where(
+            or_(vector.op("@@")(tsquery), *(searchable.ilike(pattern, escape="\\") for searchable in columns))
+        ).order_by(relevance.desc(), model_table.c.id)
+    if dialect == "sqlite":
+        name = search_table_name(model_table)
+        # The hidden column named after the FTS5 table matches any of its columns
+        search_table = table(name, column("rowid"), column("rank"), column(name))
+        return (
+            query.join(search_table, search_table.c.rowid == model_table.c.id)
+            .where(search_table.c[name].op("MATCH")(bindparam("crud_search_match")))
+            # The rank of FTS5 is the BM25 score, lower is more relevant
+            .order_by(search_table.c.rank, model_table.c.id)
+        )
+    raise NotImplementedError(f"Search is not supported by {dialect}")
+
+
+def search_params(q: str) -> dict[str, Any]:
+    """
+    Get the values of the bound parameters of `search_statement`.
+    Every term has to match the beginning of a word.
+
+    :param q: The search query, with at least one term (see `search_terms`)
+    :return: The bound parameters, by name
+    """
+    terms = search_terms(q)
+    escaped = re.sub(r"([\\%_])", r"\\\1", q.strip())
+    return {
+        "crud_search": q.strip(),
+        "crud_search_pattern": f"%{escaped}%",
+        "crud_search_tsquery": " & ".join(f"{term}:*" for term in terms),
+        "crud_search_match": " ".join(f'"{term}"*' for term in terms),
+    }
@@ -1,14 +1,18 @@
 import logging
-from typing import Annotated, Callable
+from collections.abc import Awaitable, Callable
+from typing import Annotated
 
 from fastapi import Depends, HTTPException, Security, security, status
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.auth import check_scopes, oauth2_scheme
 from app.core.config import settings
+from app.core.security import decode_access_token
 from app.core.types import SecurityScopes
 from app.crud.crud_account import account as accounts
+from app.crud.crud_revoked_token import revoked_token as revoked_tokens
+from app.db.deadline import set_deadline
 from app.db.select_db import select_db
 from app.i18n import get_translation
 from app.models.account import Account
@@ -24,59 +28,84 @@ DBDependency = Annotated[AsyncSession, Depends(get_db)]
 TranslationDependency = Annotated[Callable[[str], str], Depends(get_translation)]
 
 
-async def get_current_account(
+def request_deadline(seconds: float = settings.REQUEST_TIMEOUT) -> Callable[[AsyncSession], Awaitable[None]]:
+    """
+    Create a dependency setting the deadline of the database session of a request, e.g. on a router
+    `APIRouter(dependencies=[Depends(request_deadline(5))])`.
+    The statements still running at the deadline are cancelled by the database and the request fails with a 503,
+    so that a slow query can not hold a connection of the pool indefinitely.
+
+    :param seconds: The number of seconds before the deadline, from the start of the request
+    :return: The dependency
+    """
+
+    async def set_request_deadline(db: DBDependency) -> None:
+        set_deadline(db, seconds)
+
+    return set_request_deadline
+
+
+def credentials_exception(_: Callable[[str], str]) -> HTTPException:
+    """
+    Create the exception raised if the token is invalid (i.e. invalid credentials).
+
+    :param _: The translation function
+
+    :return: The exception
+    """
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=_("AUTHENTICATION_REQUIRED"),
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_token_data(
     security_scopes: security.SecurityScopes,
     db: DBDependency,
     _: TranslationDependency,
     token: str = Depends(oauth2_scheme),
-) -> Account:
+) -> token_schema.TokenData:
     """
-    Get the current account associated with the JWT token in the authorization header.
+    Get the claims of the JWT token in the authorization header, if it grants the security scopes
+    and is not revoked. The tokens without the required scopes are rejected first, and the database
+    is only accessed if the token is in the revocation filter, see `CRUDRevokedToken`.
 
     :param security_scopes: The security scopes
     :param db: The database session (dependency injected)
     :param token: The JWT token in the authorization header (dependency injected)
 
-    :return: The account associated with the JWT token if the token is valid
+    :return: The claims of the token if the token is valid
     """
     authenticate_value = f"Bearer scope={security_scopes.scope_str}"
 
-    # Create an exception to be raised if the token is invalid (i.e. invalid credentials)
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail=_("AUTHENTICATION_REQUIRED"),
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-
     try:
         # Decode the JWT token to get the payload
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        # The claims of a token that was already verified come from the cache
+        payload = decode_access_token(token)
         # Get the id from the payload
         id: str | None = payload.get("sub")
         if id is None:
             # Raise an exception if the id is not in the payload
             logger.debug("Id not in payload")
-            raise credentials_exception
+            raise credentials_exception(_)
 
         # Get the scopes from the payload
         token_scopes = payload.get("scopes", [])
         # Create a `TokenData`` object from the id
-        token_data = token_schema.TokenData(scopes=token_scopes, id=int(id))
+        token_data = token_schema.TokenData(
+            scopes=token_scopes,
+            id=int(id),
+            is_active=payload.get("is_active"),
+            version=payload.get("ver"),
+            jti=payload.get("jti"),
+            expires_at=payload.get("exp"),
+        )
 
     except JWTError as e:
         # Raise an exception if the token cannot be decoded
         logger.debug(f"Token could not be parsed, {e}")
-        raise credentials_exception from e
-
-    # Get the account associated with the username
-    async with db as session:
-        async with session.begin():
-            account = await accounts.read(session, id=token_data.id)
-
-    if account is None:
-        # Raise an exception if the account does not exist
-        logger.debug("Account does not exist")
-        raise credentials_exception
+        raise credentials_exception(_) from e
 
     if not token_scopes or not check_scopes(security_scopes, token_data.scopes):
         if not token_scopes:
@@ -89,6 +118,60 @@ async def get_current_account(
             detail=_("INSUFFICIENT_PERMISSIONS"),
             headers={"WWW-Authenticate": authenticate_value},
         )
+
+    # Checked on each request, the claims of the cached tokens included
+    if token_data.jti is not None:
+        async with db as session:
+            revoked = await revoked_tokens.is_revoked(session, token_data.jti)
+        if revoked:
+            logger.debug("Token is revoked")
+            raise credentials_exception(_)
+    return token_data
+
+
+async def get_current_account(
+    security_scopes: security.SecurityScopes,
+    db: DBDependency,
+    _: TranslationDependency,
+    token: str = Depends(oauth2_scheme),
+) -> Account:
+    """
+    Get the current account associated with the JWT token in the authorization header.
+    The scopes of the token are checked before the account is read.
+
+    :param security_scopes: The security scopes
+    :param db: The database session (dependency injected)
+    :param token: The JWT token in the authorization header (dependency injected)
+
+    :return: The account associated with the JWT token if the token is valid
+    """
+    token_data = await get_token_data(security_scopes, db, _, token)
+
+    # Get the account associated with the username
+    async with db as session:
+        async with session.begin():
+            # The cached account is only used if it has the version of the token, an account updated since
+            # the token was issued is read from the primary. The updates made by another worker after the
+            # account was cached are seen up to ENTITY_CACHE_TTL late
+            account = None
+            if token_data.version is not None:
+                account = await accounts.read(session, id=token_data.id)
+            if account is None or account.version != token_data.version:
+                account = await accounts.read(session, id=token_data.id, use_cache=False)
+
+    if account is None:
+        # Raise an exception if the account does not exist
+        logger.debug("Account does not exist")
+        raise credentials_exception(_)
+
+    if (
+        token_data.version is not None
+        and token_data.version != account.version
+        and (token_data.scopes != [account.scope.value] or token_data.is_active != account.is_active)
+    ):
+        # The account was updated since the token was issued, and the claims of the token are outdated
+        logger.debug("Token claims are outdated")
+        raise credentials_exception(_)
     # Return the account
     return account
 
@@ -117,4 +200,35 @@ async def get_current_active_account(
         )
     return user_account
 
-CurrentAccountDependency = Annotated[Account, Security(get_current_active_account)]
\ No newline at end of file
+
+CurrentAccountDependency = Annotated[Account, Security(get_current_active_account)]
+
+
+async def get_current_active_token_data(
+    token_data: Annotated[token_schema.TokenData, Security(get_token_data, scopes=[SecurityScopes.USER.value])],
+    _: TranslationDependency,
+) -> token_schema.TokenData:
+    """
+    Get the claims of the JWT token in the authorization header, if the account was active when it was issued.
+    Without any database access, see `STATELESS_AUTHENTICATION`.
+
+    :param token_data: The claims of the token (dependency injected)
+
+    :return: The claims of the token if the token is valid and the account is active
+    """
+    if token_data.is_active is None:
+        # The token was issued without the claims of the stateless authentication
+        logger.debug("Token has no is_active claim")
+        raise credentials_exception(_)
+    if token_data.is_active is False:
+        logger.debug("Account is inactive")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=_("INACTIVE_ACCOUNT"),
+        )
+    return token_data
+
+
+# The dependency of the routes that only check the permissions of the caller, e.g. `Security(authorize, scopes=[...])`.
+# The routes that need the account itself depend on `get_current_active_account`, which reads it.
+authorize = get_current_active_token_data if settings.STATELESS_AUTHENTICATION else get_current_active_account
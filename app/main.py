@@ -1,5 +1,6 @@
 """Main module of the API."""
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 import sentry_sdk
@@ -9,12 +10,20 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.routing import APIRoute
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError
 
 from app.api.api import api_router
-from app.api.utils.endpoints import utils_router
+from app.api.utils.endpoints import utils_router, well_known_router
 from app.core.config import settings
-from app.core.exception_handlers import integrity_error_handler
+from app.core.exception_handlers import (
+    deadline_exceeded_handler,
+    integrity_error_handler,
+    weak_password_handler,
+    worker_pool_busy_handler,
+)
+from app.core.password_policy import WeakPasswordError
+from app.core.utils.worker_pool import WorkerPoolBusyError
+from app.crud.crud_revoked_token import revoked_token
 from app.middlewares.i18n import I18nMiddleware
 from app.db.pre_start import pre_start
 from app.dependencies import get_db
@@ -59,7 +68,12 @@ async def lifespan(_app: FastAPI):  # pragma: no cover
     get_db.setup()
     await pre_start()
     logger.info("Database connection established.")
+    # The revocations made by the other workers are read in the background
+    watch_revocations = asyncio.create_task(
+        revoked_token.watch(get_db.get_session, settings.REVOCATION_REFRESH_INTERVAL)
+    )
     yield
+    watch_revocations.cancel()
     logger.info("Closing database connection...")
     await get_db.shutdown()
     logger.info("Database connection closed.")
@@ -96,11 +110,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Link", "X-Next-Cursor", "X-Total-Count"],
 )
 
 app.add_exception_handler(IntegrityError, integrity_error_handler)
+app.add_exception_handler(DBAPIError, deadline_exceeded_handler)
+app.add_exception_handler(WorkerPoolBusyError, worker_pool_busy_handler)
+app.add_exception_handler(WeakPasswordError, weak_password_handler)
 
 app.include_router(utils_router, prefix=settings.API_PREFIX)
+app.include_router(well_known_router)
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
 app.openapi = generate_custom_openapi(app)
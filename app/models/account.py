@@ -1,13 +1,15 @@
-from sqlalchemy.orm import Mapped
+from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.types import SecurityScopes
-from app.db.base_class import Base, Str256, Str512
+from app.db.base_class import Base, Str256, Str512, Versioned, query_column
 
 
-class Account(Base):
-    username: Mapped[Str256]
-    password: Mapped[Str512]
-    scope: Mapped[SecurityScopes]
-    is_active: Mapped[bool]
-    last_name: Mapped[Str256]
-    first_name: Mapped[Str256]
+class Account(Versioned, Base):
+    # Unique index: conflicting usernames are detected by the database, in the same statement as the write
+    username: Mapped[Str256] = query_column(sortable=True, searchable=True, unique=True, index=True)
+    # Deferred: the password hash is only loaded when explicitly requested
+    password: Mapped[Str512] = mapped_column(deferred=True)
+    scope: Mapped[SecurityScopes] = query_column()
+    is_active: Mapped[bool] = query_column()
+    last_name: Mapped[Str256] = query_column(sortable=True, searchable=True)
+    first_name: Mapped[Str256] = query_column(sortable=True, searchable=True)
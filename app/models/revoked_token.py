@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+
+from sqlalchemy.orm import Mapped
+
+from app.db.base_class import Base, Datetime, Str256, query_column
+
+
+class RevokedToken(Base):
+    # The `jti` claim of the revoked token
+    jti: Mapped[Str256] = query_column(unique=True)
+    # The token is rejected anyway once expired, the row can be deleted
+    expires_at: Mapped[Datetime] = query_column()
+    # Read incrementally by the revocation filter of each worker
+    revoked_at: Mapped[Datetime] = query_column(default=lambda: datetime.now(timezone.utc))
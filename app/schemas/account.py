@@ -7,25 +7,26 @@ from pydantic import (
     ValidationInfo,
     computed_field,
 )
-from zxcvbn import zxcvbn
 
-from app.core.security import get_password_hash, is_hashed_password
+from app.core.password_policy import check_password_policy
+from app.core.security import is_hashed_password
 from app.core.types import SecurityScopes
-from app.schemas.base import DefaultModel, ExcludedField
+from app.schemas.base import DefaultModel
 
 
 def validate_password(password: str | None, info: ValidationInfo) -> str | None:
-    """Validate password strength and hash it.
+    """Check the cheap rules of the password policy (length, character classes, common passwords).
+    zxcvbn runs when the account is written, off the event loop, then the password is hashed, see `CRUDAccount`.
 
     Args:
-        password (str): The password to validate and hash.
+        password (str): The password to validate.
         info (FieldValidationInfo): The field validation info.
 
     Raises:
         ValueError: If the password is too weak.
 
     Returns:
-        str: The hashed password.
+        str: The password.
     """
     if password is None:
         return password
@@ -35,21 +36,20 @@ def validate_password(password: str | None, info: ValidationInfo) -> str | None:
         # so it's ok to return it
         return password
 
-    values = info.data
-    # Validate password strength using zxcvbn
-    password_strength = zxcvbn(password, user_inputs=list(values.values()) if values else None)
-    if password_strength["score"] < 4:
-        raise ValueError(f"Password is too weak: {password_strength['feedback']['warning']}")
-    return get_password_hash(password)
+    check_password_policy(password)
+    return password
 
 
 Password = Annotated[str, AfterValidator(validate_password)]
 
 
-class AccountBase(DefaultModel):
+class AccountProfile(DefaultModel):
     username: str = Field(..., min_length=3, max_length=32)
     last_name: str
     first_name: str
+
+
+class AccountBase(AccountProfile):
     password: Password
 
 
@@ -86,15 +86,15 @@ class OwnAccountUpdate(AccountBase):
     model_config = ConfigDict(extra="forbid")
 
 
-class Account(AccountBase):
+class Account(AccountProfile):
     """This this the account model that is linked to the database and used by the API.
+    It has no password field, so that the (deferred) password column is never loaded to build it.
 
     Args:
-        AccountBase: The base model to use.
+        AccountProfile: The base model to use.
     """
 
     id: int
-    password: Password | None = ExcludedField
     scope: SecurityScopes
     is_active: bool
 
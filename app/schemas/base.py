@@ -1,10 +1,18 @@
 from copy import deepcopy
 from datetime import datetime
 from operator import ge, gt, le, lt, ne
-from typing import Any
+from typing import Annotated, Any
 
 from humps import camelize
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PlainSerializer,
+    TypeAdapter,
+    ValidatorFunctionWrapHandler,
+    WrapValidator,
+)
 from pydantic.fields import FieldInfo
 
 
@@ -35,6 +43,37 @@ class OptionalModel(DefaultModel):
         cls.model_rebuild(force=True)
 
 
+def in_(a: Any, b: Any) -> Any:
+    """
+    Same as `a IN b` for a column, named like the functions of the `operator` module.
+    """
+    return a.in_(b)
+
+
+def comma_separated(item_type: Any, max_length: int | None = None) -> Any:
+    """
+    Type of an optional query parameter holding a comma separated list of values, e.g. `1,2,3`,
+    validated as a list of `item_type`.
+    FastAPI only reads lists from the query parameters declared in the signature of the endpoints,
+    this type is a string for FastAPI and a list once validated.
+
+    :param item_type: The type of the values
+    :param max_length: The maximum number of values, unlimited if None
+    :return: The annotated type
+    """
+    adapter = TypeAdapter(Annotated[list[item_type], Field(max_length=max_length)])  # type: ignore[valid-type]
+
+    def validate(value: Any, handler: ValidatorFunctionWrapHandler) -> Any:
+        if value is None:
+            return value
+        if isinstance(value, str):
+            value = [item.strip() for item in value.split(",") if item.strip()]
+        return adapter.validate_python(value)
+
+    # The validated list is dumped as is
+    return Annotated[str | None, WrapValidator(validate), PlainSerializer(lambda value: value)]
+
+
 ComparaisonDict = {
     "gt": gt,
     "lt": lt,
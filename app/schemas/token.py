@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 
 from app.schemas.base import DefaultModel
@@ -11,3 +13,12 @@ class Token(BaseModel):
 class TokenData(DefaultModel):
     id: int | None = None
     scopes: list[str] = []
+    is_active: bool | None = None
+    version: int | None = None
+    jti: str | None = None
+    expires_at: datetime | None = None
+
+
+class RevokedTokenCreate(DefaultModel):
+    jti: str
+    expires_at: datetime
@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic import Field
 
 from app.schemas.base import DefaultModel
@@ -13,3 +15,7 @@ class HealthResponse(DefaultModel):
 
 class VersionResponse(DefaultModel):
     version: str = Field(..., description="Version of the API.")
+
+
+class JWKSResponse(DefaultModel):
+    keys: list[dict[str, Any]] = Field(..., description="Public keys verifying the access tokens (RFC 7517).")
@@ -1,8 +1,15 @@
+import json
 from test.base_test import BaseTest
+from unittest.mock import patch
+
+from sqlalchemy import update
 
 from app.core.config import settings
+from app.core.utils.cache import TTLCache
+from app.core.utils.pagination import encode_cursor
 from app.crud.crud_account import account as crud_account
 from app.dependencies import get_db
+from app.models.account import Account as AccountModel
 from app.schemas.account import Account, AccountCreate, AccountUpdate
 
 
@@ -42,6 +49,220 @@ class TestAccount(BaseTest):
         assert response.status_code == 200
         assert response.json() == []
 
+    async def test_read_accounts_pagination(self):
+        # Arrange
+        async with get_db.get_session() as session:
+            second_account = Account.model_validate(
+                await crud_account.create(
+                    session,
+                    obj_in=AccountCreate(
+                        username="testuser2",
+                        last_name="test",
+                        first_name="user",
+                        password=settings.BASE_ACCOUNT_PASSWORD,
+                    ),
+                )
+            )
+
+        # Act
+        first_response = self._client.get("/api/account/?limit=1")
+        cursor = first_response.headers["X-Next-Cursor"]
+        second_response = self._client.get(f"/api/account/?limit=1&cursor={cursor}")
+
+        # Assert
+        assert first_response.status_code == 200
+        assert first_response.json() == [self.account_db.model_dump(by_alias=True)]
+        assert 'rel="next"' in first_response.headers["Link"]
+        assert f"cursor={cursor}" in first_response.headers["Link"]
+        assert second_response.status_code == 200
+        assert second_response.json() == [second_account.model_dump(by_alias=True)]
+        assert "X-Next-Cursor" not in second_response.headers
+        assert "Link" not in second_response.headers
+
+    def test_read_accounts_count(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?count=exact")
+        filtered_response = self._client.get("/api/account/?count=estimated&username=wrong")
+        no_count_response = self._client.get("/api/account/")
+
+        # Assert
+        assert response.headers["X-Total-Count"] == "1"
+        assert filtered_response.headers["X-Total-Count"] == "0"
+        assert "X-Total-Count" not in no_count_response.headers
+
+    async def test_read_accounts_in(self):
+        # Arrange
+        async with get_db.get_session() as session:
+            second_account = Account.model_validate(
+                await crud_account.create(
+                    session,
+                    obj_in=AccountCreate(
+                        username="testuser2",
+                        last_name="test",
+                        first_name="user",
+                        password=settings.BASE_ACCOUNT_PASSWORD,
+                    ),
+                )
+            )
+
+        # Act
+        response = self._client.get(f"/api/account/?id__in={second_account.id},42")
+        username_response = self._client.get("/api/account/?username__in=testuser,unknown&fields=username")
+        invalid_response = self._client.get("/api/account/?id__in=1,one")
+        ids = ",".join(map(str, range(settings.MAX_PAGE_SIZE + 1)))
+        too_long_response = self._client.get(f"/api/account/?id__in={ids}")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == [second_account.model_dump(by_alias=True)]
+        assert username_response.json() == [{"username": self.account_db.username}]
+        assert invalid_response.status_code == 422
+        assert too_long_response.status_code == 422
+
+    async def test_read_accounts_search(self):
+        # Arrange
+        async with get_db.get_session() as session:
+            second_account = Account.model_validate(
+                await crud_account.create(
+                    session,
+                    obj_in=AccountCreate(
+                        username="janedoe",
+                        last_name="Doe",
+                        first_name="Jane",
+                        password=settings.BASE_ACCOUNT_PASSWORD,
+                    ),
+                )
+            )
+
+        # Act
+        response = self._client.get("/api/account/?q=jane%20do&count=exact")
+        fields_response = self._client.get("/api/account/?q=use&fields=username&sort=username")
+        empty_response = self._client.get("/api/account/?q=unknown")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == [second_account.model_dump(by_alias=True)]
+        assert "X-Total-Count" not in response.headers
+        assert "X-Next-Cursor" not in response.headers
+        assert fields_response.status_code == 200
+        assert fields_response.json() == [{"username": self.account_db.username}]
+        assert empty_response.json() == []
+
+    def test_read_accounts_invalid_sort(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?sort=password&limit=1")
+        fields_response = self._client.get("/api/account/?sort=password&limit=1&fields=id")
+
+        # Assert
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid pagination parameters"}
+        assert fields_response.status_code == 400
+        assert "X-Next-Cursor" not in fields_response.headers
+
+    def test_read_accounts_unindexed_sort(self):
+        # Fields of the response, but without a `(column, id)` index
+        for sort in ("scope", "is_active"):
+            # Act
+            response = self._client.get(f"/api/account/?sort={sort}&limit=1")
+
+            # Assert
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Invalid pagination parameters"}
+
+    def test_read_accounts_forged_cursor(self):
+        # Arrange
+        cursors = [("username", {"a": 1}), ("is_active", [1]), ("username", 42)]
+
+        for sort, value in cursors:
+            # Act
+            response = self._client.get(f"/api/account/?cursor={encode_cursor(sort, value, 1)}&sort={sort}")
+
+            # Assert
+            assert response.status_code == 400
+            assert response.json() == {"detail": "Invalid pagination parameters"}
+
+    def test_read_accounts_invalid_cursor(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?cursor=invalid")
+
+        # Assert
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid pagination parameters"}
+
+    def test_read_accounts_limit_too_large(self):
+        # Arrange
+        # Act
+        response = self._client.get(f"/api/account/?limit={settings.MAX_PAGE_SIZE + 1}")
+
+        # Assert
+        assert response.status_code == 422
+
+    def test_read_accounts_stream_ndjson(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?stream=ndjson")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            self.account_db.model_dump(by_alias=True, mode="json")
+        ]
+
+    def test_read_accounts_stream_json(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?stream=json")
+        empty_response = self._client.get("/api/account/?stream=json&username=wrong")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == [self.account_db.model_dump(by_alias=True)]
+        assert empty_response.json() == []
+
+    def test_read_accounts_fields(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?fields=id,lastName,is_active")
+        stream_response = self._client.get("/api/account/?fields=username&stream=ndjson")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == [
+            {"id": self.account_db.id, "lastName": self.account_db.last_name, "isActive": self.account_db.is_active}
+        ]
+        assert json.loads(stream_response.text) == {"username": self.account_db.username}
+
+    def test_read_accounts_invalid_fields(self):
+        # Arrange
+        # Act
+        response = self._client.get("/api/account/?fields=password")
+
+        # Assert
+        assert response.status_code == 400
+        assert response.json() == {"detail": "Invalid fields"}
+
+    def test_read_account_fields(self):
+        # Arrange
+        # Act
+        response = self._client.get(f"/api/account/{self.account_db.id}?fields=username,scope")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"username": self.account_db.username, "scope": self.account_db.scope.value}
+
+    async def test_read_account_password_deferred(self):
+        # Arrange
+        # Act
+        account = await self.read_account_from_db(self.account_db.id)
+
+        # Assert
+        assert account is not None
+        assert "password" not in account.__dict__
+
     def test_read_account(self):
         # Arrange
         # Act
@@ -79,6 +300,21 @@ class TestAccount(BaseTest):
         assert account_in_db is not None
         assert account_in_db.username == new_account_create.username
 
+    async def test_create_account_weak_password(self):
+        # Arrange
+        account = {"username": "testuser2", "lastName": "doe", "firstName": "john"}
+
+        # Act
+        long_response = self._client.post("/api/account/", json={**account, "password": "a1" * 5000})
+        weak_response = self._client.post("/api/account/", json={**account, "password": "Doejohn1990"})
+
+        # Assert, the long password is rejected by the schema, without running zxcvbn
+        assert long_response.status_code == 422
+        assert "Password is too long" in long_response.text
+        assert weak_response.status_code == 422
+        assert weak_response.json() == {"detail": "The password is too weak"}
+        assert await self.read_account_from_db(self.account_db.id + 1) is None
+
     async def test_create_account_username_already_exists(self):
         # Arrange
         new_account_create = AccountCreate(
@@ -111,6 +347,39 @@ class TestAccount(BaseTest):
         assert account_in_db is not None
         assert account_in_db.last_name == account_update.last_name
 
+    def test_update_account_if_match(self):
+        # Arrange
+        etag = self._client.get(f"/api/account/{self.account_db.id}").headers["ETag"]
+
+        # Act
+        response = self._client.put(
+            f"/api/account/{self.account_db.id}",
+            json=AccountUpdate(last_name="changed").model_dump(by_alias=True),
+            headers={"If-Match": etag},
+        )
+        stale_response = self._client.put(
+            f"/api/account/{self.account_db.id}",
+            json=AccountUpdate(last_name="stale").model_dump(by_alias=True),
+            headers={"If-Match": etag},
+        )
+
+        # Assert
+        assert etag == '"1"'
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        assert stale_response.status_code == 412
+        assert stale_response.json() == {"detail": "The resource has been modified, reload it and try again"}
+
+    def test_read_account_fields_etag(self):
+        # Arrange
+        # Act
+        response = self._client.get(f"/api/account/{self.account_db.id}?fields=username")
+
+        # Assert
+        assert response.status_code == 200
+        assert response.json() == {"username": self.account_db.username}
+        assert response.headers["ETag"] == '"1"'
+
     def test_update_account_not_found(self):
         # Arrange
         account_update = AccountUpdate(last_name="changed")
@@ -163,3 +432,79 @@ class TestAccount(BaseTest):
         # Assert
         assert response.status_code == 404
         assert response.json() == {"detail": "Element not found"}
+
+
+class TestAccountEntityCache(BaseTest):
+    """The account endpoints with the entity cache enabled, as in production."""
+
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        cache_patcher = patch.object(crud_account, "cache", TTLCache(10, 60))
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+        async with get_db.get_session() as session:
+            self.account_db = Account.model_validate(
+                await crud_account.create(
+                    session,
+                    obj_in=AccountCreate(
+                        username="testuser",
+                        last_name="test",
+                        first_name="user",
+                        password=settings.BASE_ACCOUNT_PASSWORD,
+                    ),
+                )
+            )
+            # Cache the account
+            await crud_account.read(session, self.account_db.id)
+
+    async def update_in_another_worker(self):
+        # The write does not go through this process, so the cached account is not invalidated
+        async with get_db.get_session() as session:
+            await session.execute(
+                update(AccountModel)
+                .where(AccountModel.id == self.account_db.id)
+                .values(last_name="external", version=AccountModel.version + 1)
+            )
+            await session.commit()
+
+    async def test_read_account_stale_etag(self):
+        # Arrange
+        await self.update_in_another_worker()
+
+        # Act
+        response = self._client.get(f"/api/account/{self.account_db.id}")
+        update_response = self._client.put(
+            f"/api/account/{self.account_db.id}",
+            json=AccountUpdate(first_name="changed").model_dump(by_alias=True),
+            headers={"If-Match": response.headers["ETag"]},
+        )
+        read_again_response = self._client.get(f"/api/account/{self.account_db.id}")
+
+        # Assert, the cached version is rejected and the account read by the update is cached instead
+        assert response.headers["ETag"] == '"1"'
+        assert update_response.status_code == 412
+        assert read_again_response.headers["ETag"] == '"2"'
+        assert read_again_response.json()["lastName"] == "external"
+
+    async def test_update_account_not_cached(self):
+        # Arrange
+        await self.update_in_another_worker()
+
+        # Act
+        response = self._client.put(
+            f"/api/account/{self.account_db.id}",
+            json=AccountUpdate(first_name="changed").model_dump(by_alias=True),
+        )
+        if_match_response = self._client.put(
+            f"/api/account/{self.account_db.id}",
+            json=AccountUpdate(first_name="changed again").model_dump(by_alias=True),
+            headers={"If-Match": '"3"'},
+        )
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"3"'
+        assert response.json()["lastName"] == "external"
+        assert if_match_response.status_code == 200
+        assert if_match_response.headers["ETag"] == '"4"'
@@ -1,6 +1,11 @@
 from test.base_test import BaseTest
+from unittest.mock import patch
+
+from sqlalchemy.orm.exc import StaleDataError
 
 from app.core.config import settings
+from app.core.security import pwd_context, verify_password
+from app.core.utils.worker_pool import WorkerPoolBusyError
 from app.crud.crud_account import account as crud_account
 from app.dependencies import get_db
 from app.schemas.account import Account, AccountCreate, AccountUpdate, OwnAccountUpdate
@@ -61,6 +66,49 @@ class TestAccount(BaseTest):
         assert response.status_code == 200
         assert response.json().get("access_token") is not None
 
+    async def test_login_rehashes_password(self):
+        # Arrange, the password was hashed with another cost
+        old_hashed_password = pwd_context.handler("bcrypt").using(rounds=settings.PASSWORD_HASHING_ROUNDS + 1).hash(
+            settings.BASE_ACCOUNT_PASSWORD
+        )
+        async with get_db.get_session() as session:
+            account_in_db = await crud_account.read(session, self.account_db.id)
+            assert account_in_db is not None
+            await crud_account.update(
+                session, db_obj=account_in_db, obj_in={"password": old_hashed_password, "is_active": True}
+            )
+
+        # Act, the background tasks run before the test client returns
+        response = self.get_access_token()
+
+        # Assert
+        assert response
+        async with get_db.get_session() as session:
+            account_in_db = await crud_account.read(session, self.account_db.id, columns=["password"], use_cache=False)
+            assert account_in_db is not None
+            assert account_in_db.password != old_hashed_password
+            assert not pwd_context.needs_update(account_in_db.password)
+            assert verify_password(settings.BASE_ACCOUNT_PASSWORD, account_in_db.password)
+        assert f"Password of account {self.account_db.id} rehashed" in self._caplog.text
+
+    async def test_login_rehash_pool_busy(self):
+        # Arrange
+        await self.activate_account(self.account_db.id)
+
+        # Act
+        with patch("app.core.security.PasswordService.needs_update", return_value=True), patch(
+            "app.crud.crud_account.CRUDAccount.rehash_password", side_effect=WorkerPoolBusyError
+        ):
+            response = self._client.post(
+                "/api/auth/login/",
+                data={"username": self.account_db.username, "password": settings.BASE_ACCOUNT_PASSWORD},
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+
+        # Assert, the login succeeds anyway
+        assert response.status_code == 200
+        assert f"Password of account {self.account_db.id} not rehashed" in self._caplog.text
+
     async def test_login_unknown_account(self):
         # Arrange
         # Act
@@ -109,6 +157,36 @@ class TestAccount(BaseTest):
         assert response.json() == {"detail": "Invalid credentials"}
         assert "Account testuser is not active" in self._caplog.text
 
+    async def test_login_verifies_password_once(self):
+        # Arrange, every attempt costs exactly one verification, whether the account exists or not
+        attempts = [
+            ("unknown", settings.BASE_ACCOUNT_PASSWORD),
+            (self.account_db.username, "wrong password"),
+            (self.account_db.username, settings.BASE_ACCOUNT_PASSWORD),  # inactive
+        ]
+        with patch("app.core.security.verify_password", wraps=verify_password) as verify:
+            for username, password in attempts:
+                # Act
+                response = self._client.post(
+                    "/api/auth/login/",
+                    data={"username": username, "password": password},
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                )
+
+                # Assert
+                assert response.status_code == 401
+                assert verify.call_count == 1
+                verify.reset_mock()
+
+            await self.activate_account(self.account_db.id)
+            response = self._client.post(
+                "/api/auth/login/",
+                data={"username": self.account_db.username, "password": settings.BASE_ACCOUNT_PASSWORD},
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+            )
+            assert response.status_code == 200
+            assert verify.call_count == 1
+
     async def test_read_account_me(self):
         # Arrange
         self.wipe_dependencies_overrides()
@@ -127,6 +205,21 @@ class TestAccount(BaseTest):
         assert account_in_db is not None
         assert response.json() == account_in_db.model_dump(by_alias=True)
 
+    async def test_logout(self):
+        # Arrange
+        self.wipe_dependencies_overrides()
+        await self.activate_account(self.account_db.id)
+        token = self.get_access_token()
+        other_token = self.get_access_token()
+
+        # Act
+        response = self._client.post("/api/auth/logout/", headers={"Authorization": f"Bearer {token}"})
+
+        # Assert, only the token of the request is revoked
+        assert response.status_code == 204
+        assert self._client.get("/api/auth/me/", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+        assert self._client.get("/api/auth/me/", headers={"Authorization": f"Bearer {other_token}"}).status_code == 200
+
     async def test_update_account_me(self):
         # Arrange
         self.wipe_dependencies_overrides()
@@ -150,6 +243,30 @@ class TestAccount(BaseTest):
         assert account_in_db is not None
         assert account_in_db.last_name == modified_account.last_name
 
+    async def test_update_account_me_concurrent_update(self):
+        # Arrange
+        self.wipe_dependencies_overrides()
+        await self.activate_account(self.account_db.id)
+        token = self.get_access_token()
+        modified_account = OwnAccountUpdate(
+            last_name="changed",
+        )
+
+        # Act
+        with patch.object(crud_account, "update", side_effect=StaleDataError("stale version")):
+            response = self._client.put(
+                "/api/auth/me/",
+                json=modified_account.model_dump(by_alias=True),
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        account_in_db = await self.read_account_from_db(self.account_db.id)
+
+        # Assert
+        assert response.status_code == 412
+        assert response.json() == {"detail": "The resource has been modified, reload it and try again"}
+        assert account_in_db is not None
+        assert account_in_db.last_name == self.account_db.last_name
+
     async def test_update_account_me_username_already_exists(self):
         # Arrange
         self.wipe_dependencies_overrides()
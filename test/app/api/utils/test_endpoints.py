@@ -17,3 +17,11 @@ def test_version(client: TestClient):
     response = client.get("/api/version")
     assert response.status_code == 200
     assert "version" in response.json()
+
+
+def test_jwks(client: TestClient):
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    # The tests sign the tokens with a shared secret, which is not published
+    assert response.json() == {"keys": []}
+    assert response.headers["Cache-Control"] == "public, max-age=300"
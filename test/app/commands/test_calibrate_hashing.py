@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+from app.commands.calibrate_hashing import MIN_ROUNDS, calibrate_hashing, hash_duration, write_setting
+
+
+def test_hash_duration():
+    assert hash_duration(4) > 0
+
+
+def test_write_setting(tmp_path):
+    path = str(tmp_path / ".env")
+    write_setting(path, "PASSWORD_HASHING_ROUNDS", "11")
+    with open(path, "a") as file:
+        file.write("OTHER=value\n")
+
+    write_setting(path, "PASSWORD_HASHING_ROUNDS", "12")
+
+    with open(path) as file:
+        assert file.read() == "OTHER=value\nPASSWORD_HASHING_ROUNDS=12\n"
+
+
+@patch("app.commands.calibrate_hashing.hash_duration", side_effect=lambda rounds: 60 * 2 ** (rounds - 10))
+def test_calibrate_hashing(mock_hash_duration, tmp_path):
+    path = str(tmp_path / ".env")
+
+    # 60, 120 and 240 ms fit the budget, 480 ms does not
+    assert calibrate_hashing(250, path) == 12
+
+    with open(path) as file:
+        assert file.read() == "PASSWORD_HASHING_ROUNDS=12\n"
+    assert [call.args[0] for call in mock_hash_duration.call_args_list] == [10, 11, 12, 13]
+
+
+@patch("app.commands.calibrate_hashing.hash_duration", return_value=500)
+def test_calibrate_hashing_over_budget(_mock_hash_duration, tmp_path, caplog):
+    # The cost never goes below the minimum
+    assert calibrate_hashing(250, str(tmp_path / ".env")) == MIN_ROUNDS
+    assert "over the budget of 250 ms" in caplog.text
@@ -0,0 +1,17 @@
+from test.base_test import BaseTest
+
+from app.commands.index_advisor import index_advisor
+
+
+class TestIndexAdvisor(BaseTest):
+    async def test_index_advisor(self):
+        # Act
+        report = await index_advisor()
+
+        # Assert
+        # The query columns are indexed, the version is not
+        assert report["account"] == {
+            "filter by version": ["SCAN account"],
+            "sort by version": ["SCAN account", "USE TEMP B-TREE FOR ORDER BY"],
+        }
+        assert "account: filter by version needs an index (SCAN account)" in self._caplog.text
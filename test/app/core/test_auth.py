@@ -1,6 +1,20 @@
+from enum import Enum
+from typing import Annotated
+
+import pytest
+from fastapi import FastAPI, Security
 from fastapi.security import SecurityScopes
 
-from app.core.auth import check_scopes
+from app.core.auth import (
+    check_scopes,
+    compile_hierarchy,
+    compile_route_scopes,
+    compile_scopes,
+    granted_mask,
+    required_mask,
+    required_masks,
+)
+from app.core.utils.misc import create_hierarchy_dict
 
 
 def test_check_scopes():
@@ -23,3 +37,58 @@ def test_check_scopes():
     # Test that a token with "administrator" scope can access an endpoint that requires "moderator" scope
     security_scopes = SecurityScopes(scopes=["moderator"])
     assert check_scopes(security_scopes, ["administrator"]) is True
+
+
+def test_check_scopes_several():
+    # An endpoint requiring "administrator", below a dependency requiring "user"
+    security_scopes = SecurityScopes(scopes=["administrator", "user"])
+    assert check_scopes(security_scopes, ["administrator"]) is True
+    assert check_scopes(security_scopes, ["moderator"]) is False
+    assert check_scopes(security_scopes, ["user", "administrator"]) is True
+
+    # The unknown scopes of a token grant nothing
+    assert check_scopes(SecurityScopes(scopes=["user"]), ["unknown"]) is False
+
+
+def test_compile_scopes():
+    assert granted_mask(["user"]) == 0b001
+    assert granted_mask(["moderator"]) == 0b011
+    assert granted_mask(["administrator"]) == 0b111
+    assert compile_scopes(["administrator", "user"]) == 0b101
+
+    with pytest.raises(ValueError):
+        compile_scopes(["unknown"])
+
+
+def test_compile_hierarchy_more_scopes():
+    class Hierarchy(Enum):
+        guest = 1
+        user = 2
+        editor = 3
+        moderator = 4
+        administrator = 5
+
+    bits, granted = compile_hierarchy(create_hierarchy_dict(Hierarchy))
+
+    assert bits == {"guest": 1, "user": 2, "editor": 4, "moderator": 8, "administrator": 16}
+    assert granted["editor"] == 0b00111
+    assert granted["editor"] & bits["moderator"] == 0
+    assert granted["administrator"] & bits["moderator"] == bits["moderator"]
+
+
+def test_compile_route_scopes():
+    app = FastAPI()
+
+    async def dependency(security_scopes: SecurityScopes) -> str:
+        return security_scopes.scope_str
+
+    @app.get("/")
+    async def route(scopes: Annotated[str, Security(dependency, scopes=["moderator", "user"])]) -> str:
+        return scopes
+
+    required_masks.pop("moderator user", None)
+    compile_route_scopes(app.routes)
+
+    # Compiled before any request
+    assert required_masks["moderator user"] == 0b011
+    assert required_mask(SecurityScopes(scopes=["moderator", "user"])) == 0b011
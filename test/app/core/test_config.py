@@ -53,6 +53,16 @@ def test_env_test():
     assert settings.SECRET_KEY == "6a50e3ddeef70fd46da504d8d0a226db7f0b44dcdeb65b97751cf2393b33693e"
 
 
+def test_env_test_ignores_env_file(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / ".env").write_text("PASSWORD_HASHING_ROUNDS=12\nSECRET_KEY=FAKE_VALUE\n")
+    monkeypatch.chdir(tmp_path)
+
+    settings = ConfigTest()
+
+    assert settings.PASSWORD_HASHING_ROUNDS == 4
+    assert settings.SECRET_KEY == "6a50e3ddeef70fd46da504d8d0a226db7f0b44dcdeb65b97751cf2393b33693e"
+
+
 def test_env_invalid():
     with pytest.raises(ValueError) as excinfo:
         select_settings("invalid")
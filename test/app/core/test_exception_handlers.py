@@ -2,9 +2,16 @@ import pytest
 
 from fastapi import FastAPI, status
 from fastapi.testclient import TestClient
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError, OperationalError
 
-from app.core.exception_handlers import integrity_error_handler
+from app.core.exception_handlers import (
+    deadline_exceeded_handler,
+    integrity_error_handler,
+    weak_password_handler,
+    worker_pool_busy_handler,
+)
+from app.core.password_policy import WeakPasswordError
+from app.core.utils.worker_pool import WorkerPoolBusyError
 from app.middlewares.i18n import I18nMiddleware
 
 
@@ -26,4 +33,65 @@ async def test_integrity_error_handler():
     # Make a request to the test route to trigger the exception handler
     response = client.get("/test")
     assert response.status_code == status.HTTP_400_BAD_REQUEST
-    assert response.json() == {"detail": "Relational integrity error"}
\ No newline at end of file
+    assert response.json() == {"detail": "Relational integrity error"}
+
+
+@pytest.mark.asyncio
+async def test_deadline_exceeded_handler():
+    app = FastAPI()
+    app.add_middleware(I18nMiddleware)
+    app.add_exception_handler(DBAPIError, deadline_exceeded_handler)
+
+    client = TestClient(app)
+
+    @app.get("/interrupted")
+    async def interrupted_route():
+        raise OperationalError("SELECT 1", None, Exception("interrupted"))
+
+    @app.get("/locked")
+    async def locked_route():
+        raise OperationalError("SELECT 1", None, Exception("database is locked"))
+
+    response = client.get("/interrupted")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"detail": "The request took too long, please try again later"}
+
+    # The other database errors are not handled
+    with pytest.raises(OperationalError):
+        client.get("/locked")
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_busy_handler():
+    app = FastAPI()
+    app.add_middleware(I18nMiddleware)
+    app.add_exception_handler(WorkerPoolBusyError, worker_pool_busy_handler)
+
+    client = TestClient(app)
+
+    @app.get("/busy")
+    async def busy_route():
+        raise WorkerPoolBusyError("64 calls pending")
+
+    response = client.get("/busy")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+    assert response.json() == {"detail": "The server is busy, please try again later"}
+
+
+@pytest.mark.asyncio
+async def test_weak_password_handler():
+    app = FastAPI()
+    app.add_middleware(I18nMiddleware)
+    app.add_exception_handler(WeakPasswordError, weak_password_handler)
+
+    client = TestClient(app)
+
+    @app.get("/weak")
+    async def weak_route():
+        raise WeakPasswordError("Password is too weak: ")
+
+    response = client.get("/weak")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json() == {"detail": "The password is too weak"}
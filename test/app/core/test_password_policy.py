@@ -0,0 +1,55 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.password_policy import (
+    MAX_PASSWORD_BYTES,
+    WeakPasswordError,
+    check_password_policy,
+    check_password_strength,
+)
+
+strong_password = "StrongPassword123!45*"
+
+
+@pytest.mark.parametrize(
+    "password, error",
+    [
+        ("a1" * 5000, "Password is too long"),
+        # 36 characters, but 72 bytes
+        ("é" * 36 + "1", "Password is too long"),
+        ("Ab1!", "at least 8 characters"),
+        ("correcthorsebatterystaple", "lowercase and uppercase letters, digits or symbols"),
+        ("Password1", "commonly used password"),
+    ],
+)
+def test_check_password_policy_rejects(password, error):
+    with pytest.raises(ValueError) as exc_info:
+        check_password_policy(password)
+
+    assert error in str(exc_info.value)
+    assert not isinstance(exc_info.value, WeakPasswordError)
+
+
+def test_check_password_policy_accepts():
+    check_password_policy(strong_password)
+    check_password_policy("a1" * (MAX_PASSWORD_BYTES // 2))
+
+
+def test_check_password_strength():
+    check_password_strength(strong_password)
+
+    with pytest.raises(WeakPasswordError, match="Password is too weak"):
+        check_password_strength("Summer2024!")
+    # The password must not be made of the other values of the account
+    check_password_strength("Doejohn1990!xq")
+    with pytest.raises(WeakPasswordError):
+        check_password_strength("Doejohn1990", ["Doe", "John"])
+
+
+def test_check_password_strength_locked_signature():
+    # zxcvbn 4.4.28, the locked version, only takes the password and the user inputs
+    with patch("app.core.password_policy.zxcvbn", wraps=lambda password, user_inputs=None: {"score": 4}) as zxcvbn:
+        check_password_strength("Tr0ub4dour&3-horse", ["user"])
+
+    zxcvbn.assert_called_once_with("Tr0ub4dour&3-horse", user_inputs=["user"])
@@ -1,15 +1,27 @@
-from datetime import datetime, timedelta
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
-from jose import jwt
+import ecdsa
+import pytest
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.password_policy import WeakPasswordError, check_password_strength
 from app.core.security import (
+    PasswordService,
     create_access_token,
+    decode_access_token,
+    dummy_password_hash,
     get_password_hash,
     is_hashed_password,
+    token_cache,
     verify_password,
 )
+from app.core.signing_keys import SigningKeys
+from app.core.utils.worker_pool import WorkerPool
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -47,3 +59,120 @@ def test_create_access_token():
     assert datetime.fromtimestamp(decoded_token["exp"]) - datetime.fromtimestamp(decoded_token["iat"]) == timedelta(
         minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
     )
+
+
+def test_create_access_token_asymmetric():
+    private_key = ecdsa.SigningKey.generate(curve=ecdsa.NIST256p).to_pem().decode()
+    signing_keys = SigningKeys.load("ES256", settings.SECRET_KEY, private_key)
+
+    with patch("app.core.security.signing_keys", signing_keys):
+        access_token = create_access_token(subject=1, scopes=["user"])
+        assert decode_access_token(access_token)["sub"] == "1"
+
+    assert jwt.get_unverified_header(access_token)["kid"] == signing_keys.kid
+
+
+def test_create_access_token_jti():
+    tokens = [create_access_token(subject=1, scopes=["user"]) for _ in range(2)]
+    jtis = {jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["jti"] for token in tokens}
+
+    # Each token can be revoked on its own
+    assert len(jtis) == 2
+
+
+def test_create_access_token_claims():
+    access_token = create_access_token(subject=1, scopes=["user"], claims={"ver": 2, "sub": "other"})
+    decoded_token = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+    # The registered claims cannot be overridden
+    assert (decoded_token["ver"], decoded_token["sub"]) == (2, "1")
+
+
+@pytest.mark.asyncio
+async def test_password_service():
+    service = PasswordService(WorkerPool(max_workers=1, max_queue=1), WorkerPool(max_workers=1, max_queue=1))
+
+    hashed_password = await service.hash("password")
+
+    assert is_hashed_password(hashed_password)
+    assert await service.verify("password", hashed_password)
+    assert not await service.verify("wrong_password", hashed_password)
+    # Without a hash, the password is verified against a dummy hash of the same cost
+    assert not await service.verify("password", None)
+    assert service.pool.info().completed == 4
+    service.pool.shutdown()
+    service.strength_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_service_check_strength():
+    service = PasswordService(WorkerPool(max_workers=1, max_queue=1), WorkerPool(max_workers=1, max_queue=1))
+
+    await service.check_strength("StrongPassword123!45*", ["testuser"])
+    with patch("app.core.security.check_password_strength", wraps=check_password_strength) as check:
+        for _ in range(2):
+            with pytest.raises(WeakPasswordError):
+                await service.check_strength("Doejohn1990", ["Doe", "John"])
+        # The weak password is remembered, zxcvbn runs once
+        assert check.call_count == 1
+
+        # Unless the other values of the account change
+        with pytest.raises(WeakPasswordError):
+            await service.check_strength("Doejohn1990", ["Doe"])
+        assert check.call_count == 2
+    assert service.strength_pool.info().completed == 3
+    service.pool.shutdown()
+    service.strength_pool.shutdown()
+
+
+def test_dummy_password_hash():
+    assert is_hashed_password(dummy_password_hash())
+    # Computed once
+    assert dummy_password_hash() is dummy_password_hash()
+
+
+def test_needs_update():
+    service = PasswordService(WorkerPool(max_workers=1, max_queue=1), WorkerPool(max_workers=1, max_queue=1))
+
+    assert not service.needs_update(get_password_hash("password"))
+    # The hashes of another cost are replaced
+    other_rounds = settings.PASSWORD_HASHING_ROUNDS + 1
+    assert service.needs_update(pwd_context.handler("bcrypt").using(rounds=other_rounds).hash("password"))
+    service.pool.shutdown()
+    service.strength_pool.shutdown()
+
+
+def test_decode_access_token_cached():
+    token_cache.clear()
+    token = create_access_token(subject=1, scopes=["user"])
+
+    with patch("app.core.signing_keys.jwt.decode", wraps=jwt.decode) as decode:
+        payload = decode_access_token(token)
+        # The token is verified once
+        assert decode_access_token(token) == payload
+        assert decode.call_count == 1
+
+    assert payload["sub"] == "1"
+    info = token_cache.info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    # The entry expires with the token
+    expiration = token_cache._entries[hashlib.sha256(token.encode()).digest()][0]
+    assert abs(expiration - time.monotonic() - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60) < 5
+
+
+def test_decode_access_token_not_cached():
+    token_cache.clear()
+    without_expiration = jwt.encode({"sub": "1"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    expired = jwt.encode(
+        {"sub": "1", "exp": datetime.now(timezone.utc) - timedelta(minutes=1)},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+    assert decode_access_token(without_expiration) == {"sub": "1"}
+    with pytest.raises(JWTError):
+        decode_access_token(expired)
+    with pytest.raises(JWTError):
+        decode_access_token("invalid")
+
+    assert token_cache.info().currsize == 0
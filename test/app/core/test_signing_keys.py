@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import ecdsa
+import pytest
+from jose import JWTError, jwt
+
+from app.core.signing_keys import SigningKeys, thumbprint
+
+
+def generate_private_key() -> str:
+    return ecdsa.SigningKey.generate(curve=ecdsa.NIST256p).to_pem().decode()
+
+
+def public_key(private_key: str) -> str:
+    return ecdsa.SigningKey.from_pem(private_key).get_verifying_key().to_pem().decode()
+
+
+def test_thumbprint():
+    # RFC 7638, section 3.1 (the members of an RSA key)
+    public_jwk = {
+        "kty": "RSA",
+        "n": "0vx7agoebGcQSuuPiLJXZptN9nndrQmbXEps2aiAFbWhM78LhWx4cbbfAAtVT86zwu1RK7aPFFxuhDR1L6tSoc_BJECPeb"
+        "WKRXjBZCiFV4n3oknjhMstn64tZ_2W-5JsGY4Hc5n9yBXArwl93lqt7_RN5w6Cf0h4QyQ5v-65YGjQR0_FDW2QvzqY368QQMicAt"
+        "aSqzs8KJZgnYb9c7d0zgdAZHzu6qMQvRL5hajrn1n91CbOpbISD08qNLyrdkt-bFTWhAI4vMQFh6WeZu0fM4lFd2NcRwr3XPksINH"
+        "aQ-G_xBniIqbw0Ls1jF44-csFCur-kEgU8awapJzKnqDKgw",
+        "e": "AQAB",
+        "alg": "RS256",
+        "kid": "2011-04-29",
+    }
+
+    assert thumbprint(public_jwk) == "NzbLsXh8uDCcd-6MNwXF4W_7noWXFZAfHkxZsRGC9Xs"
+
+
+def test_hmac():
+    signing_keys = SigningKeys.load("HS256", "secret")
+    token = signing_keys.encode({"sub": "1"})
+
+    assert "kid" not in jwt.get_unverified_header(token)
+    assert signing_keys.decode(token) == {"sub": "1"}
+    assert signing_keys.jwks() == {"keys": []}
+
+
+def test_asymmetric():
+    private_key = generate_private_key()
+    signing_keys = SigningKeys.load("ES256", "secret", private_key)
+    token = signing_keys.encode({"sub": "1"})
+
+    assert jwt.get_unverified_header(token) == {"alg": "ES256", "kid": signing_keys.kid, "typ": "JWT"}
+    assert signing_keys.decode(token) == {"sub": "1"}
+    # Anyone can verify the token with the published key, not forge one
+    (published,) = signing_keys.jwks()["keys"]
+    assert "d" not in published
+    assert (published["kid"], published["use"], published["alg"]) == (signing_keys.kid, "sig", "ES256")
+    assert jwt.decode(token, published, algorithms=["ES256"]) == {"sub": "1"}
+    with pytest.raises(JWTError):
+        SigningKeys.load("HS256", "secret").decode(token)
+
+
+def test_asymmetric_requires_private_key():
+    with pytest.raises(ValueError):
+        SigningKeys.load("ES256", "secret")
+
+
+def test_rotation():
+    previous_key, private_key = generate_private_key(), generate_private_key()
+    previous_token = SigningKeys.load("ES256", "secret", previous_key).encode({"sub": "1"})
+    other_token = SigningKeys.load("ES256", "secret", generate_private_key()).encode({"sub": "1"})
+
+    signing_keys = SigningKeys.load("ES256", "secret", private_key, [public_key(previous_key)])
+
+    # The tokens of the previous key are still accepted, not those of an unknown key
+    assert signing_keys.decode(previous_token) == {"sub": "1"}
+    with pytest.raises(JWTError, match="Unknown signing key"):
+        signing_keys.decode(other_token)
+    assert len(signing_keys.jwks()["keys"]) == 2
+    assert jwt.get_unverified_header(signing_keys.encode({"sub": "1"}))["kid"] == signing_keys.kid
+
+
+def test_keys_parsed_once():
+    signing_keys = SigningKeys.load("ES256", "secret", generate_private_key())
+    token = signing_keys.encode({"sub": "1"})
+
+    with patch("app.core.signing_keys.jwk.construct") as construct:
+        signing_keys.encode({"sub": "1"})
+        signing_keys.decode(token)
+
+    construct.assert_not_called()
+
+
+def test_kid_not_a_string():
+    signing_keys = SigningKeys.load("ES256", "secret", generate_private_key())
+    token = jwt.encode({"sub": "1"}, "secret", algorithm="HS256", headers={"kid": 1})
+
+    with pytest.raises(JWTError):
+        signing_keys.decode(token)
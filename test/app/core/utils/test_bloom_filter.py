@@ -0,0 +1,41 @@
+from app.core.utils.bloom_filter import BloomFilter
+
+
+def test_bloom_filter_add():
+    bloom_filter = BloomFilter(capacity=100, error_rate=0.01)
+
+    assert "a" not in bloom_filter
+    bloom_filter.add("a")
+
+    assert "a" in bloom_filter
+    assert len(bloom_filter) == 1
+    assert 1 not in bloom_filter
+
+
+def test_bloom_filter_no_false_negative():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"item-{i}" for i in range(1000)]
+    for item in items:
+        bloom_filter.add(item)
+
+    assert all(item in bloom_filter for item in items)
+    assert bloom_filter.is_full()
+
+
+def test_bloom_filter_error_rate():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom_filter.add(f"item-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom_filter for i in range(10_000))
+
+    # About 100 expected
+    assert false_positives < 200
+
+
+def test_bloom_filter_size():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+
+    # About 9.6 bits and 7 hash functions per item
+    assert bloom_filter.size == 9586
+    assert bloom_filter.hash_count == 7
@@ -0,0 +1,64 @@
+from unittest.mock import patch
+
+from app.core.utils.cache import CacheInfo, TTLCache
+
+
+def test_cache_get_set():
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl=60)
+
+    assert cache.get(1) is None
+    cache.set(1, "one")
+
+    assert cache.get(1) == "one"
+    assert cache.info() == CacheInfo(hits=1, misses=1, maxsize=2, currsize=1)
+    assert cache.info().hit_rate == 0.5
+
+
+def test_cache_lru_eviction():
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "one")
+    cache.set(2, "two")
+
+    # 1 becomes the most recently used entry, 2 is evicted
+    cache.get(1)
+    cache.set(3, "three")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "one"
+    assert cache.get(3) == "three"
+    assert cache.info().currsize == 2
+
+
+def test_cache_ttl_expiry():
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl=10)
+    with patch("app.core.utils.cache.time.monotonic", return_value=100.0):
+        cache.set(1, "one")
+        cache.set(2, "two", ttl=30)
+
+    with patch("app.core.utils.cache.time.monotonic", return_value=115.0):
+        assert cache.get(1) is None
+        assert cache.get(2) == "two"
+        assert cache.info().currsize == 1
+
+
+def test_cache_pop_clear():
+    cache: TTLCache[int, str] = TTLCache(maxsize=2, ttl=60)
+    cache.set(1, "one")
+    cache.set(2, "two")
+    cache.get(1)
+
+    cache.pop(1)
+    cache.pop(3)
+    assert cache.get(1) is None
+
+    cache.clear()
+    assert cache.info() == CacheInfo(hits=0, misses=0, maxsize=2, currsize=0)
+    assert cache.info().hit_rate == 0.0
+
+
+def test_cache_disabled():
+    cache: TTLCache[int, str] = TTLCache(maxsize=0, ttl=60)
+    cache.set(1, "one")
+
+    assert cache.get(1) is None
+    assert cache.info().currsize == 0
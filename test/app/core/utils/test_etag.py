@@ -0,0 +1,15 @@
+import pytest
+
+from app.core.utils.etag import etag_matches, format_etag
+
+
+def test_format_etag():
+    assert format_etag(3) == '"3"'
+
+
+@pytest.mark.parametrize(
+    "if_match, expected",
+    [('"3"', True), ('"1", "3"', True), ("*", True), ('"2"', False), ('W/"3"', False), ("3", False)],
+)
+def test_etag_matches(if_match, expected):
+    assert etag_matches(if_match, format_etag(3)) is expected
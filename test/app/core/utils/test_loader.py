@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.core.utils.loader import BatchLoader
+
+
+@pytest.mark.asyncio
+async def test_loader_batches_concurrent_loads():
+    batches: list[list[int]] = []
+
+    async def batch_load(keys: list[int]) -> dict[int, str]:
+        batches.append(keys)
+        return {key: str(key) for key in keys if key != 3}
+
+    loader: BatchLoader[int, str] = BatchLoader(batch_load)
+
+    # Act
+    values = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(3))
+    many = await loader.load_many([4, 5])
+
+    # Assert
+    assert values == ["1", "2", "1", None]
+    assert many == ["4", "5"]
+    assert batches == [[1, 2, 3], [4, 5]]
+
+
+@pytest.mark.asyncio
+async def test_loader_batches_one_at_a_time():
+    running = 0
+    max_running = 0
+
+    async def batch_load(keys: list[int]) -> dict[int, int]:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {key: key for key in keys}
+
+    loader: BatchLoader[int, int] = BatchLoader(batch_load)
+
+    async def load_later(key: int) -> int | None:
+        await asyncio.sleep(0.001)
+        return await loader.load(key)
+
+    # Act
+    values = await asyncio.gather(loader.load(1), load_later(2))
+
+    # Assert
+    assert values == [1, 2]
+    assert max_running == 1
+
+
+@pytest.mark.asyncio
+async def test_loader_error():
+    async def batch_load(keys: list[int]) -> dict[int, int]:
+        raise RuntimeError("database is down")
+
+    loader: BatchLoader[int, int] = BatchLoader(batch_load)
+
+    # Act / Assert
+    with pytest.raises(RuntimeError):
+        await asyncio.gather(loader.load(1), loader.load(2))
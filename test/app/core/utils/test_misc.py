@@ -5,12 +5,15 @@ from operator import gt, lt
 import pytest
 from pydantic import Field, field_validator
 
+from app.core.config import settings
 from app.core.utils.misc import (
     create_hierarchy_dict,
+    parse_fields,
     process_query_parameters,
+    project,
     to_query_parameters,
 )
-from app.schemas.base import DefaultModel
+from app.schemas.base import DefaultModel, in_
 
 
 class User(DefaultModel):
@@ -32,6 +35,7 @@ class User(DefaultModel):
 
 class QueryModelTest(DefaultModel):
     id__gt: int | None
+    id__in: list[int] | None = None
     name: str | None
     created_at__gt: datetime | None
     amount__lt: float | None
@@ -77,6 +81,18 @@ def test_to_query_parameters():
     assert NewModel.model_fields["test_float__lt"].is_required() is False
     assert NewModel.__pydantic_decorators__.field_validators.get("test_int_must_be_positive") is not None
 
+    # Test with lists of values, the id is only excluded from the equality filters
+    NewModel = to_query_parameters(User)
+    assert NewModel.model_fields["id__in"].is_required() is False
+    assert NewModel.model_fields.get("password__in", None) is None
+    assert NewModel(id__in="1, 2,", updated_at__in=None).id__in == [1, 2]
+    assert NewModel(username__in="john").username__in == ["john"]
+    with pytest.raises(ValueError):
+        NewModel(test_int__in="1,a")
+    assert len(NewModel(id__in=",".join(map(str, range(settings.MAX_PAGE_SIZE)))).id__in) == settings.MAX_PAGE_SIZE
+    with pytest.raises(ValueError):
+        NewModel(id__in=",".join(map(str, range(settings.MAX_PAGE_SIZE + 1))))
+
     # Test with FieldMetadata
     NewModel = to_query_parameters(User)
     with pytest.raises(ValueError):
@@ -92,10 +108,11 @@ def test_process_query_parameters():
         "name": "john",
         "created_at__gt": "2022-01-01T00:00:00",
         "amount__lt": 100.0,
+        "id__in": [1, 2],
     }
     processed_query_parameters = process_query_parameters(QueryModelTest(**query_parameters))
     assert processed_query_parameters == {
-        "id": {gt: 1},
+        "id": {gt: 1, in_: [1, 2]},
         "name": "john",
         "created_at": {gt: datetime(2022, 1, 1, 0, 0)},
         "amount": {lt: 100.0},
@@ -109,3 +126,25 @@ def test_create_hierarchy_dict() -> None:
         "C": ["A", "B", "C"],
     }
     assert create_hierarchy_dict(ExampleEnum) == expected_result
+
+
+def test_parse_fields():
+    assert parse_fields(User, "username, id,createdAt,") == ["id", "username", "created_at"]
+
+    with pytest.raises(ValueError):
+        parse_fields(User, "unknown")
+    with pytest.raises(ValueError):
+        parse_fields(User, ",")
+
+
+def test_project():
+    class Obj:
+        username = "test"
+        created_at = datetime(2024, 1, 1)
+
+    partial = project(User, Obj(), ["username", "created_at"])
+
+    assert partial.model_dump(mode="json", by_alias=True, exclude_unset=True) == {
+        "username": "test",
+        "createdAt": "2024-01-01T00:00:00",
+    }
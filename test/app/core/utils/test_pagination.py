@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_encode_decode_cursor():
+    cursor = encode_cursor("username", "test", 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("username", "test", 42)
+
+
+def test_encode_cursor_datetime():
+    now = datetime.now(timezone.utc)
+
+    assert decode_cursor(encode_cursor("created_at", now, 1)) == ("created_at", now.isoformat(), 1)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        encode_cursor("id", 1, 1)[:-2],
+        "W10",
+        # Forged cursors: the value must be a JSON scalar and the id an integer
+        encode_cursor("username", {"a": 1}, 1),
+        encode_cursor("is_active", [1], 1),
+        encode_cursor("id", 1, True),
+    ],
+)
+def test_decode_cursor_invalid(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.utils.worker_pool import WorkerPool, WorkerPoolBusyError
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_runs_off_the_event_loop():
+    pool = WorkerPool(max_workers=2, max_queue=2)
+
+    thread = await pool.run(threading.current_thread)
+
+    assert thread is not threading.current_thread()
+    assert thread.name.startswith("worker")
+    info = pool.info()
+    assert info.completed == 1
+    assert info.pending == 0
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_raises():
+    pool = WorkerPool(max_workers=1, max_queue=0)
+
+    with pytest.raises(ZeroDivisionError):
+        await pool.run(lambda: 1 / 0)
+
+    # The failed call released its slot
+    assert await pool.run(lambda: 1) == 1
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_rejects_when_queue_full():
+    pool = WorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(pool.run(release.wait))
+    queued = asyncio.ensure_future(pool.run(lambda: "queued"))
+    await asyncio.sleep(0)
+
+    # Act
+    with pytest.raises(WorkerPoolBusyError):
+        await pool.run(lambda: "rejected")
+    release.set()
+
+    # Assert
+    assert await running is True
+    assert await queued == "queued"
+    info = pool.info()
+    assert info.rejected == 1
+    assert info.completed == 2
+    # The queued call waited for the running one
+    assert info.queue_wait_max > 0
+    assert 0 < info.queue_wait_mean <= info.queue_wait_max
+    pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_pool_cancel_queued_call():
+    pool = WorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+    calls: list[str] = []
+
+    running = asyncio.ensure_future(pool.run(release.wait))
+    queued = asyncio.ensure_future(pool.run(calls.append, "queued"))
+    await asyncio.sleep(0)
+
+    # Act
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+    release.set()
+    await running
+    await asyncio.sleep(0.01)
+
+    # Assert, the cancelled call never ran and released its slot
+    assert calls == []
+    assert pool.info().pending == 0
+    pool.shutdown()
+
+
+def test_pool_info_no_call():
+    pool = WorkerPool(max_workers=1, max_queue=1)
+
+    assert pool.info().queue_wait_mean == 0.0
+    pool.shutdown()
@@ -1,19 +1,45 @@
+import asyncio
 from datetime import datetime as _datetime
-from operator import gt
+from operator import gt, ne
 from test.base_test import BaseTest
 from unittest.mock import patch
 
-from app.crud.base import CRUDBase, patch_timezone_sqlite
-from app.db.base_class import Base, Datetime, Mapped, Str256, Str512
-from app.db.databases.postgres import PostgresDatabase
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
+from sqlalchemy.orm import mapped_column
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.core.types import CountStrategy, SecurityScopes
+from app.core.utils.cache import CacheInfo
+from app.core.utils.pagination import encode_cursor
+from app.crud.base import BulkIntegrityError, CRUDBase, batched
+from app.crud.crud_account import account as accounts
+from app.db.base_class import Base, Datetime, Mapped, Str256, Str512, Text, Versioned, query_column
 from app.dependencies import get_db
-from app.schemas.base import DefaultModel
+from app.models.account import Account as ModelAccount
+from app.schemas.base import DefaultModel, in_
 
 
 class ModelUser(Base):
-    email: Mapped[Str256]
+    email: Mapped[Str256] = query_column(sortable=True)
     password: Mapped[Str512]
-    datetime: Mapped[Datetime]
+    datetime: Mapped[Datetime] = query_column(sortable=True)
+
+
+class ModelNoteUser(Base):
+    note: Mapped[Text] = query_column(sortable=True)
+
+
+class ModelUniqueUser(Base):
+    email: Mapped[Str256] = mapped_column(unique=True)
+
+
+class ModelVersionedUser(Versioned, Base):
+    email: Mapped[Str256]
+
+
+class UniqueUserCreate(DefaultModel):
+    email: str
 
 
 class UserCreate(DefaultModel):
@@ -109,6 +135,125 @@ class TestBaseCRUD(BaseTest):
             assert result[0].id == 3
             assert result[0].email == "user3@example.com"
 
+    async def test_get_filter_none(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.query(session, email=None)
+            not_none = await self.crud.query(session, email={ne: None}, limit=None)
+
+            # Assert
+            assert result == []
+            assert len(not_none) == 3
+
+    async def test_statement_cache(self):
+        self.crud.statement_cache_clear()
+        async with get_db.get_session() as session:
+            # Act
+            first = await self.crud.query(session, email="user1@example.com")
+            second = await self.crud.query(session, email="user2@example.com")
+            third = await self.crud.query(session, email="user3@example.com", id={gt: 0})
+
+            # Assert
+            assert [user.id for user in first] == [1]
+            assert [user.id for user in second] == [2]
+            assert [user.id for user in third] == [3]
+            assert self.crud.statement_cache_info() == CacheInfo(hits=1, misses=2, maxsize=128, currsize=2)
+
+    async def test_statement_cache_eviction(self):
+        crud = CRUDUser(ModelUser, statement_cache_size=1)
+        async with get_db.get_session() as session:
+            # Act
+            await crud.query(session, email="user1@example.com")
+            await crud.query(session, id=1)
+            await crud.query(session, email="user1@example.com")
+
+            # Assert
+            assert crud.statement_cache_info() == CacheInfo(hits=0, misses=3, maxsize=1, currsize=1)
+
+    async def test_entity_cache(self):
+        crud = CRUDUser(ModelUser, cache_size=2)
+        async with get_db.get_session() as session:
+            await crud.read(session, id=1)
+        async with get_db.get_session() as session:
+            # Act
+            result = await crud.read(session, id=1)
+
+            # Assert
+            assert result is not None
+            assert result.email == "user1@example.com"
+            assert result.password == "password1"
+            assert result in session
+            assert crud.cache.info().hits == 1
+            assert crud.cache.info().misses == 1
+
+    async def test_entity_cache_stale_update(self):
+        crud = CRUDBase[ModelVersionedUser, UniqueUserCreate, UniqueUserCreate](ModelVersionedUser, cache_size=2)
+        async with get_db.get_session() as session:
+            created = await crud.create(session, obj_in=UniqueUserCreate(email="user@example.com"))
+        async with get_db.get_session() as session:
+            cached = await crud.read(session, id=created.id)
+        async with get_db.get_session() as session:
+            # Updated by another worker, the cache is not invalidated
+            await session.execute(
+                update(ModelVersionedUser).values(version=ModelVersionedUser.version + 1, email="external@example.com")
+            )
+            await session.commit()
+        assert crud.cache.info().currsize == 1
+
+        async with get_db.get_session() as session:
+            # Act
+            with self.assertRaises(StaleDataError):
+                await crud.update(session, db_obj=cached, obj_in={"email": "stale@example.com"})
+
+            # Assert
+            assert crud.cache.info().currsize == 0
+            assert (await crud.read(session, id=created.id)).email == "external@example.com"
+
+    async def test_entity_cache_in_session(self):
+        crud = CRUDUser(ModelUser, cache_size=2)
+        async with get_db.get_session() as session:
+            await crud.read(session, id=1)
+        async with get_db.get_session() as session:
+            user = await crud.read(session, id=1)
+            user.email = "changed@example.com"
+
+            # Act
+            result = await crud.read(session, id=1)
+
+            # Assert, the record of the session is not overwritten by the cached one
+            assert result is user
+            assert result.email == "changed@example.com"
+            assert crud.cache.info().hits == 1
+
+    async def test_entity_cache_bypass(self):
+        crud = CRUDUser(ModelUser, cache_size=2)
+        async with get_db.get_session() as session:
+            # Act
+            await crud.read(session, id=1, columns=["email"])
+            await crud.read(session, id=2, for_update=True)
+
+            # Assert
+            assert crud.cache.info().currsize == 0
+
+    async def test_entity_cache_invalidation(self):
+        crud = CRUDUser(ModelUser, cache_size=3)
+        async with get_db.get_session() as session:
+            for id in range(1, 4):
+                await crud.read(session, id=id)
+        async with get_db.get_session() as session:
+            # Act
+            user = await crud.read(session, id=1)
+            await crud.update(session, db_obj=user, obj_in=UserUpdate(email="updated@example.com"))
+            await crud.delete(session, id=2)
+            await crud.update_many(session, ids=[3], obj_in={"email": "bulk@example.com"})
+
+            # Assert
+            assert crud.cache.info().currsize == 0
+        async with get_db.get_session() as session:
+            assert (await crud.read(session, id=1)).email == "updated@example.com"
+            assert await crud.read(session, id=2) is None
+            assert (await crud.read(session, id=3)).email == "bulk@example.com"
+
     async def test_get_distinct(self):
         async with get_db.get_session() as session:
             # Act
@@ -117,6 +262,169 @@ class TestBaseCRUD(BaseTest):
             assert len(await self.crud.query(session, distinct=ModelUser.id)) == 4
             assert len(await self.crud.query(session, distinct=ModelUser.email)) == 3
 
+    async def test_paginate(self):
+        async with get_db.get_session() as session:
+            # Act
+            first_page, cursor = await self.crud.paginate(session, limit=2)
+            second_page, last_cursor = await self.crud.paginate(session, cursor=cursor, limit=2)
+
+            # Assert
+            assert [user.id for user in first_page] == [1, 2]
+            assert cursor is not None
+            assert [user.id for user in second_page] == [3]
+            assert last_cursor is None
+
+    async def test_paginate_order_by(self):
+        async with get_db.get_session() as session:
+            # Act
+            first_page, cursor = await self.crud.paginate(session, limit=1, order_by="datetime")
+            second_page, _ = await self.crud.paginate(session, cursor=cursor, limit=2, order_by="datetime")
+
+            # Assert
+            assert [user.id for user in first_page] == [1]
+            assert [user.id for user in second_page] == [2, 3]
+
+    async def test_paginate_filter(self):
+        async with get_db.get_session() as session:
+            # Act
+            result, cursor = await self.crud.paginate(session, id={gt: 1}, limit=1)
+
+            # Assert
+            assert [user.id for user in result] == [2]
+            assert cursor is not None
+
+    @patch("app.crud.base.settings.MAX_PAGE_SIZE", 2)
+    async def test_paginate_max_page_size(self):
+        async with get_db.get_session() as session:
+            # Act
+            result, cursor = await self.crud.paginate(session, limit=10)
+
+            # Assert
+            assert len(result) == 2
+            assert cursor is not None
+
+    async def test_paginate_invalid(self):
+        async with get_db.get_session() as session:
+            _, cursor = await self.crud.paginate(session, limit=1)
+
+            # Act / Assert
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, order_by="unknown")
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, cursor=cursor, order_by="email")
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, cursor="not a cursor")
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, cursor=encode_cursor("email", 42, 1), order_by="email")
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, cursor=encode_cursor("datetime", 42, 1), order_by="datetime")
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, cursor=encode_cursor("datetime", "yesterday", 1), order_by="datetime")
+
+    async def test_paginate_deferred_sort_key(self):
+        async with get_db.get_session() as session:
+            # Act / Assert
+            with self.assertRaises(ValueError):
+                await accounts.paginate(session, order_by="password")
+
+    async def test_paginate_not_sortable(self):
+        async with get_db.get_session() as session:
+            # Act / Assert, the columns without a `(column, id)` index cannot be sorted by
+            with self.assertRaises(ValueError):
+                await self.crud.paginate(session, order_by="password")
+            with self.assertRaises(ValueError):
+                await accounts.paginate(session, order_by="scope")
+            with self.assertRaises(ValueError):
+                await accounts.paginate(session, order_by="is_active")
+
+    async def test_paginate_nullable_sort_key(self):
+        crud = CRUDBase[ModelNoteUser, DefaultModel, DefaultModel](ModelNoteUser)
+        async with get_db.get_session() as session:
+            # Act / Assert, the records without a note would never be returned after a cursor
+            with self.assertRaises(ValueError):
+                await crud.paginate(session, order_by="note")
+
+    async def test_search(self):
+        async with get_db.get_session() as session:
+            await session.execute(
+                insert(ModelAccount),
+                [
+                    {**account, "password": "hash", "scope": SecurityScopes.USER, "is_active": is_active}
+                    for account, is_active in [
+                        ({"username": "jdoe", "last_name": "Doe", "first_name": "John"}, True),
+                        ({"username": "jane", "last_name": "Doe", "first_name": "Jane"}, False),
+                        ({"username": "bob", "last_name": "Smith", "first_name": "Bob"}, True),
+                    ]
+                ],
+            )
+            await session.commit()
+
+            # Act
+            prefix = await accounts.search(session, "jo")
+            every_term = await accounts.search(session, "doe J")
+            filtered = await accounts.search(session, "doe", is_active=False)
+            limited = await accounts.search(session, "doe", limit=1, columns=["username"])
+            no_term = await accounts.search(session, "*")
+
+            # Assert
+            assert [account.username for account in prefix] == ["jdoe"]
+            assert [account.username for account in every_term] == ["jdoe", "jane"]
+            assert [account.username for account in filtered] == ["jane"]
+            assert [account.username for account in limited] == ["jdoe"]
+            assert no_term == []
+
+    async def test_search_not_searchable(self):
+        async with get_db.get_session() as session:
+            # Act / Assert
+            with self.assertRaises(ValueError):
+                await self.crud.search(session, "user")
+
+    async def test_count(self):
+        async with get_db.get_session() as session:
+            # Act / Assert
+            assert await self.crud.count(session) == 3
+            assert await self.crud.count(session, id={gt: 1}) == 2
+            assert await self.crud.count(session, strategy=CountStrategy.ESTIMATED, email="user1@example.com") == 1
+            assert await self.crud.count(session, strategy=CountStrategy.NONE) is None
+
+    async def test_stream(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = [user async for user in self.crud.stream(session, batch_size=2)]
+            filtered = [user async for user in self.crud.stream(session, id={gt: 2})]
+
+            # Assert
+            assert [user.id for user in result] == [1, 2, 3]
+            assert result[0].datetime.tzinfo is not None
+            assert [user.id for user in filtered] == [3]
+
+    async def test_read_columns(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.read(session, id=1, columns=["email"])
+
+            # Assert
+            assert result is not None
+            assert result.id == 1
+            assert result.email == "user1@example.com"
+            assert "password" not in result.__dict__
+            with self.assertRaises(InvalidRequestError):
+                _ = result.password
+
+    async def test_query_columns(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.query(session, columns=["email"], id={gt: 2})
+            page, _ = await self.crud.paginate(session, columns=["email"], order_by="datetime", limit=1)
+
+            # Assert
+            assert [(user.id, user.email) for user in result] == [(3, "user3@example.com")]
+            assert dict(result[0].attributes) == {"id": 3, "email": "user3@example.com"}
+            assert "datetime" in page[0].__dict__
+
+            with self.assertRaises(ValueError):
+                await self.crud.query(session, columns=["unknown"])
+
     async def test_update_with_dict(self):
         async with get_db.get_session() as session:
             # Act
@@ -162,25 +470,239 @@ class TestBaseCRUD(BaseTest):
 
             assert await self.crud.read(session, id=1) is None
 
+    async def test_update_deleted(self):
+        async with get_db.get_session() as session:
+            db_obj = await self.crud.read(session, id=1)
+        async with get_db.get_session() as session:
+            await self.crud.delete(session, id=1)
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.update(session, db_obj=db_obj, obj_in={"email": "modified@example.com"})
 
-def test_patch_timezone_sqlite():
-    create_model = ModelUser(
-        email="user1@example.com",
-        password="password1",
-        datetime=_datetime.now(),
-    )
-    model = patch_timezone_sqlite(create_model)
+            # Assert
+            assert result is None
 
-    assert model.datetime.tzinfo is not None
+    async def test_delete_missing(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.delete(session, id=42)
 
+            # Assert
+            assert result is None
+
+    async def test_query_in(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.query(session, id={in_: [1, 3, 42]})
+            single = await self.crud.query(session, id={in_: [2]})
+            empty = await self.crud.query(session, id={in_: []})
+
+            # Assert
+            assert [user.id for user in result] == [1, 3]
+            assert [user.id for user in single] == [2]
+            assert empty == []
+            # The lists are expanded when executed, whatever their length the statement is the same
+            assert self.crud.statement_cache_info().currsize == 1
+
+    async def test_loader(self):
+        statements: list[str] = []
+
+        def record_statement(_conn, _cursor, statement, *_):
+            if statement.startswith("SELECT"):
+                statements.append(statement)
+
+        async with get_db.get_session() as session:
+            loader = self.crud.loader(session)
+            event.listen(get_db.async_engine.sync_engine, "before_cursor_execute", record_statement)
+            try:
+                # Act
+                users = await asyncio.gather(*(loader.load(id) for id in (3, 1, 42, 1)))
+            finally:
+                event.remove(get_db.async_engine.sync_engine, "before_cursor_execute", record_statement)
+
+            # Assert
+            assert [user.id if user is not None else None for user in users] == [3, 1, None, 1]
+            assert len(statements) == 1
+            assert "IN (?, ?, ?)" in statements[0]
+            # The loader lives as long as the session
+            assert self.crud.loader(session) is loader
+        async with get_db.get_session() as session:
+            assert self.crud.loader(session) is not loader
+
+    async def test_write_round_trips(self):
+        statements: list[str] = []
+
+        def record_statement(_conn, _cursor, statement, *_):
+            statements.append(statement.split()[0])
+
+        event.listen(get_db.async_engine.sync_engine, "before_cursor_execute", record_statement)
+        try:
+            async with get_db.get_session() as session:
+                # Act
+                created = await self.crud.create(session, obj_in=self.users[0])
+                updated = await self.crud.update(session, db_obj=created, obj_in={"email": "modified@example.com"})
+                deleted = await self.crud.delete(session, id=created.id)
+        finally:
+            event.remove(get_db.async_engine.sync_engine, "before_cursor_execute", record_statement)
+
+        # Assert
+        assert statements == ["BEGIN", "INSERT", "BEGIN", "UPDATE", "BEGIN", "DELETE"]
+        assert created.datetime.tzinfo is not None
+        assert updated is not None and updated.email == "modified@example.com"
+        assert deleted is not None and deleted.email == "modified@example.com"
+
+    async def test_update_versioned(self):
+        crud = CRUDBase[ModelVersionedUser, UniqueUserCreate, UniqueUserCreate](ModelVersionedUser)
+        async with get_db.get_session() as session:
+            stale = await crud.create(session, obj_in=UniqueUserCreate(email="user@example.com"))
+        async with get_db.get_session() as session:
+            db_obj = await crud.read(session, id=stale.id)
+
+            # Act
+            updated = await crud.update(session, db_obj=db_obj, obj_in={"email": "modified@example.com"})
+            updated_version = updated.version
+            [bulk_updated] = await crud.update_many(session, ids=[stale.id], obj_in={"email": "bulk@example.com"})
+
+            # Assert
+            assert stale.version == 1
+            assert updated_version == 2
+            assert bulk_updated.version == 3
+            with self.assertRaises(StaleDataError):
+                await crud.update(session, db_obj=stale, obj_in={"email": "stale@example.com"})
+            assert (await crud.read(session, id=stale.id)).email == "bulk@example.com"
+
+    async def test_create_or_conflict(self):
+        crud = CRUDBase[ModelUniqueUser, UniqueUserCreate, UniqueUserCreate](ModelUniqueUser)
+        async with get_db.get_session() as session:
+            # Act
+            created = await crud.create_or_conflict(
+                session, obj_in=UniqueUserCreate(email="new@example.com"), index_elements=["email"]
+            )
+            conflict = await crud.create_or_conflict(
+                session, obj_in=UniqueUserCreate(email="new@example.com"), index_elements=["email"]
+            )
+
+            # Assert
+            assert created is not None
+            assert created.email == "new@example.com"
+            assert conflict is None
+            assert len(await crud.query(session)) == 1
+
+    async def test_update_integrity_error(self):
+        crud = CRUDBase[ModelUniqueUser, UniqueUserCreate, UniqueUserCreate](ModelUniqueUser)
+        async with get_db.get_session() as session:
+            await crud.create(session, obj_in=UniqueUserCreate(email="taken@example.com"))
+            user = await crud.create(session, obj_in=UniqueUserCreate(email="user@example.com"))
+            user_id = user.id
+
+            # Act, the error is left to the exception handler or to the caller
+            with self.assertRaises(IntegrityError):
+                await crud.update(session, db_obj=user, obj_in={"email": "taken@example.com"})
+
+            # Assert
+            assert (await crud.read(session, id=user_id, use_cache=False)).email == "user@example.com"
+
+    async def test_create_many(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.create_many(session, objs_in=self.users, batch_size=2)
+
+            # Assert
+            assert [user.id for user in result] == [4, 5, 6]
+            assert [user.email for user in result] == [user.email for user in self.users]
+            assert result[0].datetime.tzinfo is not None
+            assert len(await self.crud.query(session)) == 6
+
+    async def test_create_many_integrity_error(self):
+        crud = CRUDBase[ModelUniqueUser, UniqueUserCreate, UniqueUserCreate](ModelUniqueUser)
+        async with get_db.get_session() as session:
+            await crud.create(session, obj_in=UniqueUserCreate(email="taken@example.com"))
+
+            # Act
+            with self.assertRaises(BulkIntegrityError) as error:
+                await crud.create_many(
+                    session,
+                    objs_in=[
+                        UniqueUserCreate(email="new@example.com"),
+                        UniqueUserCreate(email="taken@example.com"),
+                        UniqueUserCreate(email="other@example.com"),
+                        UniqueUserCreate(email="new@example.com"),
+                    ],
+                    batch_size=3,
+                )
+
+            # Assert
+            assert list(error.exception.failed_rows) == [1, 3]
+            assert len(await crud.query(session)) == 1
+
+    async def test_update_many_ids(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.update_many(
+                session, ids=[1, 3], obj_in=UserUpdate(email="modified@example.com"), batch_size=1
+            )
+
+            # Assert
+            assert sorted(user.id for user in result) == [1, 3]
+            assert [user.email for user in await self.crud.query(session, email="modified@example.com")] == [
+                "modified@example.com",
+                "modified@example.com",
+            ]
+            assert (await self.crud.read(session, id=2)).email == "user2@example.com"
+
+    async def test_update_many_filters(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.update_many(session, obj_in={"password": "modified"}, id={gt: 1})
+
+            # Assert
+            assert sorted(user.id for user in result) == [2, 3]
+            assert all(user.password == "modified" for user in result)
+            assert (await self.crud.read(session, id=1)).password == "password1"
+
+    async def test_update_many_requires_ids_or_filters(self):
+        async with get_db.get_session() as session:
+            # Act / Assert
+            with self.assertRaises(ValueError):
+                await self.crud.update_many(session, obj_in={"password": "modified"})
+            with self.assertRaises(ValueError):
+                await self.crud.update_many(session, obj_in={"unknown": "value"}, ids=[1])
+            assert (await self.crud.read(session, id=1)).password == "password1"
+
+    async def test_update_many_ignores_non_columns(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.update_many(session, obj_in={"password": "modified", "unknown": "value"}, ids=[1])
+
+            # Assert
+            assert [user.password for user in result] == ["modified"]
+
+    async def test_update_many_integrity_error(self):
+        crud = CRUDBase[ModelUniqueUser, UniqueUserCreate, UniqueUserCreate](ModelUniqueUser)
+        async with get_db.get_session() as session:
+            await crud.create_many(
+                session, objs_in=[UniqueUserCreate(email=f"user{i}@example.com") for i in range(3)]
+            )
+
+            # Act
+            with self.assertRaises(BulkIntegrityError) as error:
+                await crud.update_many(session, obj_in={"email": "same@example.com"}, id={gt: 0})
+
+            # Assert
+            assert list(error.exception.failed_rows) == [2, 3]
+            assert len(await crud.query(session, email="same@example.com")) == 0
+
+    async def test_delete_many(self):
+        async with get_db.get_session() as session:
+            # Act
+            result = await self.crud.delete_many(session, ids=[1, 2, 42], batch_size=2)
+
+            # Assert
+            assert sorted(user.id for user in result) == [1, 2]
+            assert [user.id for user in await self.crud.query(session)] == [3]
+            assert await self.crud.read(session, id=1) is None
 
-@patch("app.crud.base.select_db", PostgresDatabase)
-def test_patch_timezone_sqlite_postgres():
-    create_model = ModelUser(
-        email="user1@example.com",
-        password="password1",
-        datetime=_datetime.now(),
-    )
-    model = patch_timezone_sqlite(create_model)
 
-    assert model.datetime.tzinfo is None
+def test_batched():
+    assert batched([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert batched([], 2) == []
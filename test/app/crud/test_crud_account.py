@@ -0,0 +1,121 @@
+from test.base_test import BaseTest
+
+from app.core.config import settings
+from app.core.password_policy import WeakPasswordError
+from app.core.security import get_password_hash, is_hashed_password, pwd_context, verify_password
+from app.crud.crud_account import account as accounts
+from app.dependencies import get_db
+from app.schemas.account import AccountCreate, AccountUpdate
+
+strong_password = "StrongPassword123!45*"
+
+
+class TestCRUDAccount(BaseTest):
+    async def read_password(self, id: int) -> str:
+        async with get_db.get_session() as session:
+            db_obj = await accounts.read(session, id, columns=["password"], use_cache=False)
+            assert db_obj is not None
+            return db_obj.password
+
+    async def test_create_hashes_password(self):
+        async with get_db.get_session() as session:
+            db_obj = await accounts.create(
+                session,
+                obj_in=AccountCreate(
+                    username="user", last_name="Doe", first_name="John", password=settings.BASE_ACCOUNT_PASSWORD
+                ),
+            )
+            conflicting = await accounts.create_or_conflict(
+                session,
+                obj_in=AccountCreate(username="other", last_name="Doe", first_name="Jane", password=strong_password),
+                index_elements=["username"],
+            )
+            assert conflicting is not None
+
+        assert verify_password(settings.BASE_ACCOUNT_PASSWORD, await self.read_password(db_obj.id))
+        assert verify_password(strong_password, await self.read_password(conflicting.id))
+
+    async def test_create_many_hashes_passwords(self):
+        async with get_db.get_session() as session:
+            db_objs = await accounts.create_many(
+                session,
+                objs_in=[
+                    AccountCreate(username=f"user{i}", last_name="Doe", first_name="John", password=strong_password)
+                    for i in range(2)
+                ],
+            )
+
+        for db_obj in db_objs:
+            assert verify_password(strong_password, await self.read_password(db_obj.id))
+
+    async def test_update_hashes_password(self):
+        async with get_db.get_session() as session:
+            db_obj = await accounts.create(
+                session,
+                obj_in=AccountCreate(username="user", last_name="Doe", first_name="John", password=strong_password),
+            )
+            await accounts.update(session, db_obj=db_obj, obj_in=AccountUpdate(password=settings.BASE_ACCOUNT_PASSWORD))
+        assert verify_password(settings.BASE_ACCOUNT_PASSWORD, await self.read_password(db_obj.id))
+
+        async with get_db.get_session() as session:
+            await accounts.update(session, db_obj=db_obj, obj_in={"password": strong_password})
+        assert verify_password(strong_password, await self.read_password(db_obj.id))
+
+        async with get_db.get_session() as session:
+            await accounts.update_many(session, obj_in={"password": settings.BASE_ACCOUNT_PASSWORD}, ids=[db_obj.id])
+        assert verify_password(settings.BASE_ACCOUNT_PASSWORD, await self.read_password(db_obj.id))
+
+    async def test_create_weak_password(self):
+        async with get_db.get_session() as session:
+            with self.assertRaises(WeakPasswordError):
+                await accounts.create(
+                    session,
+                    obj_in=AccountCreate(username="user", last_name="Doe", first_name="John", password="Doejohn1990"),
+                )
+
+            assert await accounts.query(session, username="user") == []
+
+    async def test_update_keeps_hashed_password(self):
+        hashed_password = get_password_hash(strong_password)
+        async with get_db.get_session() as session:
+            db_obj = await accounts.create(
+                session,
+                obj_in=AccountCreate(username="user", last_name="Doe", first_name="John", password=hashed_password),
+            )
+            await accounts.update(session, db_obj=db_obj, obj_in=AccountUpdate(first_name="Jane"))
+
+        password = await self.read_password(db_obj.id)
+        assert password == hashed_password
+        assert is_hashed_password(password)
+
+    async def test_rehash_password(self):
+        old_hashed_password = pwd_context.handler("bcrypt").using(rounds=5).hash(strong_password)
+        async with get_db.get_session() as session:
+            db_obj = await accounts.create(
+                session,
+                obj_in=AccountCreate(username="user", last_name="Doe", first_name="John", password=old_hashed_password),
+            )
+
+            assert await accounts.rehash_password(
+                session, id=db_obj.id, password=strong_password, hashed_password=old_hashed_password
+            )
+
+        password = await self.read_password(db_obj.id)
+        assert password != old_hashed_password
+        assert verify_password(strong_password, password)
+        assert not pwd_context.needs_update(password)
+
+    async def test_rehash_password_changed(self):
+        async with get_db.get_session() as session:
+            db_obj = await accounts.create(
+                session,
+                obj_in=AccountCreate(username="user", last_name="Doe", first_name="John", password=strong_password),
+            )
+            password = await self.read_password(db_obj.id)
+
+            # The password was changed after the login that verified the old one
+            assert not await accounts.rehash_password(
+                session, id=db_obj.id, password="OldPassword123!45*", hashed_password="$2b$05$outdated"
+            )
+
+        assert await self.read_password(db_obj.id) == password
@@ -0,0 +1,82 @@
+from test.base_test import BaseTest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+from app.crud.crud_revoked_token import CRUDRevokedToken
+from app.dependencies import get_db
+from app.models.revoked_token import RevokedToken
+
+
+def in_one_hour() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=1)
+
+
+class TestCRUDRevokedToken(BaseTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.revoked_tokens = CRUDRevokedToken(RevokedToken, capacity=100, error_rate=0.01)
+
+    async def test_revoke(self):
+        async with get_db.get_session() as session:
+            await self.revoked_tokens.revoke(session, jti="revoked", expires_at=in_one_hour())
+            # Revoking twice is ignored
+            await self.revoked_tokens.revoke(session, jti="revoked", expires_at=in_one_hour())
+
+            assert await self.revoked_tokens.is_revoked(session, "revoked")
+            assert not await self.revoked_tokens.is_revoked(session, "valid")
+            assert await self.revoked_tokens.count(session) == 1
+
+    async def test_is_revoked_without_query(self):
+        session = AsyncMock()
+
+        assert not await self.revoked_tokens.is_revoked(session, "valid")
+        session.scalar.assert_not_called()
+
+    async def test_is_revoked_false_positive(self):
+        # In the filter but not in the table
+        self.revoked_tokens.filter.add("valid")
+
+        async with get_db.get_session() as session:
+            assert not await self.revoked_tokens.is_revoked(session, "valid")
+
+    async def test_refresh(self):
+        # Revoked by another worker
+        other_worker = CRUDRevokedToken(RevokedToken, capacity=100, error_rate=0.01)
+        async with get_db.get_session() as session:
+            await other_worker.revoke(session, jti="first", expires_at=in_one_hour())
+            assert not await self.revoked_tokens.is_revoked(session, "first")
+
+            assert await self.revoked_tokens.refresh(session) == 1
+            assert await self.revoked_tokens.is_revoked(session, "first")
+
+            await other_worker.revoke(session, jti="second", expires_at=in_one_hour())
+            # The recent revocations are read again, but only added once
+            assert await self.revoked_tokens.refresh(session) == 2
+            assert await self.revoked_tokens.is_revoked(session, "second")
+            assert len(self.revoked_tokens.filter) == 2
+
+    async def test_refresh_incremental(self):
+        async with get_db.get_session() as session:
+            await self.revoked_tokens.revoke(session, jti="old", expires_at=in_one_hour())
+            await self.revoked_tokens.refresh(session)
+            # Older than the overlap
+            self.revoked_tokens.refreshed_until = datetime.now(timezone.utc) + timedelta(hours=1)
+
+            assert await self.revoked_tokens.refresh(session) == 0
+
+    async def test_rebuild(self):
+        revoked_tokens = CRUDRevokedToken(RevokedToken, capacity=2, error_rate=0.01)
+        async with get_db.get_session() as session:
+            await revoked_tokens.revoke(session, jti="expired", expires_at=datetime.now(timezone.utc))
+            await revoked_tokens.revoke(session, jti="first", expires_at=in_one_hour())
+            await revoked_tokens.revoke(session, jti="second", expires_at=in_one_hour())
+            assert revoked_tokens.filter.is_full()
+
+            # The expired revocation is deleted, the others do not fit
+            assert await revoked_tokens.refresh(session) == 2
+
+            assert revoked_tokens.filter.capacity == 4
+            assert len(revoked_tokens.filter) == 2
+            assert "expired" not in revoked_tokens.filter
+            assert await revoked_tokens.is_revoked(session, "first")
+            assert await revoked_tokens.count(session) == 2
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta, timezone
+
+from app.db.base_class import UTCDateTime, get_model_info
+from app.models.account import Account
+
+
+def test_get_model_info():
+    info = get_model_info(Account)
+
+    assert info.columns == ("username", "password", "scope", "is_active", "last_name", "first_name", "version", "id")
+    assert info.nullable["username"] is False
+    assert info.datetime_columns == ()
+    assert info.version_column == "version"
+    assert info.filterable == ("username", "scope", "is_active", "last_name", "first_name")
+    assert info.sortable == ("username", "last_name", "first_name")
+    assert info.searchable == ("username", "last_name", "first_name")
+    assert Account.is_optional("username") is False
+
+
+def test_versioned_server_default():
+    # Adding the column to an existing table fills the existing rows
+    server_default = Account.__table__.c.version.server_default
+
+    assert server_default is not None and server_default.arg == "1"
+
+
+def test_query_column_indexes():
+    indexes = {index.name: [column.name for column in index.columns] for index in Account.__table__.indexes}
+
+    assert indexes.keys() == {
+        "ix_account_username",
+        "ix_account_username_id",
+        "ix_account_scope",
+        "ix_account_is_active",
+        "ix_account_last_name_id",
+        "ix_account_first_name_id",
+        # Full-text indexes, only created on PostgreSQL, see test_search.py
+        "ix_account_search",
+        "ix_account_username_trgm",
+        "ix_account_last_name_trgm",
+        "ix_account_first_name_trgm",
+    }
+    assert indexes["ix_account_username_id"] == ["username", "id"]
+    assert indexes["ix_account_scope"] == ["scope"]
+    assert indexes["ix_account_last_name_id"] == ["last_name", "id"]
+    assert Account.__table__.c.username.type.length == 256
+
+
+def test_utc_datetime():
+    utc_datetime = UTCDateTime()
+    naive = datetime(2024, 1, 1, 12)
+    paris = datetime(2024, 1, 1, 13, tzinfo=timezone(timedelta(hours=1)))
+
+    assert utc_datetime.process_result_value(naive, None) == naive.replace(tzinfo=timezone.utc)
+    assert utc_datetime.process_bind_param(paris, None) == naive.replace(tzinfo=timezone.utc)
+    assert utc_datetime.process_bind_param(paris, None).tzinfo == timezone.utc
+    assert utc_datetime.process_result_value(None, None) is None
+    assert utc_datetime.python_type is datetime
@@ -0,0 +1,103 @@
+from test.base_test import BaseTest
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from app.db.databases.sqlite import SqliteDatabase
+from app.db.deadline import DEADLINE_KEY, is_deadline_exceeded, propagate_deadline, remaining_ms, set_deadline
+
+
+def count_query(n: int):
+    # The progress handler is only called every thousand instructions, the query must count high enough
+    return text(
+        f"WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < {n}) "
+        "SELECT count(*) FROM counter"
+    )
+
+
+# Takes seconds on SQLite
+SLOW_QUERY = count_query(10_000_000)
+
+
+class TestDeadline(BaseTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.database = SqliteDatabase()
+        self.database.setup("sqlite+aiosqlite:///" + str(self._tmp_path / "deadline.db"))
+
+    async def asyncTearDown(self) -> None:
+        await self.database.shutdown()
+
+    async def test_statement_interrupted(self):
+        async with self.database.get_session() as session:
+            set_deadline(session, 0.05)
+            with self.assertRaises(OperationalError) as context:
+                await session.execute(SLOW_QUERY)
+        assert is_deadline_exceeded(context.exception)
+
+    async def test_deadline_passed(self):
+        async with self.database.get_session() as session:
+            set_deadline(session, -1)
+            with self.assertRaises(OperationalError):
+                await session.execute(SLOW_QUERY)
+
+    async def test_no_deadline(self):
+        async with self.database.get_session() as session:
+            assert (await session.execute(count_query(10_000))).scalar_one() == 10_000
+
+    async def test_connection_reset(self):
+        # The connection is returned to the pool, then reused without the deadline
+        async with self.database.get_session() as session:
+            set_deadline(session, -1)
+            with self.assertRaises(OperationalError):
+                await session.execute(SLOW_QUERY)
+
+        async with self.database.async_engine.connect() as connection:
+            assert (await connection.execute(count_query(10_000))).scalar_one() == 10_000
+
+    async def test_deadline_per_session(self):
+        async with self.database.get_session() as late, self.database.get_session() as session:
+            set_deadline(late, -1)
+            with self.assertRaises(OperationalError):
+                await late.execute(SLOW_QUERY)
+            assert (await session.execute(count_query(10_000))).scalar_one() == 10_000
+
+
+def test_remaining_ms():
+    session = MagicMock(info={})
+    set_deadline(session, 2)
+
+    assert 1900 < remaining_ms(session.info[DEADLINE_KEY]) <= 2000
+    # A statement_timeout of 0 would disable the timeout
+    set_deadline(session, -1)
+    assert remaining_ms(session.info[DEADLINE_KEY]) == 1
+
+
+@pytest.mark.parametrize(
+    "orig, exceeded",
+    [
+        (MagicMock(sqlstate="57014"), True),
+        (MagicMock(sqlstate="40001"), False),
+        (Exception("interrupted"), True),
+        (Exception("database is locked"), False),
+    ],
+)
+def test_is_deadline_exceeded(orig, exceeded):
+    assert is_deadline_exceeded(DBAPIError("SELECT 1", None, orig)) is exceeded
+
+
+def test_propagate_deadline_postgresql():
+    connection = MagicMock()
+    connection.dialect.name = "postgresql"
+
+    propagate_deadline(MagicMock(info={}), MagicMock(), connection)
+    connection.exec_driver_sql.assert_not_called()
+
+    session = MagicMock(info={})
+    set_deadline(session, 2)
+    propagate_deadline(session, MagicMock(), connection)
+    statement = connection.exec_driver_sql.call_args.args[0]
+    assert statement.startswith("SET LOCAL statement_timeout = ")
+    assert 1900 < int(statement.split("= ")[1]) <= 2000
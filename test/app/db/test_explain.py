@@ -0,0 +1,58 @@
+import json
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.db.explain import Explain, plan_rows, unindexed_steps
+from app.models.account import Account
+
+
+def test_explain_compile():
+    statement = Explain(select(Account.id).where(Account.username == "test"))
+
+    compiled = statement.compile(dialect=postgresql.dialect())
+
+    assert str(compiled).startswith("EXPLAIN (FORMAT JSON) SELECT account.id")
+    assert list(compiled.params.values()) == ["test"]
+
+
+def test_explain_compile_sqlite():
+    statement = Explain(select(Account.id).where(Account.username == "test"))
+
+    compiled = statement.compile(dialect=sqlite.dialect())
+
+    assert str(compiled).startswith("EXPLAIN QUERY PLAN SELECT account.id")
+
+
+def test_plan_rows():
+    plan = [{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 42}}]
+
+    assert plan_rows(plan) == 42
+    assert plan_rows(json.dumps(plan)) == 42
+
+
+def test_unindexed_steps():
+    plan = [
+        {
+            "Plan": {
+                "Node Type": "Limit",
+                "Plans": [
+                    {
+                        "Node Type": "Sort",
+                        "Sort Key": ["account.version", "account.id"],
+                        "Plans": [{"Node Type": "Seq Scan", "Relation Name": "account"}],
+                    }
+                ],
+            }
+        }
+    ]
+    indexed_plan = [{"Plan": {"Node Type": "Index Scan", "Relation Name": "account"}}]
+    rows = [
+        (2, 0, 0, "SCAN account"),
+        (3, 0, 0, "SCAN account USING INDEX ix_account_scope"),
+        (4, 0, 0, "USE TEMP B-TREE FOR ORDER BY"),
+    ]
+
+    assert unindexed_steps(plan) == ["Sort on account.version, account.id", "Seq Scan on account"]
+    assert unindexed_steps(json.dumps(indexed_plan)) == []
+    assert unindexed_steps(rows) == ["SCAN account", "USE TEMP B-TREE FOR ORDER BY"]
@@ -0,0 +1,175 @@
+from test.base_test import BaseTest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.types import SecurityScopes
+from app.crud.crud_account import account as crud_account
+from app.crud.crud_revoked_token import CRUDRevokedToken
+from app.db.databases.sqlite import SqliteDatabase
+from app.models.account import Account
+from app.models.revoked_token import RevokedToken
+
+
+class TestRouting(BaseTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.database = SqliteDatabase()
+        self.database.setup(
+            "sqlite+aiosqlite:///" + str(self._tmp_path / "primary.db"),
+            replica_paths=[
+                "sqlite+aiosqlite:///" + str(self._tmp_path / "replica1.db"),
+                "sqlite+aiosqlite:///" + str(self._tmp_path / "replica2.db"),
+            ],
+        )
+        assert self.database.replicas is not None
+        self.replicas = self.database.replicas
+        # Each database tells where it is with the username of its only account
+        engines = {"primary": self.database.async_engine}
+        engines.update(zip(["replica1", "replica2"], self.replicas.engines, strict=True))
+        for name, engine in engines.items():
+            async with engine.begin() as connection:
+                await connection.run_sync(Account.metadata.create_all)
+                await connection.execute(
+                    insert(Account).values(
+                        id=1,
+                        username=name,
+                        password="password",
+                        scope=SecurityScopes.USER,
+                        is_active=True,
+                        last_name="last",
+                        first_name="first",
+                    )
+                )
+
+    async def asyncTearDown(self) -> None:
+        await self.database.shutdown()
+
+    async def read_username(self, session) -> str:
+        return (await session.scalars(select(Account.username).where(Account.id == 1))).one()
+
+    async def test_reads_round_robin(self):
+        async with self.database.get_session() as session:
+            # Act
+            usernames = [await self.read_username(session) for _ in range(4)]
+
+            # Assert
+            assert sorted(usernames) == ["replica1", "replica1", "replica2", "replica2"]
+            assert session.sync_session.pinned is False
+
+    async def test_write_pins_to_primary(self):
+        async with self.database.get_session() as session:
+            # Act
+            await crud_account.update_many(session, ids=[1], obj_in={"last_name": "changed"})
+            usernames = [await self.read_username(session) for _ in range(2)]
+
+            # Assert
+            assert session.sync_session.pinned is True
+            assert usernames == ["primary", "primary"]
+
+        async with self.database.get_session() as session:
+            # A new session reads from the replicas again
+            assert (await self.read_username(session)).startswith("replica")
+
+    async def test_flush_pins_to_primary(self):
+        async with self.database.get_session() as session:
+            account = await session.get(Account, 1)
+            account.last_name = "changed"
+
+            # Act
+            await session.flush()
+
+            # Assert
+            assert session.sync_session.pinned is True
+            assert await self.read_username(session) == "primary"
+
+    async def test_locking_read_pins_to_primary(self):
+        async with self.database.get_session() as session:
+            # Act
+            account = await crud_account.read(session, 1, for_update=True)
+
+            # Assert
+            assert account.username == "primary"
+            assert session.sync_session.pinned is True
+
+    async def test_primary_read_not_pinned(self):
+        async with self.database.get_session() as session:
+            # Act
+            username = await session.scalar(
+                select(Account.username).where(Account.id == 1), execution_options={"primary": True}
+            )
+
+            # Assert
+            assert username == "primary"
+            assert session.sync_session.pinned is False
+            assert (await self.read_username(session)).startswith("replica")
+
+    async def test_uncached_read_uses_primary(self):
+        async with self.database.get_session() as session:
+            # Act
+            account = await crud_account.read(session, 1, use_cache=False)
+
+            # Assert
+            assert account.username == "primary"
+            assert session.sync_session.pinned is False
+
+    async def test_revoked_token_checked_on_primary(self):
+        revoked_tokens = CRUDRevokedToken(RevokedToken, capacity=100, error_rate=0.01)
+        async with self.database.get_session() as session:
+            expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            await revoked_tokens.revoke(session, jti="revoked", expires_at=expires_at)
+
+        async with self.database.get_session() as session:
+            # Act, the replicas do not have the revocation
+            revoked = await revoked_tokens.is_revoked(session, "revoked")
+
+            # Assert
+            assert revoked is True
+            assert session.sync_session.pinned is False
+
+    async def test_unhealthy_replica_skipped(self):
+        # Arrange
+        self.replicas.mark_unhealthy(self.replicas.engines[0].sync_engine)
+
+        async with self.database.get_session() as session:
+            # Act
+            usernames = {await self.read_username(session) for _ in range(3)}
+
+            # Assert
+            assert usernames == {"replica2"}
+
+        # After the retry interval, the replica is used again
+        with patch("app.db.routing.time.monotonic", return_value=float("inf")):
+            assert len(self.replicas.healthy()) == 2
+
+    async def test_no_healthy_replica_uses_primary(self):
+        # Arrange
+        for engine in self.replicas.engines:
+            self.replicas.mark_unhealthy(engine.sync_engine)
+
+        async with self.database.get_session() as session:
+            # Act
+            username = await self.read_username(session)
+
+            # Assert
+            assert username == "primary"
+            assert session.sync_session.pinned is False
+
+    async def test_connection_failure_marks_replica_unhealthy(self):
+        database = SqliteDatabase()
+        database.setup(
+            "sqlite+aiosqlite:///" + str(self._tmp_path / "primary.db"),
+            replica_paths=["sqlite+aiosqlite:///" + str(self._tmp_path / "missing" / "replica.db")],
+        )
+        assert database.replicas is not None
+
+        async with database.get_session() as session:
+            # Act
+            with self.assertRaises(OperationalError):
+                await self.read_username(session)
+
+        # Assert
+        assert database.replicas.choose() is None
+        await database.shutdown()
@@ -18,8 +18,8 @@ def test_validate_password():
     # Test valid password
     info = MagicMock(spec=FieldValidationInfo)
     info.data = {}
-    hashed_password = validate_password(strong_password, info)
-    assert verify_password(strong_password, hashed_password)
+    # The password is hashed when the account is written, see `CRUDAccount`
+    assert validate_password(strong_password, info) == strong_password
 
     # Test weak password
     weak_password = "password"
@@ -78,3 +78,24 @@ async def test_execute_sql_command(mock_execute_sql_command):
     with patch("sys.argv", args):
         await main("execute")
     mock_execute_sql_command.assert_called_once_with("SELECT * FROM users")
+
+
+@pytest.mark.asyncio
+@patch("app.command.index_advisor")
+async def test_index_advisor(mock_index_advisor):
+    args = ["test", "index-advisor"]
+    with patch("sys.argv", args):
+        await main("index-advisor")
+    mock_index_advisor.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+@patch("app.command.get_db")
+@patch("app.command.calibrate_hashing")
+async def test_calibrate_hashing(mock_calibrate_hashing, mock_get_db):
+    args = ["test", "calibrate-hashing", "--budget", "100", "--output", "test.env"]
+    with patch("sys.argv", args):
+        await main("calibrate-hashing")
+    mock_calibrate_hashing.assert_called_once_with(100, "test.env")
+    # The calibration does not need the database
+    mock_get_db.setup.assert_not_called()
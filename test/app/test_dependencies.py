@@ -1,16 +1,34 @@
 import gettext
 
 from test.base_test import BaseTest
+from typing import Annotated, cast
+from unittest.mock import AsyncMock, patch
 
-from fastapi import HTTPException, status
+from fastapi import FastAPI, HTTPException, Security, status
 from fastapi.security import SecurityScopes
+from fastapi.testclient import TestClient
 from jose import jwt
+from sqlalchemy import event, update
 
 from app.core.config import settings
-from app.core.security import create_access_token
+from app.core.security import create_access_token, token_cache
+from app.core.utils.cache import TTLCache
 from app.crud.crud_account import account as crud_account
-from app.dependencies import get_current_account, get_current_active_account, get_db
+from app.crud.crud_revoked_token import revoked_token as revoked_tokens
+from app.db.databases.sqlite import SqliteDatabase
+from app.db.deadline import DEADLINE_KEY, remaining_ms
+from app.dependencies import (
+    get_current_account,
+    get_current_active_account,
+    get_current_active_token_data,
+    get_db,
+    get_token_data,
+    request_deadline,
+)
+from app.i18n import get_translation
+from app.models.account import Account as AccountModel
 from app.schemas.account import Account, AccountCreate
+from app.schemas.token import TokenData
 
 
 _ = gettext.translation('base', localedir=settings.LOCALE_DIR, languages=[settings.DEFAULT_LOCALE]).gettext
@@ -115,6 +133,65 @@ class TestGetCurrentAccount(BaseTest):
         assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
         assert "Token does not have the required scopes" in self._caplog.text
 
+    async def test_get_current_account_scope_checked_first(self):
+        # Arrange
+        modified_scopes = SecurityScopes(["administrator"])
+
+        with patch.object(crud_account, "read", AsyncMock()) as read:
+            with self.assertRaises(HTTPException) as error:
+                await get_current_account(
+                    security_scopes=modified_scopes,
+                    token=self.token,
+                    db=get_db.get_session(),
+                    _=_,
+                )
+
+        # Assert, the account was not read
+        assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
+        read.assert_not_called()
+
+    async def test_get_current_account_outdated_claims(self):
+        # Arrange
+        token = create_access_token(
+            subject=self.account_db.id,
+            scopes=["user"],
+            claims={"is_active": self.account_db.is_active, "ver": self.account_db.version},
+        )
+        async with get_db.get_session() as session:
+            await crud_account.update(session, db_obj=self.account_db, obj_in={"scope": "administrator"})
+
+        with self.assertRaises(HTTPException) as error:
+            await get_current_account(
+                security_scopes=self.security_scopes,
+                token=token,
+                db=get_db.get_session(),
+                _=_,
+            )
+
+        assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "Token claims are outdated" in self._caplog.text
+
+    async def test_get_current_account_updated_claims_unchanged(self):
+        # Arrange
+        token = create_access_token(
+            subject=self.account_db.id,
+            scopes=["user"],
+            claims={"is_active": self.account_db.is_active, "ver": self.account_db.version},
+        )
+        async with get_db.get_session() as session:
+            await crud_account.update(session, db_obj=self.account_db, obj_in={"first_name": "other"})
+
+        # Act, the account was updated but the claims of the token still hold
+        current_account = await get_current_account(
+            security_scopes=self.security_scopes,
+            token=token,
+            db=get_db.get_session(),
+            _=_,
+        )
+
+        # Assert
+        assert current_account.first_name == "other"
+
     async def test_get_current_account_success(self):
         # Arrange
         current_account = await get_current_account(
@@ -134,6 +211,98 @@ class TestGetCurrentAccount(BaseTest):
         assert account.last_name == self.account_db.last_name
         assert account.first_name == self.account_db.first_name
 
+    async def test_get_current_account_token_cached(self):
+        # Arrange
+        token_cache.clear()
+
+        # Act
+        for _i in range(2):
+            current_account = await get_current_account(
+                security_scopes=self.security_scopes,
+                token=self.token,
+                db=get_db.get_session(),
+                _=_,
+            )
+
+        # Assert, the token was verified once, the account is read each time
+        assert current_account.id == self.account_db.id
+        assert (token_cache.info().hits, token_cache.info().misses) == (1, 1)
+
+    async def test_get_current_account_not_cached(self):
+        # Arrange
+        with patch.object(crud_account, "cache", TTLCache(10, 60)):
+            async with get_db.get_session() as session:
+                await crud_account.update(session, db_obj=self.account_db, obj_in={"is_active": True})
+                await crud_account.read(session, self.account_db.id)
+                # Deactivated by another worker, the cache is not invalidated
+                await session.execute(
+                    update(AccountModel).where(AccountModel.id == self.account_db.id).values(is_active=False)
+                )
+                await session.commit()
+
+            # Act
+            current_account = await get_current_account(
+                security_scopes=self.security_scopes,
+                token=self.token,
+                db=get_db.get_session(),
+                _=_,
+            )
+
+        # Assert
+        assert current_account.is_active is False
+
+    async def test_get_current_account_cached(self):
+        # Arrange
+        token = create_access_token(
+            subject=self.account_db.id,
+            scopes=["user"],
+            claims={"is_active": self.account_db.is_active, "ver": self.account_db.version},
+        )
+        with patch.object(crud_account, "cache", TTLCache(10, 60)):
+            # Act
+            for _i in range(2):
+                current_account = await get_current_account(
+                    security_scopes=self.security_scopes,
+                    token=token,
+                    db=get_db.get_session(),
+                    _=_,
+                )
+
+            # Assert, the account is read from the database once
+            assert current_account.id == self.account_db.id
+            assert (crud_account.cache.info().hits, crud_account.cache.info().misses) == (1, 1)
+
+    async def test_get_current_account_cached_other_version(self):
+        # Arrange
+        with patch.object(crud_account, "cache", TTLCache(10, 60)):
+            async with get_db.get_session() as session:
+                await crud_account.read(session, self.account_db.id)
+                # Updated by another worker, the cache is not invalidated
+                await session.execute(
+                    update(AccountModel)
+                    .where(AccountModel.id == self.account_db.id)
+                    .values(first_name="other", version=AccountModel.version + 1)
+                )
+                await session.commit()
+            # Issued by another worker after the update
+            token = create_access_token(
+                subject=self.account_db.id,
+                scopes=["user"],
+                claims={"is_active": self.account_db.is_active, "ver": self.account_db.version + 1},
+            )
+
+            # Act
+            current_account = await get_current_account(
+                security_scopes=self.security_scopes,
+                token=token,
+                db=get_db.get_session(),
+                _=_,
+            )
+
+            # Assert
+            assert current_account.first_name == "other"
+            assert crud_account.cache.get(self.account_db.id)["first_name"] == "other"
+
     async def test_get_current_active_account_inactive(self):
         # Arrange
         async with get_db.get_session() as session:
@@ -167,3 +336,109 @@ class TestGetCurrentAccount(BaseTest):
         assert account.is_active == self.account_db.is_active
         assert account.last_name == self.account_db.last_name
         assert account.first_name == self.account_db.first_name
+
+
+class TestGetTokenData(BaseTest):
+    async def asyncSetUp(self) -> None:
+        await super().asyncSetUp()
+        self.token = create_access_token(subject=1, scopes=["user"], claims={"is_active": True, "ver": 3})
+
+        # An application whose route only checks the permissions of the caller
+        app = FastAPI()
+
+        @app.get("/protected/")
+        async def protected(
+            token_data: Annotated[TokenData, Security(get_current_active_token_data, scopes=["user"])],
+        ) -> int | None:
+            return token_data.id
+
+        # Without the middleware setting the translation of the request
+        app.dependency_overrides[get_translation] = lambda: _
+        self.app_client = TestClient(app)
+
+    async def test_get_token_data(self):
+        token_data = await get_token_data(
+            security_scopes=SecurityScopes(["user"]), db=get_db.get_session(), token=self.token, _=_
+        )
+
+        assert (token_data.id, token_data.scopes, token_data.is_active, token_data.version) == (1, ["user"], True, 3)
+        assert token_data.jti is not None
+        assert token_data.expires_at is not None
+
+    async def test_get_token_data_no_required_scope(self):
+        with self.assertRaises(HTTPException) as error:
+            await get_token_data(
+                security_scopes=SecurityScopes(["administrator"]), db=get_db.get_session(), token=self.token, _=_
+            )
+
+        assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "Token does not have the required scopes" in self._caplog.text
+
+    async def test_get_token_data_revoked(self):
+        # Arrange, the claims of the token are cached
+        token_data = await get_token_data(
+            security_scopes=SecurityScopes(["user"]), db=get_db.get_session(), token=self.token, _=_
+        )
+        async with get_db.get_session() as session:
+            assert token_data.jti is not None and token_data.expires_at is not None
+            await revoked_tokens.revoke(session, jti=token_data.jti, expires_at=token_data.expires_at)
+
+        with self.assertRaises(HTTPException) as error:
+            await get_token_data(
+                security_scopes=SecurityScopes(["user"]), db=get_db.get_session(), token=self.token, _=_
+            )
+
+        assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "Token is revoked" in self._caplog.text
+
+    async def test_get_current_active_token_data_inactive(self):
+        with self.assertRaises(HTTPException) as error:
+            await get_current_active_token_data(token_data=TokenData(id=1, scopes=["user"], is_active=False), _=_)
+
+        assert error.exception.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Account is inactive" in self._caplog.text
+
+    async def test_get_current_active_token_data_no_claims(self):
+        # Issued before the stateless authentication, the token must be renewed
+        with self.assertRaises(HTTPException) as error:
+            await get_current_active_token_data(token_data=TokenData(id=1, scopes=["user"]), _=_)
+
+        assert error.exception.status_code == status.HTTP_401_UNAUTHORIZED
+        assert "Token has no is_active claim" in self._caplog.text
+
+    async def test_protected_route_without_database(self):
+        # Arrange
+        statements: list[str] = []
+        engine = cast(SqliteDatabase, get_db).async_engine.sync_engine
+
+        def count(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            # Act
+            response = self.app_client.get("/protected/", headers={"Authorization": f"Bearer {self.token}"})
+            forbidden = create_access_token(subject=1, scopes=["user"], claims={"is_active": False, "ver": 3})
+            inactive = self.app_client.get("/protected/", headers={"Authorization": f"Bearer {forbidden}"})
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        # Assert
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == 1
+        assert inactive.status_code == status.HTTP_400_BAD_REQUEST
+        assert statements == []
+
+
+class TestRequestDeadline(BaseTest):
+    async def test_request_deadline(self):
+        async with get_db.get_session() as session:
+            await request_deadline(5)(session)
+
+            assert 4900 < remaining_ms(session.info[DEADLINE_KEY]) <= 5000
+
+    async def test_request_deadline_default(self):
+        async with get_db.get_session() as session:
+            await request_deadline()(session)
+
+            assert remaining_ms(session.info[DEADLINE_KEY]) <= settings.REQUEST_TIMEOUT * 1000